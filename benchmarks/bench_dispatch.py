@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Measures the per-frame overhead of dispatching DIAG packets to their
+# handlers: the former if/elif chain on the command code with lambda
+# wrapped log handlers against the dict lookups on bound methods.
+# Handlers do nothing, so only the dispatch itself is timed.
+# Usage: python3 benchmarks/bench_dispatch.py [number of packets]
+
+import struct
+import sys
+import time
+
+from scat.parsers.qualcomm.qualcommparser import QualcommParser
+from scat.parsers.qualcomm import diagcmd
+
+class Handlers:
+    def log(self, pkt_header, pkt_body, args):
+        return None
+
+    def cmd(self, pkt, args=None):
+        return None
+
+class LegacyDispatch:
+    def __init__(self, parser, handlers):
+        self.parse_events = True
+        self.parse_msgs = True
+        self.handlers = handlers
+        self.process = {x: lambda x, y, z: self.handlers.log(x, y, z) for x in parser.process}
+        self.no_process = dict(parser.no_process)
+
+    def parse_diag_log(self, pkt, args=None):
+        pkt_header = QualcommParser.log_header.unpack(pkt)
+        if pkt_header.log_id in self.process.keys():
+            return self.process[pkt_header.log_id](pkt_header, pkt[16:], args)
+        elif pkt_header.log_id in self.no_process.keys():
+            return None
+        else:
+            return None
+
+    def parse_diag(self, pkt, args=None):
+        if pkt[0] == diagcmd.DIAG_LOG_F:
+            return self.parse_diag_log(pkt, args)
+        elif pkt[0] == diagcmd.DIAG_EVENT_REPORT_F and self.parse_events:
+            return self.handlers.cmd(pkt)
+        elif pkt[0] == diagcmd.DIAG_EXT_MSG_F and self.parse_msgs:
+            return self.handlers.cmd(pkt)
+        elif pkt[0] == diagcmd.DIAG_QSR_EXT_MSG_TERSE_F and self.parse_msgs:
+            return self.handlers.cmd(pkt)
+        elif pkt[0] == diagcmd.DIAG_QSR4_EXT_MSG_TERSE_F and self.parse_msgs:
+            return self.handlers.cmd(pkt)
+        elif pkt[0] == diagcmd.DIAG_MULTI_RADIO_CMD_F:
+            return self.handlers.cmd(pkt)
+        elif pkt[0] == diagcmd.DIAG_VERNO_F:
+            return self.handlers.cmd(pkt)
+        elif pkt[0] == diagcmd.DIAG_EXT_BUILD_ID_F:
+            return self.handlers.cmd(pkt)
+        elif pkt[0] == diagcmd.DIAG_LOG_CONFIG_F:
+            return self.handlers.cmd(pkt)
+        elif pkt[0] == diagcmd.DIAG_EXT_MSG_CONFIG_F:
+            return self.handlers.cmd(pkt)
+        else:
+            return None
+
+class TableDispatch:
+    def __init__(self, parser, handlers):
+        self.process = {x: handlers.log for x in parser.process}
+        self.diag_handlers = {x: handlers.cmd for x in parser.diag_handlers}
+        self.diag_handlers[diagcmd.DIAG_LOG_F] = self.parse_diag_log
+
+    def parse_diag_log(self, pkt, args=None):
+        pkt_header = QualcommParser.log_header.unpack(pkt)
+        handler = self.process.get(pkt_header.log_id)
+        if handler is not None:
+            return handler(pkt_header, pkt[16:], args)
+        return None
+
+    def parse_diag(self, pkt, args=None):
+        handler = self.diag_handlers.get(pkt[0])
+        if handler is None:
+            return None
+        return handler(pkt, args)
+
+def generate_packets(num_pkts):
+    log_ids = (0xb0c0, 0x412f, 0xb0e2, 0x1098, 0xffff)
+    pkts = [struct.pack('<BBHHHQ', 0x10, 0, 12, 12, x, 0) for x in log_ids]
+    pkts += [struct.pack('<B', x) + b'\x00' * 15 for x in (diagcmd.DIAG_EXT_MSG_F, diagcmd.DIAG_EXT_MSG_CONFIG_F)]
+    return [pkts[i % len(pkts)] for i in range(num_pkts)]
+
+def run(dispatch, pkts):
+    parse_diag = dispatch.parse_diag
+    start = time.perf_counter()
+    for pkt in pkts:
+        parse_diag(pkt)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    num_pkts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    parser = QualcommParser()
+    parser.set_parameter({'events': True, 'msgs': True})
+    pkts = generate_packets(num_pkts)
+
+    handlers = Handlers()
+    print('{} packets'.format(num_pkts))
+    baseline = None
+    for name, dispatch in (('if/elif + lambda', LegacyDispatch(parser, handlers)), ('dict + bound method', TableDispatch(parser, handlers))):
+        elapsed = min(run(dispatch, pkts) for i in range(3))
+        if baseline is None:
+            baseline = elapsed
+        print('{:20}: {:8.3f} s, {:7.1f} ns/packet, speedup {:.2f}x'.format(
+            name, elapsed, elapsed / num_pkts * 1e9, baseline / elapsed))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Compares the block-buffered HDF scanner in QualcommParser.parse_hdf with
+# the previous implementation reading one byte at a time.
+# Usage: python3 benchmarks/bench_hdf.py [number of records]
+
+import struct
+import sys
+import os
+import gzip
+import time
+import tempfile
+
+from scat.parsers.qualcomm.qualcommparser import QualcommParser
+from scat.iodevices import FileIO
+
+class CountWriter:
+    def __init__(self):
+        self.count = 0
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.count += 1
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.count += 1
+
+def parse_hdf_bytewise(parser):
+    # Implementation before the block-buffered scanner
+    while True:
+        header = parser.io_device.read(1)
+        if len(header) == 0:
+            break
+        if header != b'\x10':
+            continue
+        header += parser.io_device.read(1)
+        if header != b'\x10\x00':
+            continue
+        header += parser.io_device.read(2)
+        body = parser.io_device.read(2)
+        if header[2:4] != body[0:2]:
+            continue
+        pkt_len = struct.unpack('<H', header[2:4])[0]
+        body += parser.io_device.read(pkt_len - 2)
+        pkt = header + body
+
+        parse_result = parser.parse_diag(pkt, check_crc=False, hdlc_encoded=False)
+        if parse_result is not None:
+            parser.postprocess_parse_result(parse_result)
+
+def generate_hdf(num_records):
+    # Log packets with an ID not handled by SCAT, so that the benchmark
+    # measures the scanner, each one followed by 64 bytes of other fields
+    body = bytes(range(0x20, 0xa0))
+    log_len = len(body) + 12
+    record = struct.pack('<HHHQ', log_len, log_len, 0xb0ff, 0) + body
+    return (b'\x10\x00' + record + bytes(range(0x30, 0x70))) * num_records
+
+def run(fname, method):
+    parser = QualcommParser()
+    parser.set_io_device(FileIO([fname]))
+    writer = CountWriter()
+    parser.set_writer(writer)
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    start = time.perf_counter()
+    try:
+        if method == 'bytewise':
+            parse_hdf_bytewise(parser)
+        else:
+            parser.parse_hdf()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return time.perf_counter() - start, writer.count
+
+if __name__ == '__main__':
+    num_records = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = generate_hdf(num_records)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fnames = [os.path.join(tmpdir, 'bench.hdf'), os.path.join(tmpdir, 'bench.hdf.gz')]
+        with open(fnames[0], 'wb') as f:
+            f.write(data)
+        with gzip.open(fnames[1], 'wb') as f:
+            f.write(data)
+
+        print('{} records, {} bytes'.format(num_records, len(data)))
+        for fname in fnames:
+            results = {}
+            for method in ('bytewise', 'buffered'):
+                elapsed, count = run(fname, method)
+                results[method] = elapsed
+                print('{:>12} {:>9}: {:8.3f} s, {:9.0f} records/s, {} packets'.format(
+                    os.path.basename(fname), method, elapsed, num_records / elapsed, count))
+            print('{:>12} speedup: {:.1f}x'.format(os.path.basename(fname), results['bytewise'] / results['buffered']))
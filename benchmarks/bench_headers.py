@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Compares the GSMTAP and osmocore logging header builders in scat.util,
+# which cache the fields repeating across packets, with the previous
+# implementations packing every field of every header.
+# Usage: python3 benchmarks/bench_headers.py [number of headers]
+
+import struct
+import sys
+import time
+
+import scat.util as util
+
+def create_gsmtap_header_legacy(version = 2, payload_type = 0, timeslot = 0,
+    arfcn = 0, signal_dbm = 0, snr_db = 0, frame_number = 0,
+    sub_type = 0, antenna_nr = 0, sub_slot = 0,
+    device_sec = 0, device_usec = 0):
+    # Implementation before the cached prefixes
+    gsmtap_type = util.gsmtap_type
+    if not (payload_type == gsmtap_type.UM or payload_type == gsmtap_type.UM_BURST or
+        payload_type == gsmtap_type.ABIS or
+        payload_type == gsmtap_type.GB_LLC or payload_type == gsmtap_type.GB_SNDCP):
+        if arfcn < 0 or arfcn > (2 ** 14 - 1):
+            arfcn = 0
+
+    if version == 2:
+        return struct.pack('!BBBBHBBLBBBB', 2, 4, payload_type, timeslot, arfcn,
+            signal_dbm, snr_db, frame_number, sub_type, antenna_nr, sub_slot, 0)
+    return struct.pack('!BBBBHBBLBBBBQL', 3, 7, payload_type, timeslot, arfcn,
+        signal_dbm, snr_db, frame_number, sub_type, antenna_nr, sub_slot, 0,
+        device_sec, device_usec)
+
+def create_osmocore_logging_header_legacy(timestamp = 0,
+        process_name = '', pid = 0, level = 0,
+        subsys_name = '', filename = '', line_number = 0):
+    if type(process_name) == str:
+        process_name = process_name.encode('utf-8')
+    if type(subsys_name) == str:
+        subsys_name = subsys_name.encode('utf-8')
+    if type(filename) == str:
+        filename = filename.encode('utf-8')
+    ts_sec, ts_usec = util.ts_sec_usec(timestamp)
+    return struct.pack('!LL16sLB3x16s32sL', ts_sec, ts_usec, process_name, pid,
+        level, subsys_name, filename, line_number)
+
+def run_gsmtap(create_header, num_hdrs):
+    # LTE RRC OTA messages on two cells, the most common GSMTAP header
+    start = time.perf_counter()
+    for i in range(num_hdrs):
+        create_header(version = 3, payload_type = util.gsmtap_type.LTE_RRC,
+            arfcn = 1300 if i & 1 else 6300, sub_type = util.gsmtap_lte_rrc_types.DL_DCCH,
+            device_sec = 1540493162 + (i >> 10), device_usec = i & 0xfffff)
+    return time.perf_counter() - start
+
+def run_osmocore_event(create_header, num_hdrs):
+    # Events, named by process name and event ID
+    start = time.perf_counter()
+    for i in range(num_hdrs):
+        create_header(timestamp = 1540493162275000000 + i * 1000,
+            process_name = b'Event', pid = 1605 + (i & 7))
+    return time.perf_counter() - start
+
+def run_osmocore_msg(create_header, num_hdrs):
+    # Extended messages from a handful of source files
+    filenames = [b'lte_rrc_csp.c', b'ds_3gpp_bearer.c', b'nas_emm.c', b'mmgsdi.c']
+    start = time.perf_counter()
+    for i in range(num_hdrs):
+        create_header(timestamp = 1540493162275000000 + i * 1000,
+            subsys_name = b'%d' % (5000 + (i & 3)), filename = filenames[i & 3],
+            line_number = i & 0xfff)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    num_hdrs = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+
+    print('{} headers'.format(num_hdrs))
+    for name, run, legacy, cached in (
+            ('GSMTAP v3', run_gsmtap, create_gsmtap_header_legacy, util.create_gsmtap_header),
+            ('DIAG event', run_osmocore_event, create_osmocore_logging_header_legacy, util.create_osmocore_logging_header),
+            ('DIAG message', run_osmocore_msg, create_osmocore_logging_header_legacy, util.create_osmocore_logging_header)):
+        baseline = min(run(legacy, num_hdrs) for i in range(3))
+        elapsed = min(run(cached, num_hdrs) for i in range(3))
+        print('{:12}: {:7.1f} ns/header before, {:7.1f} ns/header cached, speedup {:.2f}x'.format(
+            name, baseline / num_hdrs * 1e9, elapsed / num_hdrs * 1e9, baseline / elapsed))
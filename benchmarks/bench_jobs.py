@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Measures QMDL decoding with --jobs 1/2/4/8 worker processes.
+# Usage: python3 benchmarks/bench_jobs.py [number of packets]
+
+import binascii
+import struct
+import sys
+import os
+import time
+import tempfile
+
+from scat.parsers.qualcomm.qualcommparser import QualcommParser
+from scat.parsers.qualcomm import parallel
+from scat.iodevices import FileIO
+import scat.util as util
+
+class CountWriter:
+    def __init__(self):
+        self.count = 0
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.count += 1
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.count += 1
+
+def log_pkt(log_id, body):
+    return util.generate_packet(struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, log_id, 0) + body)
+
+def generate_qmdl(num_pkts):
+    # WCDMA serving cell changes followed by RRC messages using its UARFCN
+    cell_id = binascii.unhexlify('f1250000a729000041852d0800000700d01802060200030f9d9c000001000000')
+    rrc = log_pkt(0x412f, binascii.unhexlify('03001800') + bytes(range(0x18)))
+    lte_rrc = log_pkt(0xb0c0, binascii.unhexlify('1a0f400f40010e011307000000000b0000000002001015'))
+    block = []
+    for i in range(num_pkts // 100):
+        block.append(log_pkt(0x4127, struct.pack('<LL', 9000 + i, 10000 + i) + cell_id[8:]))
+        block.append((rrc + lte_rrc) * 49 + rrc)
+    return b''.join(block)
+
+def run(fname, jobs):
+    parser = QualcommParser()
+    parser.set_io_device(FileIO([fname]))
+    writer = CountWriter()
+    parser.set_writer(writer)
+
+    start = time.perf_counter()
+    if jobs == 1:
+        parser.run_diag()
+    else:
+        parallel.run_parallel(parser, fname, jobs)
+    elapsed = time.perf_counter() - start
+    parser.io_device.__exit__(None, None, None)
+    return elapsed, writer.count
+
+if __name__ == '__main__':
+    num_pkts = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = generate_qmdl(num_pkts)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, 'bench.qmdl')
+        with open(fname, 'wb') as f:
+            f.write(data)
+
+        print('{} packets, {} bytes, {} CPUs'.format(num_pkts, len(data), os.cpu_count()))
+        baseline = None
+        for jobs in (1, 2, 4, 8):
+            elapsed, count = run(fname, jobs)
+            if baseline is None:
+                baseline = elapsed
+            print('jobs {}: {:8.3f} s, {:9.0f} packets/s, {} packets written, speedup {:.2f}x'.format(
+                jobs, elapsed, num_pkts / elapsed, count, baseline / elapsed))
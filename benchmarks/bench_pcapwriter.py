@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Compares the template based, buffered PcapWriter with the previous
+# implementation packing every header and writing every packet on its own,
+# and with PcapngWriter in its exported PDU and IPv4/UDP framings.
+# Usage: python3 benchmarks/bench_pcapwriter.py [number of packets]
+
+import struct
+import sys
+import os
+import time
+import tempfile
+import functools
+
+from scat.writers import PcapWriter, PcapngWriter
+
+class LegacyPcapWriter:
+    # Implementation before the header template and write buffer
+    def __init__(self, filename, port_cp = 4729, port_up = 47290):
+        self.port_cp = port_cp
+        self.port_up = port_up
+        self.ip_id = 0
+        self.base_address = 0x7f000001
+        self.pcap_file = open(filename, 'wb')
+        self.eth_hdr = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x08\x00'
+        self.pcap_file.write(struct.pack('<LHHLLLL', 0xa1b2c3d4, 2, 4, 0, 0, 0xffff, 1))
+
+    def write_pkt(self, sock_content, port, radio_id=0, ts=None):
+        ts_sec, ts_nsec = divmod(ts, 1000000000)
+        pcap_hdr = struct.pack('<LLLL', ts_sec, ts_nsec // 1000,
+                len(sock_content) + 8 + 20 + 14, len(sock_content) + 8 + 20 + 14)
+
+        if radio_id <= 0:
+            dest_address = self.base_address
+        else:
+            dest_address = self.base_address + radio_id
+        ip_hdr = struct.pack('!BBHHBBBBHLL', 0x45, 0x00, len(sock_content) + 8 + 20,
+                self.ip_id, 0x40, 0x00, 0x40, 0x11, 0xffff, 0x7f000001, dest_address)
+        udp_hdr = struct.pack('!HHHH', 13337, port, len(sock_content) + 8, 0xffff)
+
+        self.pcap_file.write(pcap_hdr + self.eth_hdr + ip_hdr + udp_hdr + sock_content)
+        self.ip_id += 1
+        if self.ip_id > 65535:
+            self.ip_id = 0
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.write_pkt(sock_content, self.port_cp, radio_id, ts)
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.write_pkt(sock_content, self.port_up, radio_id, ts)
+
+    def close(self):
+        self.pcap_file.close()
+
+def generate_packets(num_pkts):
+    # GSMTAP sized control plane messages and larger user plane packets
+    sizes = (40, 60, 120, 300, 1400)
+    pkts = [os.urandom(x) for x in sizes]
+    return [(pkts[i % len(pkts)], i % 5 == 4, i & 1, 1540493162275000000 + i * 1000) for i in range(num_pkts)]
+
+def run(writer_class, filename, pkts):
+    writer = writer_class(filename)
+    start = time.perf_counter()
+    for sock_content, is_up, radio_id, ts in pkts:
+        if is_up:
+            writer.write_up(sock_content, radio_id, ts)
+        else:
+            writer.write_cp(sock_content, radio_id, ts)
+    writer.close()
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    num_pkts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    pkts = generate_packets(num_pkts)
+
+    print('{} packets'.format(num_pkts))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        outputs = []
+        baseline = None
+        for name, writer_class in (('per-packet pack', LegacyPcapWriter), ('template + buffer', PcapWriter),
+                ('pcapng', PcapngWriter), ('pcapng, UDP framing', functools.partial(PcapngWriter, udp_framing=True))):
+            filename = os.path.join(tmpdir, '{}.pcap'.format(len(outputs)))
+            elapsed = min(run(writer_class, filename, pkts) for i in range(3))
+            if baseline is None:
+                baseline = elapsed
+            with open(filename, 'rb') as f:
+                outputs.append(f.read())
+            print('{:19}: {:8.3f} s, {:9.0f} packets/s, speedup {:.2f}x, {:7.1f} MB'.format(
+                name, elapsed, num_pkts / elapsed, baseline / elapsed, len(outputs[-1]) / 1e6))
+        assert outputs[0] == outputs[1], 'pcap files differ'
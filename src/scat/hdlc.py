@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import time
+
+import scat.util as util
+
+class HdlcFramer:
+    """Splits a byte stream into 0x7e-delimited frames.
+
+    Incoming data is appended to a growable buffer and scanned by offset, so
+    a frame spanning many reads is neither copied again nor rescanned on
+    every read. Frames are handed out as memoryview slices of the buffer and
+    stay valid until they are released by the caller. With keep_delimiter,
+    frames handed out by frames() include their trailing delimiter.
+    """
+
+    def __init__(self, delimiter=b'\x7e', keep_delimiter=False):
+        self.delimiter = delimiter
+        self.keep_delimiter = keep_delimiter
+        self.buf = bytearray()
+        # Start of the first frame not yet handed out
+        self.pos = 0
+        # Offset where the next delimiter search starts
+        self.scan_pos = 0
+
+        self.num_bytes = 0
+        self.num_frames = 0
+        self.start_time = None
+
+    def feed(self, data):
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+        self.num_bytes += len(data)
+
+        if self.pos > 0:
+            # Frames already handed out may still reference the current
+            # buffer, only move the pending tail to a new one
+            self.buf = self.buf[self.pos:]
+            self.scan_pos -= self.pos
+            self.pos = 0
+
+        try:
+            self.buf += data
+        except BufferError:
+            self.buf = self.buf + data
+
+    def frames(self):
+        buf = self.buf
+        view = None
+
+        while True:
+            end = buf.find(self.delimiter, self.scan_pos)
+            if end < 0:
+                self.scan_pos = len(buf)
+                break
+
+            start = self.pos
+            self.pos = end + 1
+            self.scan_pos = end + 1
+            if end == start:
+                continue
+
+            if view is None:
+                view = memoryview(buf)
+            self.num_frames += 1
+            yield view[start:end + 1] if self.keep_delimiter else view[start:end]
+
+    def scan(self, buf, with_tail=False, start=0, stop=None):
+        # Yields the frames of a complete buffer, such as a memory-mapped
+        # dump, in place without copying it into the framing buffer. start
+        # and stop limit the scan to a range of buf
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+        if stop is None:
+            stop = len(buf)
+
+        view = memoryview(buf)
+        while True:
+            end = buf.find(self.delimiter, start, stop)
+            if end < 0:
+                break
+
+            self.num_bytes += end + 1 - start
+            if end > start:
+                self.num_frames += 1
+                yield view[start:end]
+            start = end + 1
+
+        self.num_bytes += stop - start
+        if with_tail and start < stop:
+            self.num_frames += 1
+            yield view[start:stop]
+
+    def flush(self):
+        # Hands out the unterminated data left at the end of the stream
+        if self.pending() == 0:
+            return None
+
+        frame = memoryview(self.buf)[self.pos:]
+        self.num_frames += 1
+        self.pos = len(self.buf)
+        self.scan_pos = self.pos
+        return frame
+
+    def pending(self):
+        return len(self.buf) - self.pos
+
+    def reset(self):
+        self.buf = bytearray()
+        self.pos = 0
+        self.scan_pos = 0
+
+    def stats(self):
+        if self.start_time is None:
+            elapsed = 0.0
+        else:
+            elapsed = time.monotonic() - self.start_time
+
+        if elapsed > 0:
+            bytes_per_sec = self.num_bytes / elapsed
+            frames_per_sec = self.num_frames / elapsed
+        else:
+            bytes_per_sec = 0.0
+            frames_per_sec = 0.0
+
+        return {'bytes': self.num_bytes, 'frames': self.num_frames,
+            'elapsed': elapsed, 'bytes_per_sec': bytes_per_sec,
+            'frames_per_sec': frames_per_sec}
+
+    def stats_str(self):
+        stats = self.stats()
+        return '{} bytes, {} frames in {:.2f} s ({:.1f} kB/s, {:.1f} frames/s)'.format(
+            stats['bytes'], stats['frames'], stats['elapsed'],
+            stats['bytes_per_sec'] / 1000, stats['frames_per_sec'])
+
+class CrcChecker:
+    """Applies a CRC16 check policy to HDLC frames.
+
+    Policies:
+    always: check every frame
+    sampled: check one frame out of every sample_interval frames
+    off: never check, for dumps that are trusted to be intact
+    """
+
+    policies = ('always', 'sampled', 'off')
+
+    def __init__(self, policy='always', sample_interval=100):
+        self.policy = 'always'
+        self.sample_interval = 100
+        self.set_policy(policy, sample_interval)
+
+        self.num_checked = 0
+        self.num_skipped = 0
+        self.num_errors = 0
+        self.countdown = 0
+
+    def set_policy(self, policy, sample_interval=None):
+        if policy not in self.policies:
+            raise ValueError('Unknown CRC policy {}, expected one of {}'.format(policy, ', '.join(self.policies)))
+        if sample_interval is not None:
+            if sample_interval < 1:
+                raise ValueError('CRC sample interval should be at least 1')
+            self.sample_interval = sample_interval
+        self.policy = policy
+
+    def should_check(self):
+        if self.policy == 'always':
+            return True
+        elif self.policy == 'off':
+            self.num_skipped += 1
+            return False
+
+        if self.countdown > 0:
+            self.countdown -= 1
+            self.num_skipped += 1
+            return False
+        self.countdown = self.sample_interval - 1
+        return True
+
+    def check(self, pkt):
+        # pkt: unescaped frame with trailing CRC16
+        # Returns False only when the frame was checked and the CRC mismatched
+        return self.check_body(pkt[:-2], (pkt[-1] << 8) | pkt[-2])
+
+    def check_body(self, body, crc_pkt):
+        # body: unescaped frame with the trailing CRC16 already stripped
+        if not self.should_check():
+            return True
+
+        self.num_checked += 1
+        if util.dm_crc16(body) != crc_pkt:
+            self.num_errors += 1
+            return False
+        return True
+
+    def stats(self):
+        return {'checked': self.num_checked, 'skipped': self.num_skipped,
+            'errors': self.num_errors}
+
+    def stats_str(self):
+        return '{} checked, {} skipped, {} errors ({})'.format(
+            self.num_checked, self.num_skipped, self.num_errors, self.policy)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import time
+
+class ReadBackoff:
+    """Counts read timeouts and errors of a device and paces retries.
+
+    A timeout means the device is alive but idle, the read already waited
+    for it. An error usually returns immediately, so retries are delayed
+    with exponential backoff, and after max_errors consecutive errors the
+    device is considered gone and the error is raised.
+    """
+
+    def __init__(self, max_errors=10, min_delay=0.01, max_delay=0.5):
+        self.max_errors = max_errors
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+        self.delay = min_delay
+        self.consecutive_errors = 0
+        self.num_reads = 0
+        self.num_timeouts = 0
+        self.num_errors = 0
+
+    def success(self):
+        self.num_reads += 1
+        self.consecutive_errors = 0
+        self.delay = self.min_delay
+
+    def timeout(self):
+        self.num_timeouts += 1
+        self.consecutive_errors = 0
+        self.delay = self.min_delay
+
+    def error(self, e):
+        self.num_errors += 1
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= self.max_errors:
+            raise e
+        time.sleep(self.delay)
+        self.delay = min(self.delay * 2, self.max_delay)
+
+    def stats(self):
+        return {'reads': self.num_reads, 'timeouts': self.num_timeouts,
+            'errors': self.num_errors}
+
+    def stats_str(self):
+        return '{} reads, {} timeouts, {} errors'.format(
+            self.num_reads, self.num_timeouts, self.num_errors)
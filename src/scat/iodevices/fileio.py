@@ -2,12 +2,28 @@
 # coding: utf8
 
 import gzip, bz2
+import mmap
 import scat.util as util
 
 class FileIO:
-    def _open_file(self, fname):
+    def _close_file(self):
+        if self.mapped_buf is not None:
+            try:
+                self.mapped_view.release()
+                self.mapped_buf.close()
+            except BufferError:
+                # Slices handed out to the parsers are still alive, the
+                # mapping is closed once they are garbage collected
+                pass
+            self.mapped_buf = None
+            self.mapped_view = None
+
         if self.f:
             self.f.close()
+            self.f = None
+
+    def _open_file(self, fname):
+        self._close_file()
 
         if fname.find('.gz') > 0:
             self.f = gzip.open(fname, 'rb')
@@ -15,8 +31,16 @@ class FileIO:
             self.f = bz2.open(fname, 'rb')
         else:
             self.f = open(fname, 'rb')
+            if self.use_mmap:
+                try:
+                    self.mapped_buf = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.mapped_view = memoryview(self.mapped_buf)
+                except (ValueError, OSError):
+                    # Empty files and non-regular files can not be mapped
+                    self.mapped_buf = None
+        self.pos = 0
 
-    def __init__(self, fnames):
+    def __init__(self, fnames, use_mmap=True):
         self.fnames = fnames[:]
         self.fnames.reverse()
         self.fname = ''
@@ -24,19 +48,51 @@ class FileIO:
         self.f = None
         self.block_until_data = False
 
+        # Uncompressed dumps are memory-mapped, parsers may scan
+        # mapped_buf in place instead of reading it chunk by chunk
+        self.use_mmap = use_mmap
+        self.mapped_buf = None
+        self.mapped_view = None
+        self.pos = 0
+
         self.open_next_file()
 
     def read(self, read_size, decode_hdlc = False):
-        buf = b''
-        try:
-            buf = self.f.read(read_size)
-            buf = bytes(buf)
-        except:
-            return b''
+        if self.mapped_buf is not None:
+            buf = self.mapped_buf[self.pos:self.pos + read_size]
+            self.pos += len(buf)
+        else:
+            buf = b''
+            try:
+                buf = self.f.read(read_size)
+                buf = bytes(buf)
+            except:
+                return b''
         if decode_hdlc:
             buf = util.unwrap(buf)
         return buf
 
+    def read_view(self, read_size):
+        # Same as read(), but returns a memoryview into the mapping without
+        # copying when the file is memory-mapped
+        if self.mapped_buf is None:
+            return memoryview(self.read(read_size))
+
+        buf = self.mapped_view[self.pos:self.pos + read_size]
+        self.pos += len(buf)
+        return buf
+
+    def seek(self, pos):
+        if self.mapped_buf is not None:
+            self.pos = min(max(pos, 0), len(self.mapped_buf))
+        else:
+            self.f.seek(pos)
+
+    def tell(self):
+        if self.mapped_buf is not None:
+            return self.pos
+        return self.f.tell()
+
     def open_next_file(self):
         try:
             self.fname = self.fnames.pop()
@@ -53,5 +109,4 @@ class FileIO:
         self.read(read_size)
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self.f:
-            self.f.close()
+        self._close_file()
@@ -3,18 +3,31 @@
 
 import serial
 import scat.util as util
+from scat.iodevices.backoff import ReadBackoff
 
 class SerialIO:
     def __init__(self, port_name, baudrate=115200, rts=True, dsr=True):
-        self.port = serial.Serial(port_name, baudrate=baudrate, timeout=0.5, rtscts=rts, dsrdtr=dsr)
+        # Reads wait up to timeout for data, and return once the device
+        # pauses for inter_byte_timeout instead of waiting to fill the buffer
+        self.port = serial.Serial(port_name, baudrate=baudrate, timeout=0.5, inter_byte_timeout=0.01, rtscts=rts, dsrdtr=dsr)
         self.block_until_data = True
+        self.mapped_buf = None
+        self.backoff = ReadBackoff()
 
     def __enter__(self):
         return self
 
     def read(self, read_size, decode_hdlc = False):
         buf = b''
-        buf = self.port.read(read_size)
+        try:
+            buf = self.port.read(read_size)
+            if len(buf) == 0:
+                self.backoff.timeout()
+                return b''
+        except serial.SerialException as e:
+            self.backoff.error(e)
+            return b''
+        self.backoff.success()
         buf = bytes(buf)
         if decode_hdlc:
             buf = util.unwrap(buf)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import collections
+import threading
+import errno
+import ctypes
+import time
+import logging
+
+import usb
+
+from scat.iodevices.backoff import ReadBackoff
+
+def is_usb_timeout(e):
+    return isinstance(e, usb.core.USBTimeoutError) or e.errno == errno.ETIMEDOUT
+
+def is_usb_disconnect(e):
+    return e.errno == errno.ENODEV
+
+class BulkReaderStats:
+    def __init__(self):
+        self.num_bytes = 0
+        self.num_transfers = 0
+        self.num_empty = 0
+        self.num_timeouts = 0
+        self.num_errors = 0
+        self.start_time = time.monotonic()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.start_time
+        return {'bytes': self.num_bytes, 'transfers': self.num_transfers,
+            'empty': self.num_empty, 'timeouts': self.num_timeouts,
+            'errors': self.num_errors, 'elapsed': elapsed,
+            'mbytes_per_sec': self.num_bytes / elapsed / 1e6 if elapsed > 0 else 0.0}
+
+    def stats_str(self):
+        stats = self.stats()
+        return '{} bytes in {} transfers, {:.2f} s ({:.2f} MB/s), {} empty, {} timeouts, {} errors'.format(
+            stats['bytes'], stats['transfers'], stats['elapsed'], stats['mbytes_per_sec'],
+            stats['empty'], stats['timeouts'], stats['errors'])
+
+class AsyncBulkReader(BulkReaderStats):
+    """Keeps queue_depth bulk IN transfers of read_size bytes submitted at
+    once through the libusb 1.0 asynchronous API.
+
+    Transfers on one endpoint complete in submission order. Each completed
+    transfer is copied out and immediately resubmitted, and a thread runs
+    the libusb event loop.
+
+    This relies on private pyusb internals, checked by check_backend()
+    before use. NotImplementedError is raised if they are missing, so
+    that callers can fall back to ThreadedBulkReader.
+    """
+
+    # pyusb versions whose internals are known to match, (min, max)
+    pyusb_versions = ((1, 0), (1, 3))
+    libusb1_names = ('_LibUSB', '_libusb_transfer', '_libusb_transfer_cb_fn_p',
+        '_LIBUSB_TRANSFER_TYPE_BULK', 'LIBUSB_TRANSFER_COMPLETED', 'LIBUSB_TRANSFER_TIMED_OUT',
+        'LIBUSB_TRANSFER_CANCELLED', 'LIBUSB_TRANSFER_NO_DEVICE')
+    transfer_fields = ('dev_handle', 'endpoint', 'type', 'timeout', 'status', 'length',
+        'actual_length', 'callback', 'buffer', 'num_iso_packets')
+
+    @classmethod
+    def check_backend(cls, dev):
+        # Returns the libusb1 backend module if dev can be used
+        try:
+            version = tuple(int(x) for x in usb.__version__.split('.')[:2])
+        except (AttributeError, ValueError):
+            raise NotImplementedError('Unknown pyusb version')
+        if not cls.pyusb_versions[0] <= version <= cls.pyusb_versions[1]:
+            raise NotImplementedError('Asynchronous transfers not tested with pyusb {}'.format(usb.__version__))
+
+        from usb.backend import libusb1
+        missing = [x for x in cls.libusb1_names if not hasattr(libusb1, x)]
+        if len(missing) > 0:
+            raise NotImplementedError('pyusb libusb1 backend lacks {}'.format(', '.join(missing)))
+        fields = [x[0] for x in libusb1._libusb_transfer._fields_]
+        missing = [x for x in cls.transfer_fields if x not in fields]
+        if len(missing) > 0:
+            raise NotImplementedError('libusb transfer lacks {}'.format(', '.join(missing)))
+
+        ctx = getattr(dev, '_ctx', None)
+        if ctx is None or not hasattr(ctx, 'backend') or not hasattr(ctx, 'managed_open'):
+            raise NotImplementedError('pyusb device lacks the resource manager')
+        if not isinstance(ctx.backend, libusb1._LibUSB):
+            raise NotImplementedError('Asynchronous transfers need the libusb 1.0 backend')
+        return libusb1
+
+    def __init__(self, dev, endpoint, read_size=0x4000, queue_depth=8, timeout=1000):
+        BulkReaderStats.__init__(self)
+        libusb1 = self.check_backend(dev)
+
+        self.libusb1 = libusb1
+        self.backend = dev._ctx.backend
+        self.lib = self.backend.lib
+        self.handle = dev._ctx.managed_open()
+
+        self.completed = collections.deque()
+        self.cond = threading.Condition()
+        self.running = True
+        self.in_flight = 0
+
+        self.callback = libusb1._libusb_transfer_cb_fn_p(self._callback)
+        self.buffers = []
+        self.transfers = []
+        for i in range(queue_depth):
+            buf = (ctypes.c_ubyte * read_size)()
+            transfer = self.lib.libusb_alloc_transfer(0)
+            t = transfer.contents
+            t.dev_handle = self.handle.handle
+            t.endpoint = endpoint
+            t.type = libusb1._LIBUSB_TRANSFER_TYPE_BULK
+            t.timeout = timeout
+            t.length = read_size
+            t.buffer = ctypes.addressof(buf)
+            t.callback = self.callback
+            t.num_iso_packets = 0
+            self.buffers.append(buf)
+            self.transfers.append(transfer)
+
+        for transfer in self.transfers:
+            self._submit(transfer)
+
+        self.thread = threading.Thread(target=self._run, name='scat-usb', daemon=True)
+        self.thread.start()
+
+    def _submit(self, transfer):
+        if self.lib.libusb_submit_transfer(transfer) == 0:
+            self.in_flight += 1
+            return True
+        self.num_errors += 1
+        return False
+
+    def _callback(self, transfer):
+        # Called from libusb_handle_events() in the event thread
+        t = transfer.contents
+        self.in_flight -= 1
+        status = t.status
+
+        if t.actual_length > 0:
+            data = ctypes.string_at(t.buffer, t.actual_length)
+            with self.cond:
+                self.completed.append(data)
+                self.cond.notify()
+            self.num_bytes += t.actual_length
+            self.num_transfers += 1
+        elif status == self.libusb1.LIBUSB_TRANSFER_COMPLETED:
+            self.num_empty += 1
+
+        if status == self.libusb1.LIBUSB_TRANSFER_TIMED_OUT:
+            self.num_timeouts += 1
+        elif status not in (self.libusb1.LIBUSB_TRANSFER_COMPLETED, self.libusb1.LIBUSB_TRANSFER_CANCELLED):
+            self.num_errors += 1
+            if status == self.libusb1.LIBUSB_TRANSFER_NO_DEVICE:
+                self.running = False
+
+        if self.running and status != self.libusb1.LIBUSB_TRANSFER_CANCELLED:
+            self._submit(transfer)
+
+    def _run(self):
+        while self.in_flight > 0:
+            if self.lib.libusb_handle_events(self.backend.ctx) < 0:
+                self.num_errors += 1
+                break
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+    def read(self, timeout=0.5):
+        # Next completed buffer in order, b'' on timeout
+        with self.cond:
+            if not self.cond.wait_for(lambda: len(self.completed) > 0 or not self.running, timeout):
+                return b''
+            if len(self.completed) == 0:
+                return b''
+            return self.completed.popleft()
+
+    def stop(self):
+        self.running = False
+        for transfer in self.transfers:
+            self.lib.libusb_cancel_transfer(transfer)
+        self.thread.join(2.0)
+        if not self.thread.is_alive():
+            for transfer in self.transfers:
+                self.lib.libusb_free_transfer(transfer)
+        self.transfers = []
+
+class ThreadedBulkReader(BulkReaderStats):
+    """Fallback for backends without asynchronous transfers: a thread
+    issues blocking reads back to back, so that one transfer is always
+    pending while the parser runs. Up to queue_depth buffers are held."""
+
+    def __init__(self, r_handle, read_size=0x4000, queue_depth=8, timeout=1000):
+        BulkReaderStats.__init__(self)
+        self.r_handle = r_handle
+        self.read_size = read_size
+        self.timeout = timeout
+        self.queue_depth = queue_depth
+
+        self.completed = collections.deque()
+        self.cond = threading.Condition()
+        self.running = True
+        self.backoff = ReadBackoff()
+
+        self.thread = threading.Thread(target=self._run, name='scat-usb', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            self._read_loop()
+        except usb.core.USBError as e:
+            logging.getLogger('scat.usbio').log(logging.ERROR, 'USB read failed: {}'.format(e))
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                buf = bytes(self.r_handle.read(self.read_size, self.timeout))
+            except usb.core.USBError as e:
+                if is_usb_timeout(e):
+                    self.num_timeouts += 1
+                    self.backoff.timeout()
+                    continue
+                self.num_errors += 1
+                if is_usb_disconnect(e):
+                    raise
+                self.backoff.error(e)
+                continue
+            self.backoff.success()
+
+            if len(buf) == 0:
+                self.num_empty += 1
+                continue
+            self.num_bytes += len(buf)
+            self.num_transfers += 1
+
+            with self.cond:
+                self.cond.wait_for(lambda: len(self.completed) < self.queue_depth or not self.running)
+                self.completed.append(buf)
+                self.cond.notify_all()
+
+    def read(self, timeout=0.5):
+        with self.cond:
+            if not self.cond.wait_for(lambda: len(self.completed) > 0 or not self.running, timeout):
+                return b''
+            if len(self.completed) == 0:
+                return b''
+            buf = self.completed.popleft()
+            self.cond.notify_all()
+            return buf
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(2.0)
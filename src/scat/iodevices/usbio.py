@@ -3,23 +3,43 @@
 
 import usb
 import scat.util as util
+from scat.iodevices.usbasync import AsyncBulkReader, ThreadedBulkReader, is_usb_timeout, is_usb_disconnect
+from scat.iodevices.backoff import ReadBackoff
 import logging
 
 class USBIO:
     def __init__(self):
         self.usb_dev = None
         self.block_until_data = True
+        self.mapped_buf = None
+        self.bulk_reader = None
+        self.backoff = ReadBackoff()
 
     def __enter__(self):
         return self
 
     def read(self, read_size, decode_hdlc = False):
         buf = b''
-        try:
-            buf = self.r_handle.read(read_size)
-            buf = bytes(buf)
-        except usb.core.USBError:
-            return b''
+        if self.bulk_reader is not None:
+            # Returns one completed transfer regardless of read_size
+            buf = self.bulk_reader.read()
+            if len(buf) == 0 and not self.bulk_reader.running:
+                raise usb.core.USBError('USB transfers stopped, device disconnected?')
+        else:
+            # Timeouts already waited for data, errors are retried with
+            # backoff until the device is considered disconnected
+            try:
+                buf = self.r_handle.read(read_size)
+                buf = bytes(buf)
+            except usb.core.USBError as e:
+                if is_usb_timeout(e):
+                    self.backoff.timeout()
+                elif is_usb_disconnect(e):
+                    raise
+                else:
+                    self.backoff.error(e)
+                return b''
+            self.backoff.success()
         if decode_hdlc:
             buf = util.unwrap(buf)
         return buf
@@ -77,10 +97,29 @@ class USBIO:
                 lambda e: usb.util.endpoint_direction(e.bEndpointAddress) ==
                 usb.util.ENDPOINT_IN)
 
+    def start_async(self, read_size=0x4000, queue_depth=8):
+        # Keeps queue_depth transfers of read_size bytes pending on the
+        # DIAG IN endpoint, read() then returns completed transfers in order
+        logger = logging.getLogger('scat.usbio')
+        try:
+            self.bulk_reader = AsyncBulkReader(self.dev, self.r_handle.bEndpointAddress, read_size, queue_depth)
+        except (NotImplementedError, AttributeError, usb.core.USBError) as e:
+            logger.log(logging.WARNING, 'Asynchronous USB transfers not available ({}), using a reader thread'.format(e))
+            self.bulk_reader = ThreadedBulkReader(self.r_handle, read_size, queue_depth)
+
+    def stop_async(self):
+        if self.bulk_reader is None:
+            return
+        self.bulk_reader.stop()
+        logger = logging.getLogger('scat.usbio')
+        logger.log(logging.INFO, 'USB: {}'.format(self.bulk_reader.stats_str()))
+        self.bulk_reader = None
+
     def set_configuration(self, config):
         self.dev.set_configuration(config)
 
     def __exit__(self, exc_type, exc_value, traceback):
+        self.stop_async()
         if self.usb_dev is not None:
             usb.util.dispose_resources(self.usb_dev)
 
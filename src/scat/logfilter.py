@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import collections
+
+class LogFilter:
+    """Include/exclude filter on packet IDs, checked from the packet header
+    before a packet is unescaped, CRC checked or decoded.
+
+    With an include list only the listed IDs pass, IDs on the exclude list
+    never pass. Skipped packets are counted per ID.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        self.include = frozenset(include) if include else None
+        self.exclude = frozenset(exclude) if exclude else frozenset()
+        self.num_passed = 0
+        self.skipped = collections.Counter()
+
+    def accept(self, pkt_id):
+        if pkt_id in self.exclude or (self.include is not None and pkt_id not in self.include):
+            self.skipped[pkt_id] += 1
+            return False
+        self.num_passed += 1
+        return True
+
+    def reset(self):
+        self.num_passed = 0
+        self.skipped = collections.Counter()
+
+    def merge(self, stats):
+        self.num_passed += stats['passed']
+        self.skipped.update(stats['skipped'])
+
+    def stats(self):
+        return {'passed': self.num_passed, 'skipped': dict(self.skipped)}
+
+    def stats_str(self):
+        skipped = ', '.join('{:#06x}: {}'.format(x, y) for x, y in self.skipped.most_common())
+        return '{} passed, {} skipped{}'.format(self.num_passed,
+            sum(self.skipped.values()), ' ({})'.format(skipped) if skipped else '')
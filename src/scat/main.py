@@ -4,22 +4,34 @@
 import scat.iodevices
 import scat.writers
 import scat.parsers
+import scat.multifile
+from scat.pipeline import CapturePipeline, BoundedQueue
 
 import os, sys
 import argparse
+import functools
 import signal
 import faulthandler
 import logging
 
 current_parser = None
+current_pipeline = None
+current_io_device = None
+current_writers = []
 logger = logging.getLogger('scat')
 
 if os.name != 'nt':
     faulthandler.register(signal.SIGUSR1)
 
 def sigint_handler(signal, frame):
-    global current_parser
+    global current_parser, current_pipeline, current_io_device, current_writers
+    if current_pipeline is not None:
+        current_pipeline.stop()
+    if isinstance(current_io_device, scat.iodevices.USBIO):
+        current_io_device.stop_async()
     current_parser.stop_diag()
+    for writer in current_writers:
+        writer.__exit__(None, None, None)
     sys.exit(0)
 
 def hexint(string):
@@ -28,6 +40,25 @@ def hexint(string):
     else:
         return int(string)
 
+def hexint_list(string):
+    return [hexint(x.strip()) for x in string.split(',') if len(x.strip()) > 0]
+
+def open_output(args, factory, filename):
+    # Output files are split into segments if any rotation limit is given
+    if args.rotate_size or args.rotate_seconds or args.rotate_packets:
+        return scat.writers.RotatingWriter(factory, filename,
+            args.rotate_size * 1048576 if args.rotate_size else None,
+            args.rotate_seconds, args.rotate_packets, args.compress)
+    return factory(filename)
+
+def read_log_ids(fname):
+    # One or more comma separated IDs per line, # starts a comment
+    log_ids = []
+    with open(fname, 'r') as f:
+        for line in f:
+            log_ids += hexint_list(line.split('#')[0])
+    return log_ids
+
 class ListUSBAction(argparse.Action):
     # List USB devices and then exit
     def __call__(self, parser, namespace, values, option_string=None):
@@ -35,7 +66,7 @@ class ListUSBAction(argparse.Action):
         parser.exit()
 
 def scat_main():
-    global current_parser
+    global current_parser, current_pipeline, current_io_device, current_writers
     # Load parser modules
     parser_dict = {}
     for parser_module in dir(scat.parsers):
@@ -70,6 +101,9 @@ def scat_main():
     usb_group.add_argument('-a', '--address', help='Specify USB device address(bus:address)', type=str)
     usb_group.add_argument('-c', '--config', help='Specify USB configuration number for DM port', type=int, default=-1)
     usb_group.add_argument('-i', '--interface', help='Specify USB interface number for DM port', type=int, default=2)
+    usb_group.add_argument('--usb-async', action='store_true', help='Keep several USB transfers pending at once while capturing')
+    usb_group.add_argument('--usb-read-size', help='Size of each pending USB transfer with --usb-async', type=hexint, default=0x4000)
+    usb_group.add_argument('--usb-queue-depth', help='Number of pending USB transfers with --usb-async', type=int, default=8)
 
     if 'qc' in parser_dict.keys():
         qc_group = parser.add_argument_group('Qualcomm specific settings')
@@ -78,6 +112,8 @@ def scat_main():
         qc_group.add_argument('--qsr4-hash', help='Specify QSR4 message hash file (need to obtain from the device firmware), implies --msgs', type=str)
         qc_group.add_argument('--events', action='store_true', help='Decode Events as GSMTAP logging')
         qc_group.add_argument('--msgs', action='store_true', help='Decode Extended Message Reports and QSR Message Reports as GSMTAP logging')
+        qc_group.add_argument('--capability-cache', help='File caching DIAG message ranges and levels per firmware build (default: %(default)s)', type=str, default=scat.parsers.qualcomm.capcache.default_filename())
+        qc_group.add_argument('--no-capability-cache', action='store_true', help='Always query DIAG message ranges and levels from the device')
 
     if 'sec' in parser_dict.keys():
         sec_group = parser.add_argument_group('Samsung specific settings')
@@ -92,12 +128,45 @@ def scat_main():
         except argparse.ArgumentError:
             pass
 
+    crc_group = parser.add_argument_group('CRC settings (Qualcomm, HiSilicon)')
+    crc_group.add_argument('--crc', help='CRC16 check policy: always, sampled (check 1 in --crc-sample frames), off (trusted dumps)', choices=['always', 'sampled', 'off'], default='always')
+    crc_group.add_argument('--crc-sample', help='Check CRC16 of 1 in N frames when --crc sampled is used', type=int, default=100)
+
+    mask_group = parser.add_argument_group('Log mask settings (Qualcomm, Samsung, serial/USB only)')
+    mask_group.add_argument('--log-profile', help='Log items enabled on the device (default: full, or only --log-ids if given)', choices=['signaling-only', 'rrc+nas', 'meas', 'full'])
+    mask_group.add_argument('--log-ids', help='Comma separated log IDs to enable in addition to --log-profile, e.g. 0xB0C0 (Qualcomm) or 0x0252 (Samsung, group << 8 | item)', type=hexint_list, default=[])
+    mask_group.add_argument('--log-ids-file', help='File with log IDs to enable, as in --log-ids')
+
+    filter_group = parser.add_argument_group('Decoding filter (Qualcomm, Samsung)')
+    filter_group.add_argument('--include-ids', help='Comma separated IDs to decode, all other packets are skipped before decoding: log IDs or command codes (Qualcomm), group << 8 | command (Samsung)', type=hexint_list, default=[])
+    filter_group.add_argument('--exclude-ids', help='Comma separated IDs skipped before decoding, as in --include-ids', type=hexint_list, default=[])
+
+    dump_group = parser.add_argument_group('Dump settings')
+    dump_group.add_argument('-j', '--jobs', help='Parse dumps with N worker processes: several dump files in parallel, or chunks of a single uncompressed QMDL file', type=int, default=1)
+    dump_group.add_argument('--merge', help='Output order of parallel parsed dump files: timestamp (merged by device timestamp), file (file by file)', choices=['timestamp', 'file'], default='timestamp')
+
+    pipeline_group = parser.add_argument_group('Pipeline settings (serial/USB only)')
+    pipeline_group.add_argument('--pipeline', action='store_true', help='Read, decode and write in separate threads connected by bounded queues')
+    pipeline_group.add_argument('--read-queue', help='Maximum number of frames held between reader and decoder', type=int, default=1024)
+    pipeline_group.add_argument('--write-queue', help='Maximum number of packets held between decoder and writer', type=int, default=4096)
+    pipeline_group.add_argument('--overflow', help='Policy when the read queue is full: block, drop-oldest (drop the oldest frame), drop-class (drop frames with --drop-ids first). Frames are dropped before decoding, the write queue always blocks', choices=BoundedQueue.policies, default='block')
+    pipeline_group.add_argument('--drop-ids', help='Comma separated IDs dropped first by --overflow drop-class, as in --include-ids', type=hexint_list, default=[])
+
     ip_group = parser.add_argument_group('GSMTAP IP settings')
     ip_group.add_argument('-P', '--port', help='Change UDP port to emit GSMTAP packets', type=int, default=4729)
     ip_group.add_argument('--port-up', help='Change UDP port to emit user plane packets', type=int, default=47290)
     ip_group.add_argument('-H', '--hostname', help='Change base host name/IP to emit GSMTAP packets. For dual SIM devices the subsequent IP address will be used.', type=str, default='127.0.0.1')
 
     ip_group.add_argument('-F', '--pcap-file', help='Write GSMTAP packets directly to specified PCAP file')
+    ip_group.add_argument('--pcapng-file', help='Write packets to specified PCAPNG file, with one interface per radio and plane and nanosecond timestamps')
+    ip_group.add_argument('--pcapng-udp', action='store_true', help='Wrap GSMTAP packets in IPv4/UDP in the PCAPNG file instead of exported PDU framing')
+    ip_group.add_argument('--pcapng-comments', action='store_true', help='Store text output as packet comments in the PCAPNG file')
+
+    rotate_group = parser.add_argument_group('Output rotation settings (-F, --pcapng-file, --qmdl, --sdmraw)')
+    rotate_group.add_argument('--rotate-size', help='Start a new output file after N MiB', type=int)
+    rotate_group.add_argument('--rotate-seconds', help='Start a new output file after N seconds', type=int)
+    rotate_group.add_argument('--rotate-packets', help='Start a new output file after N packets', type=int)
+    rotate_group.add_argument('--compress', help='Compress finished segments of rotated output files in the background', choices=['gzip', 'xz'])
 
     args = parser.parse_args()
 
@@ -135,11 +204,18 @@ def scat_main():
         sys.exit(0)
 
     # Writer preparation
-    if args.pcap_file == None:
+    if args.pcapng_file != None:
+        writer = open_output(args, functools.partial(scat.writers.PcapngWriter,
+            port_cp=GSMTAP_PORT, port_up=IP_OVER_UDP_PORT,
+            udp_framing=args.pcapng_udp, comments=args.pcapng_comments), args.pcapng_file)
+    elif args.pcap_file == None:
         writer = scat.writers.SocketWriter(GSMTAP_IP, GSMTAP_PORT, IP_OVER_UDP_PORT)
     else:
-        writer = scat.writers.PcapWriter(args.pcap_file, GSMTAP_PORT, IP_OVER_UDP_PORT)
+        writer = open_output(args, functools.partial(scat.writers.PcapWriter,
+            port_cp=GSMTAP_PORT, port_up=IP_OVER_UDP_PORT), args.pcap_file)
 
+    current_io_device = io_device
+    current_writers.append(writer)
     current_parser = parser_dict[args.type]
     current_parser.set_io_device(io_device)
     current_parser.set_writer(writer)
@@ -160,14 +236,31 @@ def scat_main():
             'qsr-hash': args.qsr_hash,
             'qsr4-hash': args.qsr4_hash,
             'events': args.events,
-            'msgs': args.msgs})
+            'msgs': args.msgs,
+            'crc-policy': args.crc,
+            'crc-sample': args.crc_sample,
+            'jobs': args.jobs})
+        if (args.serial or args.usb) and not args.no_capability_cache:
+            current_parser.set_parameter({'capability-cache': args.capability_cache})
     elif args.type == 'sec':
         current_parser.set_parameter({
             'model': args.model,
             'start-magic': args.start_magic})
     elif args.type == 'hisi':
         current_parser.set_parameter({
-            'msgs': args.msgs})
+            'msgs': args.msgs,
+            'crc-policy': args.crc,
+            'crc-sample': args.crc_sample})
+
+    if args.type in ('qc', 'sec'):
+        log_ids = args.log_ids
+        if args.log_ids_file:
+            log_ids = log_ids + read_log_ids(args.log_ids_file)
+        current_parser.set_parameter({
+            'log-profile': args.log_profile,
+            'log-ids': log_ids,
+            'include-ids': args.include_ids,
+            'exclude-ids': args.exclude_ids})
 
     # Run process
     if args.serial or args.usb:
@@ -175,21 +268,53 @@ def scat_main():
         current_parser.init_diag()
         current_parser.prepare_diag()
 
-        signal.signal(signal.SIGINT, sigint_handler)
+        if args.usb and args.usb_async:
+            io_device.start_async(args.usb_read_size, args.usb_queue_depth)
 
-        if not (args.qmdl == None) and args.type == 'qc':
-            current_parser.run_diag(scat.writers.RawWriter(args.qmdl))
-        if not (args.sdmraw == None) and args.type == 'sec':
-            current_parser.run_diag(scat.writers.RawWriter(args.sdmraw))
-        else:
-            current_parser.run_diag()
+        if args.pipeline and hasattr(current_parser, 'get_framer'):
+            current_pipeline = CapturePipeline(current_parser, args.read_queue,
+                args.write_queue, args.overflow, args.drop_ids)
+            current_pipeline.start()
 
-        current_parser.stop_diag()
+        signal.signal(signal.SIGINT, sigint_handler)
+
+        device_error = None
+        try:
+            if not (args.qmdl == None) and args.type == 'qc':
+                raw_writer = open_output(args, scat.writers.RawWriter, args.qmdl)
+                current_writers.append(raw_writer)
+                current_parser.run_diag(raw_writer)
+            if not (args.sdmraw == None) and args.type == 'sec':
+                raw_writer = open_output(args, scat.writers.RawWriter, args.sdmraw)
+                current_writers.append(raw_writer)
+                current_parser.run_diag(raw_writer)
+            else:
+                current_parser.run_diag()
+        except IOError as e:
+            # Raised by the I/O device once it is considered disconnected
+            device_error = e
+            logger.log(logging.ERROR, 'Device error: {}'.format(e))
+
+        if current_pipeline is not None:
+            current_pipeline.stop()
+            current_pipeline = None
+        if args.usb:
+            io_device.stop_async()
+        logger.log(logging.INFO, 'Device reads: {}'.format(io_device.backoff.stats_str()))
+        if device_error is None:
+            current_parser.stop_diag()
     elif args.dump:
-        current_parser.read_dump()
+        if args.jobs > 1 and len(args.dump) > 1:
+            scat.multifile.read_dumps_parallel(current_parser, args.dump, args.jobs, args.merge)
+        else:
+            current_parser.read_dump()
     else:
         assert('Invalid input handler?')
         sys.exit(0)
 
+    # Writes out packets still buffered by the writers
+    for writer in current_writers:
+        writer.__exit__(None, None, None)
+
 if __name__ == '__main__':
     scat_main()
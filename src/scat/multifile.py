@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import multiprocessing
+import tempfile
+import pickle
+import heapq
+import logging
+import os
+
+from scat.iodevices import FileIO
+from scat.parsers.qualcomm.parallel import apply_state, imap_bounded, load_results
+
+class MergeKeys:
+    """Passes parse results on to emit as (key, parse_result) pairs.
+
+    The key is the device timestamp of the result. Results without one
+    share the key of the closest preceding result, or of the first
+    timestamped result of the file. Files without timestamps sort first.
+    Only results before the first timestamp are held back.
+    """
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.last_key = None
+        self.leading = []
+
+    def append(self, parse_result):
+        if 'ts' in parse_result and parse_result['ts'] is not None:
+            self.last_key = (1, parse_result['ts'])
+        elif 'device_ts' in parse_result:
+            self.last_key = (1, parse_result['device_ts'])
+
+        if self.last_key is None:
+            self.leading.append(parse_result)
+            return
+        if len(self.leading) > 0:
+            for x in self.leading:
+                self.emit((self.last_key, x))
+            self.leading = []
+        self.emit((self.last_key, parse_result))
+
+    def finish(self):
+        for x in self.leading:
+            self.emit(((0, 0), x))
+        self.leading = []
+
+def _scan_file_state(args):
+    # Runs only the log packets updating the serving cell state and
+    # returns the fields they changed, as parallel.run_parallel does
+    # for chunks of one file
+    parser_class, params, fname = args
+    parser = parser_class()
+    parser.set_parameter({x: params[x] for x in params if x not in ('events', 'msgs', 'qsr-hash', 'qsr4-hash')})
+    parser.logger.setLevel(logging.ERROR)
+    parser.process = {x: parser.process[x] for x in parser.state_log_ids if x in parser.process}
+    parser.no_process = {}
+    if hasattr(parser, 'process_nested'):
+        # Nested HiSilicon packets do not update the state
+        parser.process_nested = {}
+    parser.set_state(parser.empty_state())
+    parser.postprocess_parse_result = lambda x: None
+
+    parser.set_io_device(FileIO([fname]))
+    try:
+        parser.read_dump()
+    finally:
+        parser.io_device.__exit__(None, None, None)
+    return parser.get_state()
+
+def _read_file(args):
+    # Stores the keyed results of a whole file in result_fname, so that
+    # no process holds all results of a file in memory
+    parser_class, params, state, fname, result_fname = args
+    parser = parser_class()
+    parser.set_parameter(params)
+    if state is not None:
+        parser.set_state(state)
+
+    parser.set_io_device(FileIO([fname]))
+    with open(result_fname, 'wb') as f:
+        pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+        keys = MergeKeys(pickler.dump)
+        parser.postprocess_parse_result = keys.append
+        try:
+            parser.read_dump()
+        finally:
+            parser.io_device.__exit__(None, None, None)
+        keys.finish()
+    return result_fname
+
+def read_dumps_parallel(parser, fnames, jobs, order='timestamp'):
+    """Parses several dump files with a pool of worker processes.
+
+    Each worker decompresses and parses a whole file and stores its
+    results in a temporary file, from which they are streamed back. With
+    order 'timestamp', the results of all files are merged by device
+    timestamp, keeping the order of results within each file. With order
+    'file', the results are written file by file, in the order the files
+    were given.
+
+    A first pass over all files collects the serving cell state each file
+    leaves behind, so that every file is parsed from the state the
+    sequential reader would have had. At most two files per job are parsed
+    ahead of the output in file order.
+    """
+    logger = logging.getLogger('scat.multifile')
+    params = parser.get_worker_parameters()
+
+    with multiprocessing.Pool(jobs) as pool, tempfile.TemporaryDirectory(prefix='scat-') as tmpdir:
+        deltas = pool.map(_scan_file_state, [(type(parser), params, x) for x in fnames])
+
+        tasks = []
+        state = parser.get_state()
+        for i, (fname, delta) in enumerate(zip(fnames, deltas)):
+            tasks.append((type(parser), params, state, fname, os.path.join(tmpdir, '{:05d}.results'.format(i))))
+            state = apply_state(state, delta)
+
+        if order == 'file':
+            for result_fname in imap_bounded(pool, _read_file, tasks, 2 * jobs):
+                for key, parse_result in load_results(result_fname):
+                    parser.postprocess_parse_result(parse_result)
+        else:
+            streams = [load_results(x) for x in pool.imap(_read_file, tasks)]
+            for key, parse_result in heapq.merge(*streams, key=lambda x: x[0]):
+                parser.postprocess_parse_result(parse_result)
+
+    parser.set_state(state)
+    logger.log(logging.INFO, 'Read {} files with {} jobs, {} order'.format(len(fnames), jobs, order))
@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
 # coding: utf8
 
+from scat.hdlc import HdlcFramer, CrcChecker
 import scat.util as util
 import struct
 import logging
 import binascii
-from collections import namedtuple
 
 from scat.parsers.hisilicon.hisilogparser import HisiLogParser
 from scat.parsers.hisilicon.hisinestedparser import HisiNestedParser
 
 class HisiliconParser:
+    # Serving cell state carried from one packet to the next
+    state_fields = ('gsm_last_cell_id', 'gsm_last_arfcn',
+        'umts_last_cell_id', 'umts_last_psc', 'umts_last_uarfcn_dl', 'umts_last_uarfcn_ul',
+        'lte_last_cell_id', 'lte_last_pci', 'lte_last_earfcn_dl', 'lte_last_earfcn_ul',
+        'lte_last_earfcn_tdd', 'lte_last_sfn', 'lte_last_tx_ant',
+        'lte_last_bw_dl', 'lte_last_bw_ul', 'lte_last_band_ind')
 
     def __init__(self):
         self.gsm_last_cell_id = [0, 0]
@@ -34,6 +40,7 @@ class HisiliconParser:
 
         self.io_device = None
         self.writer = None
+        self.crc_checker = CrcChecker()
 
         self.name = 'hisilicon'
         self.shortname = 'hisi'
@@ -43,6 +50,7 @@ class HisiliconParser:
         self.diag_log_parsers = [HisiLogParser(self)]
         self.process = { }
         self.no_process = { }
+        self.state_log_ids = set()
 
         for p in self.diag_log_parsers:
             self.process.update(p.process)
@@ -50,6 +58,10 @@ class HisiliconParser:
                 self.no_process.update(p.no_process)
             except AttributeError:
                 pass
+            try:
+                self.state_log_ids.update(p.state_log_ids)
+            except AttributeError:
+                pass
 
         self.diag_nested_parsers = [HisiNestedParser(self)]
         self.process_nested = { }
@@ -74,9 +86,30 @@ class HisiliconParser:
         for p in params:
             if p == 'log_level':
                 self.logger.setLevel(params[p])
+            elif p == 'crc-policy':
+                self.crc_checker.set_policy(params[p])
+            elif p == 'crc-sample':
+                self.crc_checker.set_policy(self.crc_checker.policy, params[p])
             elif p == 'msgs':
                 self.msgs = params[p]
 
+    def get_worker_parameters(self):
+        # Parameters for the parsers of the parallel decoding workers
+        return {'log_level': self.logger.level,
+            'crc-policy': self.crc_checker.policy,
+            'crc-sample': self.crc_checker.sample_interval,
+            'msgs': self.msgs}
+
+    def get_state(self):
+        return {x: list(getattr(self, x)) for x in self.state_fields}
+
+    def empty_state(self):
+        return {x: [None] * len(getattr(self, x)) for x in self.state_fields}
+
+    def set_state(self, state):
+        for x in self.state_fields:
+            setattr(self, x, list(state[x]))
+
     def init_diag(self):
         pass
 
@@ -91,12 +124,12 @@ class HisiliconParser:
             pkt = util.unwrap(pkt)
 
         if check_crc:
-            crc = util.dm_crc16(pkt[:-2])
             crc_pkt = (pkt[-1] << 8) | pkt[-2]
-            if crc != crc_pkt:
+            pkt = pkt[:-2]
+            if not self.crc_checker.check_body(pkt, crc_pkt):
+                crc = util.dm_crc16(pkt)
                 self.logger.log(logging.WARNING, "CRC mismatch: expected 0x{:04x}, got 0x{:04x}".format(crc, crc_pkt))
                 self.logger.log(logging.DEBUG, util.xxd(pkt))
-            pkt = pkt[:-2]
 
         return self.parse_diag_log(pkt)
 
@@ -106,41 +139,44 @@ class HisiliconParser:
     def stop_diag(self):
         pass
 
-    def run_dump(self):
-        self.logger.log(logging.INFO, 'Starting diag from dump')
+    def read_frames(self, framer):
+        if self.io_device.mapped_buf is not None:
+            # Memory-mapped dump, scan it in place
+            # Dumps may end without the trailing 0x7e
+            yield from framer.scan(self.io_device.mapped_buf, with_tail=True)
+            return
 
-        oldbuf = b''
         loop = True
-        cur_pos = 0
-        try:
-            while loop:
-                buf = self.io_device.read(0x90000)
-                if len(buf) == 0:
-                    if self.io_device.block_until_data:
-                        continue
-                    else:
-                        loop = False
-
-                last_pkt_pos = buf.rfind(b'\x7e')
-                if last_pkt_pos > 0:
-                    buf_t = oldbuf + buf[0:last_pkt_pos]
-                    oldbuf = buf[last_pkt_pos:]
-                    buf = buf_t
+        while loop:
+            buf = self.io_device.read(0x90000)
+            if len(buf) == 0:
+                if self.io_device.block_until_data:
+                    continue
                 else:
-                    buf = oldbuf + buf
+                    loop = False
+            framer.feed(buf)
+            yield from framer.frames()
 
-                buf_atom = buf.split(b'\x7e')
+        last_pkt = framer.flush()
+        if last_pkt is not None:
+            yield last_pkt
 
-                for pkt in buf_atom:
-                    if len(pkt) == 0:
-                        continue
-                    parse_result = self.parse_diag(pkt)
+    def run_dump(self):
+        self.logger.log(logging.INFO, 'Starting diag from dump')
+
+        framer = HdlcFramer()
+        try:
+            for pkt in self.read_frames(framer):
+                parse_result = self.parse_diag(pkt)
 
-                    if parse_result is not None:
-                        self.postprocess_parse_result(parse_result)
+                if parse_result is not None:
+                    self.postprocess_parse_result(parse_result)
 
         except KeyboardInterrupt:
             return
+        finally:
+            self.logger.log(logging.INFO, 'Framing: {}'.format(framer.stats_str()))
+            self.logger.log(logging.INFO, 'CRC: {}'.format(self.crc_checker.stats_str()))
 
     def read_dump(self):
         while self.io_device.file_available:
@@ -175,30 +211,35 @@ class HisiliconParser:
             if len(parse_result['stdout']) > 0:
                 for l in parse_result['stdout'].split('\n'):
                     print('Radio {}: {}'.format(radio_id, l))
+                # Writers able to store text, e.g. as pcapng comments
+                write_comment = getattr(self.writer, 'write_comment', None)
+                if write_comment is not None:
+                    write_comment(parse_result['stdout'], radio_id, ts)
 
-    log_header = namedtuple('HisiLogHeader', 'unk2 ts unk3 cmd len')
-    type_0x01_header = namedtuple('Hisi0x01Header', 'unk1 unk2 magic nested_len1 cmd nested_len2 ts')
+    log_header = util.Layout('HisiLogHeader', 'unk2 ts unk3 cmd len', '<LQLLL')
+    type_0x01_header = util.Layout('Hisi0x01Header', 'unk1 unk2 magic nested_len1 cmd nested_len2 ts', '<LLLHLHQ')
 
     def parse_diag_log(self, pkt, args=None):
         if pkt[0] == 0x00:
             if len(pkt) < 25:
                 return
-            pkt_header = self.log_header._make(struct.unpack('<LQLLL', pkt[1:25]))
+            pkt_header = self.log_header.unpack(pkt, 1)
             pkt_data = pkt[25:]
 
             if pkt_header.len != len(pkt_data):
                 if self.logger:
                     self.logger.log(logging.WARNING, "Packet length mismatch: expected {}, got {}".format(pkt_header.len, len(pkt_data)))
 
-            if pkt_header.cmd in self.process.keys():
-                return self.process[pkt_header.cmd](pkt_header, pkt_data, args)
+            handler = self.process.get(pkt_header.cmd)
+            if handler is not None:
+                return handler(pkt_header, pkt_data, args)
             else:
                 # print(binascii.hexlify(pkt_data))
                 return None
         elif pkt[0] == 0x01:
             if len(pkt) < 29:
                 return
-            pkt_header = self.type_0x01_header._make(struct.unpack('<LLLHLHQ', pkt[1:29]))
+            pkt_header = self.type_0x01_header.unpack(pkt, 1)
             pkt_data = pkt[29:-4]
             magic_2 = struct.unpack('<L', pkt[-4:])[0]
 
@@ -210,8 +251,9 @@ class HisiliconParser:
                 if self.logger:
                     self.logger.log(logging.WARNING, "Packet length mismatch: {} and {}".format(pkt_header.nested_len1, pkt_header.nested_len2))
 
-            if pkt_header.cmd in self.process_nested.keys():
-                return self.process_nested[pkt_header.cmd](pkt_header, pkt_data, args)
+            handler = self.process_nested.get(pkt_header.cmd)
+            if handler is not None:
+                return handler(pkt_header, pkt_data, args)
             else:
                 # print(binascii.hexlify(pkt_data))
                 return None
@@ -1,31 +1,41 @@
 #!/usr/bin/env python3
 
-from collections import namedtuple
 import scat.util as util
 import binascii
 
 import struct
 import logging
 
+lte_ota_msg_header = util.Layout('HisiLteOtaMessage', 'chan_type direction unk2 unk3', '<LLLL')
+lte_current_cell_info = util.Layout('HisiLteCurrentCellInfo', 'ul_earfcn dl_earfcn ul_freq dl_freq ul_bw dl_bw band_ind', '<HHHHHHH')
+hisi_0x20020000_header = util.Layout('Hisi0x20020000', 'cmdid1 unk2 seq_nr msgid cmdid2 unk6 unk7 unk8 inner_len', '<LLLLLLLLL')
+hisi_0x20020000_inner_header = util.Layout('Hisi0x20020000Inner', 'msgid opid cmd', '<LHH')
+scell_header = util.Layout('HisiSCellHeader', 'freq band', '<HH')
+intra_freq_header = util.Layout('HisiIntraFreqHeader', 'freq band total_cell detected_cell', '<HHHH')
+inter_freq_header = util.Layout('HisiInterFreqHeader', 'cur_band freq band total_cell detected_cell', '<HHHHH')
+cell_meas = util.Layout('HisiCellMeas', 'pci rsrp rsrq unk', '<Hhhh')
+
 class HisiLogParser:
     def __init__(self, parent, model=None):
         self.parent = parent
 
         self.process = {
-            0x10051082: lambda x, y, z: self.hisi_lte_current_cell_info(x, y, z),
-            0x20010000: lambda x, y, z: self.hisi_lte_ota_msg(x, y, z),
-            0x30940001: lambda x, y, z: self.hisi_debug_msg(x, y, z),
-            0x20030000: lambda x, y, z: self.hisi_debug_msg(x, y, z),
-            0x20020000: lambda x, y, z: self.hisi_0x20020000(x, y, z),
+            0x10051082: self.hisi_lte_current_cell_info,
+            0x20010000: self.hisi_lte_ota_msg,
+            0x30940001: self.hisi_debug_msg,
+            0x20030000: self.hisi_debug_msg,
+            0x20020000: self.hisi_0x20020000,
         }
 
+        # Packets updating the serving cell state kept in the parent
+        self.state_log_ids = {0x10051082}
+
     def hisi_lte_ota_msg(self, pkt_header, pkt_data, args):
         # Direction: 1: DL, 2: UL
-        header = namedtuple('HisiLteOtaMessage', 'chan_type direction unk2 unk3')
         if len(pkt_data) < 16:
             return None
 
-        ota_hdr = header._make(struct.unpack('<LLLL', pkt_data[0:16]))
+        ota_hdr = lte_ota_msg_header.unpack(pkt_data)
         ota_content = pkt_data[16:]
 
         pkt_content = b''
@@ -86,9 +96,7 @@ class HisiLogParser:
     def hisi_lte_current_cell_info(self, pkt_header, pkt_data, args):
         # TODO: Frequency to EARFCN fallback
 
-        header = namedtuple('HisiLteCurrentCellInfo', 'ul_earfcn dl_earfcn ul_freq dl_freq ul_bw dl_bw band_ind')
-
-        cell_info = header._make(struct.unpack('<HHHHHHH', pkt_data[-32:-18]))
+        cell_info = lte_current_cell_info.unpack(pkt_data[-32:-18])
         nrb_to_bw = {
                 0: 0,
                 6: 1.4,
@@ -154,41 +162,34 @@ class HisiLogParser:
 
     def hisi_0x20020000(self, pkt_header, pkt_data, args):
         stdout = ''
-        header = namedtuple('Hisi0x20020000', 'cmdid1 unk2 seq_nr msgid cmdid2 unk6 unk7 unk8 inner_len')
-
-        info = header._make(struct.unpack('<LLLLLLLLL', pkt_data[0:36]))
+        info = hisi_0x20020000_header.unpack(pkt_data)
         info_data = pkt_data[36:]
         # print('1: ' + str(info))
         # print('Data: ' + binascii.hexlify(pkt_data[36:]).decode('utf-8'))
         if info.msgid == 0x0986:
-            inner_header = namedtuple('Hisi0x20020000_0x0986', 'msgid opid cmd')
-            inner_header_data = inner_header._make(struct.unpack('<LHH', info_data[0:8]))
+            inner_header_data = hisi_0x20020000_inner_header.unpack(info_data)
             if inner_header_data.cmd == 0x1f:
                 # Idle measurement, Serving cell
-                scell_header = namedtuple('HisiSCellHeader', 'freq band')
-                scell_meas = namedtuple('HisiSCellMeas', 'pci rsrp rsrq unk')
-                scell_header_data = scell_header._make(struct.unpack('<HH', info_data[8:12]))
+                scell_header_data = scell_header.unpack(info_data, 8)
 
                 stdout += 'Idle mode serving cell measurement: {:.1f} MHz (Band {}), '.format(
                     scell_header_data.freq / 10, scell_header_data.band
                 )
-                scell_meas_data = scell_meas._make(struct.unpack('<Hhhh', info_data[12:20]))
+                scell_meas_data = cell_meas.unpack(info_data, 12)
                 stdout += 'PCI {}, RSRP {:.1f}, RSRQ {:.1f}\n'.format(
                     scell_meas_data.pci,
                     scell_meas_data.rsrp / 10, scell_meas_data.rsrq / 10
                 )
             elif inner_header_data.cmd == 0x20:
                 # Idle measurement, Intra frequency cell
-                intra_freq_header = namedtuple('HisiIntraFreqHeader', 'freq band total_cell detected_cell')
-                intra_freq_meas = namedtuple('HisiIntraFreqMeas', 'pci rsrp rsrq unk')
-                intra_freq_header_data = intra_freq_header._make(struct.unpack('<HHHH', info_data[8:16]))
+                intra_freq_header_data = intra_freq_header.unpack(info_data, 8)
 
                 stdout += 'Idle mode intra frequency cell measurement: {:.1f} MHz (Band {}), Total/Detected: {}/{}\n'.format(
                     intra_freq_header_data.freq / 10, intra_freq_header_data.band,
                     intra_freq_header_data.total_cell, intra_freq_header_data.detected_cell
                 )
                 for i in range(intra_freq_header_data.total_cell):
-                    intra_freq_meas_data = intra_freq_meas._make(struct.unpack('<Hhhh', info_data[8*(i+2):8*(i+3)]))
+                    intra_freq_meas_data = cell_meas.unpack(info_data, 8*(i+2))
                     stdout += 'Cell {}: PCI {}, RSRP {:.1f}, RSRQ {:.1f}\n'.format(i,
                         intra_freq_meas_data.pci,
                         intra_freq_meas_data.rsrp / 10, intra_freq_meas_data.rsrq / 10,
@@ -196,11 +197,9 @@ class HisiLogParser:
             elif inner_header_data.cmd == 0x21:
                 # Idle measurement, Inter frequency cell
                 num_freqs = struct.unpack('<H', info_data[8:10])[0]
-                inter_freq_header = namedtuple('HisiInterFreqHeader', 'cur_band freq band total_cell detected_cell')
-                inter_freq_meas = namedtuple('HisiInterFreqMeas', 'pci rsrp rsrq unk')
                 pos = 10
                 for i in range(num_freqs):
-                    inter_freq_header_data = inter_freq_header._make(struct.unpack('<HHHHH', info_data[pos:pos+10]))
+                    inter_freq_header_data = inter_freq_header.unpack(info_data, pos)
                     pos += 10
 
                     stdout += 'Idle mode inter frequency cell measurement: {:.1f} MHz (Band {}), Total/Detected: {}/{}\n'.format(
@@ -208,7 +207,7 @@ class HisiLogParser:
                         inter_freq_header_data.total_cell, inter_freq_header_data.detected_cell
                     )
                     for j in range(inter_freq_header_data.total_cell):
-                        inter_freq_meas_data = inter_freq_meas._make(struct.unpack('<Hhhh', info_data[pos:pos+8]))
+                        inter_freq_meas_data = cell_meas.unpack(info_data, pos)
                         stdout += 'Cell {}: PCI {}, RSRP {:.1f}, RSRQ {:.1f}\n'.format(j,
                             inter_freq_meas_data.pci,
                             inter_freq_meas_data.rsrp / 10, inter_freq_meas_data.rsrq / 10,
@@ -219,21 +218,18 @@ class HisiLogParser:
                 return None
 
         elif info.msgid == 0x0988:
-            inner_header = namedtuple('Hisi0x20020000_0x0988', 'msgid opid cmd')
-            inner_header_data = inner_header._make(struct.unpack('<LHH', info_data[0:8]))
+            inner_header_data = hisi_0x20020000_inner_header.unpack(info_data)
 
             if inner_header_data.cmd == 0x33:
                 # Connected mode measurement, Intra frequency cell
-                intra_freq_header = namedtuple('HisiIntraFreqHeader', 'freq band total_cell detected_cell')
-                intra_freq_meas = namedtuple('HisiIntraFreqMeas', 'pci rsrp rsrq unk')
-                intra_freq_header_data = intra_freq_header._make(struct.unpack('<HHHH', info_data[8:16]))
+                intra_freq_header_data = intra_freq_header.unpack(info_data, 8)
 
                 stdout += 'Connected mode intra frequency cell measurement: {:.1f} MHz (Band {}), Total/Detected: {}/{}\n'.format(
                     intra_freq_header_data.freq / 10, intra_freq_header_data.band,
                     intra_freq_header_data.total_cell, intra_freq_header_data.detected_cell
                 )
                 for i in range(intra_freq_header_data.total_cell):
-                    intra_freq_meas_data = intra_freq_meas._make(struct.unpack('<Hhhh', info_data[8*(i+2):8*(i+3)]))
+                    intra_freq_meas_data = cell_meas.unpack(info_data, 8*(i+2))
                     stdout += 'Cell {}: PCI {}, RSRP {:.1f}, RSRQ {:.1f}\n'.format(i,
                         intra_freq_meas_data.pci,
                         intra_freq_meas_data.rsrp / 10, intra_freq_meas_data.rsrq / 10,
@@ -1,26 +1,28 @@
 #!/usr/bin/env python3
 
-from collections import namedtuple
 import scat.util as util
 import binascii
 
 import struct
 import logging
 
+l3_ota_wcdma_rrc_header = util.Layout('HisiL3OtaWcdmaRrc', 'unk1 unk2 unk3 unk4 len type', '<LBBBLB')
+l3_ota_abis_header = util.Layout('HisiL3OtaAbis', 'unk1 unk2 seq unk3 unk4 unk5 len1 len2', '<HBBBBBLL')
+l3_ota_gsm_header = util.Layout('HisiL3OtaGsm', 'unk1 unk2 msg_type channel direction unk6 len', '<HBBBBBL')
+
 class HisiNestedParser:
     def __init__(self, parent):
         self.parent = parent
 
         self.process = {
-            0x00020101: lambda x, y, z: self.hisi_l3_ota(x, y, z),
-            0xfd010101: lambda x, y, z: self.hisi_debug_msg(x, y, z),
+            0x00020101: self.hisi_l3_ota,
+            0xfd010101: self.hisi_debug_msg,
         }
 
     def hisi_l3_ota(self, pkt_header, pkt_data, args):
         if pkt_data[0] == 0x22:
             # WCDMA RRC
-            header = namedtuple('HisiL3OtaWcdmaRrc', 'unk1 unk2 unk3 unk4 len type')
-            wcdma_rrc_header = header._make(struct.unpack('<LBBBLB', pkt_data[1:13]))
+            wcdma_rrc_header = l3_ota_wcdma_rrc_header.unpack(pkt_data, 1)
             wcdma_rrc_content = pkt_data[13:]
             # print(wcdma_rrc_header)
 
@@ -71,8 +73,7 @@ class HisiNestedParser:
             return {'cp': [gsmtap_hdr + wcdma_rrc_content]}
         elif pkt_data[0] == 0x03:
             # Abis/L3
-            header = namedtuple('HisiL3OtaAbis', 'unk1 unk2 seq unk3 unk4 unk5 len1 len2')
-            abis_header = header._make(struct.unpack('<HBBBBBLL', pkt_data[1:16]))
+            abis_header = l3_ota_abis_header.unpack(pkt_data, 1)
             abis_data = pkt_data[16:]
 
             if abis_header.len2 + 4 != abis_header.len1:
@@ -89,8 +90,7 @@ class HisiNestedParser:
 
         elif pkt_data[0] == 0x25:
             # GSM
-            header = namedtuple('HisiL3OtaGsm', 'unk1 unk2 msg_type channel direction unk6 len')
-            ota_header = header._make(struct.unpack('<HBBBBBL', pkt_data[1:12]))
+            ota_header = l3_ota_gsm_header.unpack(pkt_data, 1)
             ota_data = pkt_data[12:]
             subtype = 0
 
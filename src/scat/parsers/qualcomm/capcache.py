@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import os
+import json
+import tempfile
+import logging
+
+def default_filename():
+    cache_dir = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_dir, 'scat', 'qualcomm_capabilities.json')
+
+class CapabilityCache:
+    """Extended message ID ranges and levels of each device firmware,
+    stored as JSON keyed by the DIAG_EXT_BUILD_ID_F build string.
+
+    An entry is {'id_range': [(start, end), ...], 'levels': [(start, end,
+    [(id, level), ...]), ...]}, levels is None until they were queried.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        self.logger = logging.getLogger('scat.qualcommparser')
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.filename, 'r') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        except (OSError, ValueError) as e:
+            self.logger.log(logging.WARNING, 'Ignoring capability cache {}: {}'.format(self.filename, e))
+            self.entries = {}
+
+    def get(self, build_id):
+        entry = self.entries.get(build_id)
+        if entry is None or 'id_range' not in entry:
+            return None
+
+        levels = entry.get('levels')
+        if levels is not None:
+            levels = [(x[0], x[1], [tuple(y) for y in x[2]]) for x in levels]
+        return {'id_range': [tuple(x) for x in entry['id_range']], 'levels': levels}
+
+    def put(self, build_id, capabilities):
+        self.entries[build_id] = capabilities
+        self.save()
+
+    def save(self):
+        # Written to a temporary file and renamed, so that an interrupted
+        # capture never leaves a truncated cache behind
+        cache_dir = os.path.dirname(self.filename)
+        try:
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_filename = tempfile.mkstemp(dir=cache_dir if cache_dir else '.', prefix='.capabilities')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_filename, self.filename)
+        except OSError as e:
+            self.logger.log(logging.WARNING, 'Could not write capability cache {}: {}'.format(self.filename, e))
@@ -2,10 +2,9 @@
 
 import scat.util as util
 
-import struct
-import calendar
 import logging
-from collections import namedtuple
+
+protocol_data_1x = util.Layout('QcDiag1xProtocolData', 'instance protocol ifnameid direction sequence_num segment_num_is_final', '<BBBBHH')
 
 class Diag1xLogParser:
     def __init__(self, parent):
@@ -22,13 +21,12 @@ class Diag1xLogParser:
             #0x14CE: lambda x, y, z: self.parse_sim(x, y, z, 1), # UIM DS Data
 
             # Generic
-            0x11EB: lambda x, y, z: self.parse_ip(x, y, z), # Protocol Services Data
+            0x11EB: self.parse_ip, # Protocol Services Data
         }
 
     def parse_ip(self, pkt_header, pkt_body, args):
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        item_struct = namedtuple('QcDiag1xProtocolData', 'instance protocol ifnameid direction sequence_num segment_num_is_final')
-        item = item_struct._make(struct.unpack('<BBBBHH', pkt_body[0:8]))
+        item = protocol_data_1x.unpack(pkt_body)
         item_data = pkt_body[8:]
 
         # pkt[3] = 0a00 0000 [a: direction, 0=RX, 1=TX]
@@ -67,8 +65,7 @@ class Diag1xLogParser:
 
     def parse_sim(self, pkt_header, pkt_body, args, sim_id):
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         msg_content = pkt_body
         # msg[0]: length
@@ -8,6 +8,9 @@ import struct
 DIAG_VERNO_F = 0x00
 DIAG_STATUS_F = 0x0c
 DIAG_LOG_F = 0x10            # Log packet Request/Reponse
+DIAG_BAD_CMD_F = 0x13        # Invalid command response
+DIAG_BAD_PARM_F = 0x14       # Invalid parameter response
+DIAG_BAD_LEN_F = 0x15        # Invalid packet length response
 DIAG_DIAG_VER_F = 0x1c       # Version response
 DIAG_TS_F = 0x1d
 DIAG_SUBSYS_CMD_F = 0x4b
@@ -321,6 +324,116 @@ def log_mask_scat_lte():
 def log_mask_empty_tdscdma():
     return create_log_config_set_mask(DIAG_SUBSYS_ID_TDSCDMA, 0x0207)
 
+def log_mask_items(mask):
+    # Inverse of create_log_config_set_mask: list of log IDs set in the mask
+    equip_id, last_item = struct.unpack('<LL', mask[8:16])
+    log_ids = []
+    for item in range(last_item + 1):
+        if mask[16 + int(item / 8)] & (1 << (item % 8)):
+            log_ids.append((equip_id << 12) | item)
+    return log_ids
+
+# Last item of each equipment ID in the preferred log masks
+log_mask_last_item = {
+    DIAG_SUBSYS_ID_1X: 0x0847,
+    DIAG_SUBSYS_ID_WCDMA: 0x0ff7,
+    DIAG_SUBSYS_ID_GSM: 0x0ff7,
+    DIAG_SUBSYS_ID_UMTS: 0x0b5e,
+    DIAG_SUBSYS_ID_LTE: 0x09ff,
+}
+
+def create_log_config_set_masks(log_ids):
+    # One set mask command per equipment ID (upper 4 bits of the log ID)
+    items = {}
+    for log_id in log_ids:
+        items.setdefault(log_id >> 12, set()).add(log_id & 0xfff)
+
+    masks = []
+    for equip_id in sorted(items):
+        last_item = max(log_mask_last_item.get(equip_id, 0), max(items[equip_id]))
+        masks.append(create_log_config_set_mask(equip_id, last_item, *sorted(items[equip_id])))
+    return masks
+
+# Log IDs the parsers need to keep track of the serving cell
+log_ids_cell_info = (
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_RR_CELL_INFORMATION_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_DSDS_RR_CELL_INFORMATION_C),
+    diag_log_get_wcdma_item_id(diag_log_code_wcdma.LOG_WCDMA_CELL_ID_C),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_ML1_SERVING_CELL_INFO),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_RRC_SERVING_CELL_INFO),
+)
+
+log_ids_rrc_nas = log_ids_cell_info + (
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_RR_SIGNALING_MESSAGE_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_DSDS_RR_SIGNALING_MESSAGE_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GPRS_SM_GMM_OTA_SIGNALING_MESSAGE_C),
+    diag_log_get_wcdma_item_id(diag_log_code_wcdma.LOG_WCDMA_SIB_C),
+    diag_log_get_wcdma_item_id(diag_log_code_wcdma.LOG_WCDMA_SIGNALING_MSG_C),
+    diag_log_get_umts_item_id(diag_log_code_umts.LOG_UMTS_NAS_OTA_MESSAGE_LOG_PACKET_C),
+    diag_log_get_umts_item_id(diag_log_code_umts.LOG_UMTS_DSDS_NAS_SIGNALING_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_RRC_OTA_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_NAS_ESM_SEC_OTA_INCOMING_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_NAS_ESM_SEC_OTA_OUTGOING_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_NAS_ESM_PLAIN_OTA_INCOMING_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_NAS_ESM_PLAIN_OTA_OUTGOING_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_NAS_EMM_SEC_OTA_INCOMING_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_NAS_EMM_SEC_OTA_OUTGOING_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_NAS_EMM_PLAIN_OTA_INCOMING_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_NAS_EMM_PLAIN_OTA_OUTGOING_MESSAGE),
+)
+
+log_ids_signaling = log_ids_rrc_nas + (
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GPRS_RR_PACKET_SI_1_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GPRS_RR_PACKET_SI_2_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GPRS_RR_PACKET_SI_3_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GPRS_MAC_SIGNALING_MESSACE_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GPRS_DSDS_RR_PACKET_SI_1_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GPRS_DSDS_RR_PACKET_SI_2_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GPRS_DSDS_RR_PACKET_SI_3_C),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_MAC_RACH_RESPONSE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_RRC_MIB_MESSAGE),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_RRC_SUPPORTED_CA_COMBOS),
+    diag_log_get_lte_item_id(diag_log_code_5gnr.LOG_5GNR_RRC_MIB_INFO),
+    diag_log_get_lte_item_id(diag_log_code_5gnr.LOG_5GNR_RRC_SUPPORTED_CA_COMBOS),
+)
+
+log_ids_meas = log_ids_cell_info + (
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_L1_FCCH_ACQUISITION_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_L1_SCH_ACQUISITION_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_L1_NEW_BURST_METRICS_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_L1_BURST_METRICS_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_L1_SCELL_BA_LIST_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_L1_SCELL_AUX_MEASUREMENTS_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_L1_NCELL_AUX_MEASUREMENTS_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_DSDS_L1_FCCH_ACQUISITION_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_DSDS_L1_SCH_ACQUISITION_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_DSDS_L1_BURST_METRICS_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_DSDS_L1_SCELL_BA_LIST_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_DSDS_L1_SCELL_AUX_MEASUREMENTS_C),
+    diag_log_get_gsm_item_id(diag_log_code_gsm.LOG_GSM_DSDS_L1_NCELL_AUX_MEASUREMENTS_C),
+    diag_log_get_wcdma_item_id(diag_log_code_wcdma.LOG_WCDMA_SEARCH_CELL_RESELECTION_RANK_C),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_ML1_SERVING_CELL_MEAS_AND_EVAL),
+    diag_log_get_lte_item_id(diag_log_code_lte.LOG_LTE_ML1_NEIGHBOR_MEASUREMENTS),
+)
+
+log_mask_profiles = ('signaling-only', 'rrc+nas', 'meas', 'full')
+
+def log_mask_profile(name):
+    # Log IDs enabled by a profile, 'full' is the preferred SCAT set
+    if name == 'signaling-only':
+        return list(log_ids_signaling)
+    elif name == 'rrc+nas':
+        return list(log_ids_rrc_nas)
+    elif name == 'meas':
+        return list(log_ids_meas)
+    elif name == 'full':
+        log_ids = []
+        for mask in (log_mask_scat_1x(), log_mask_scat_wcdma(), log_mask_scat_gsm(),
+                log_mask_scat_umts(), log_mask_scat_lte()):
+            log_ids += log_mask_items(mask)
+        return log_ids
+    raise ValueError('Unknown log mask profile {}'.format(name))
+
 def create_extended_message_config_set_mask(first_ssid, last_ssid, *masks):
     # Command ID, Operation | first_ssid, last_ssid, runtime_masks
     diag_log_config_mask_header = struct.pack('<BBHHH',
@@ -3,11 +3,21 @@
 import scat.util as util
 
 import struct
-import calendar
 import logging
-from collections import namedtuple
 import binascii
 
+gsm_l1_fcch = util.Layout('QcDiagGsmL1Fcch', 'arfcn_band tone_id msw lsw coarse_freq_offset fine_freq_offset afc_freq snr', '<HHHHhhhH')
+gsm_l1_sch = util.Layout('QcDiagGsmL1Sch', 'arfcn_band tone_id crc_pass dsp_rx bad_frame decoded_data_len decoded_data msw lsw peak_corr_energy freq_offset', '<HHHHHHLHHHH')
+gsm_l1_new_burst_metric_v4 = util.Layout('QcDiagGsmL1NewBurstMetricV4', 'sfn arfcn_band rssi rxpwr dcoff_i dcoff_q freq_offset time_offset snr_est gain_state aci q16 aqpsk timeslot jdet_reading_divrx wb_power ll_hl_state', '<LHLhhhhhhbbLBBHLB')
+gsm_l1_burst_metric = util.Layout('QcDiagGsmL1BurstMetric', 'sfn arfcn_band rssi rxpwr dcoff_i dcoff_q freq_offset time_offset snr_est gain_state', '<LHLhhhhhhb')
+gsm_l1_surround_cell_ba = util.Layout('QcDiagGsmL1SurroundCellBa', 'arfcn_band rxpwr bsic_valid bsic fn_offset time_offset', '<HhBBLH')
+gsm_l1_serv_aux_meas = util.Layout('QcDiagGsmL1ServAuxMeas', 'rxpwr snr_is_bad', '<hB')
+gsm_l1_neig_aux_meas = util.Layout('QcDiagGsmL1NeigAuxMeas', 'arfcn_band rxpwr', '<Hh')
+gsm_rr_cell_info = util.Layout('QcDiagGsmRrCellInfo', 'arfcn_band bcc ncc cid lai priority ncc_permitted', '<HBBH5sBB')
+gsm_rr_signaling_message = util.Layout('QcDiagGsmRrSignalingMessage', 'channel_type_dir message_type message_len', '<BBB')
+gsm_gprs_mac = util.Layout('QcDiagGsmGprsMac', 'chan_type_dir message_type message_len', '<BBB')
+gsm_gprs_ota = util.Layout('QcDiagGsmGprsOta', 'msg_dir message_type message_len', '<BBH')
+
 class DiagGsmLogParser:
     def __init__(self, parent):
         self.parent = parent
@@ -19,36 +29,39 @@ class DiagGsmLogParser:
         self.process = {
             # GSM
             # L1
-            0x5065: lambda x, y, z: self.parse_gsm_fcch(x, y, z), # GSM L1 FCCH Acquisition
-            0x5066: lambda x, y, z: self.parse_gsm_sch(x, y, z), # GSM L1 SCH Acquisition
-            0x506A: lambda x, y, z: self.parse_gsm_l1_new_burst_metric(x, y, z), # GSM L1 New Burst Metrics
-            0x506C: lambda x, y, z: self.parse_gsm_l1_burst_metric(x, y, z), # GSM L1 Burst Metrics
-            0x5071: lambda x, y, z: self.parse_gsm_l1_surround_cell_ba(x, y, z), # GSM Surround Cell BA List
-            0x507A: lambda x, y, z: self.parse_gsm_l1_serv_aux_meas(x, y, z), # GSM L1 Serving Auxiliary Measurments
-            0x507B: lambda x, y, z: self.parse_gsm_l1_neig_aux_meas(x, y, z), # GSM L1 Neighbor Cell Auxiliary Measurments
+            0x5065: self.parse_gsm_fcch, # GSM L1 FCCH Acquisition
+            0x5066: self.parse_gsm_sch, # GSM L1 SCH Acquisition
+            0x506A: self.parse_gsm_l1_new_burst_metric, # GSM L1 New Burst Metrics
+            0x506C: self.parse_gsm_l1_burst_metric, # GSM L1 Burst Metrics
+            0x5071: self.parse_gsm_l1_surround_cell_ba, # GSM Surround Cell BA List
+            0x507A: self.parse_gsm_l1_serv_aux_meas, # GSM L1 Serving Auxiliary Measurments
+            0x507B: self.parse_gsm_l1_neig_aux_meas, # GSM L1 Neighbor Cell Auxiliary Measurments
 
             # RR
-            0x512F: lambda x, y, z: self.parse_gsm_rr(x, y, z), # GSM RR Signaling Message
-            0x5134: lambda x, y, z: self.parse_gsm_cell_info(x, y, z), # GSM RR Cell Information
+            0x512F: self.parse_gsm_rr, # GSM RR Signaling Message
+            0x5134: self.parse_gsm_cell_info, # GSM RR Cell Information
 
             # GPRS
-            0x5226: lambda x, y, z: self.parse_gprs_mac(x, y, z), # GPRS MAC Signaling Message
-            0x5230: lambda x, y, z: self.parse_gprs_ota(x, y, z), # GPRS SM/GMM OTA Signaling Message
+            0x5226: self.parse_gprs_mac, # GPRS MAC Signaling Message
+            0x5230: self.parse_gprs_ota, # GPRS SM/GMM OTA Signaling Message
 
             # GSM DSDS
             # L1
-            0x5A65: lambda x, y, z: self.parse_gsm_dsds_fcch(x, y, z), # GSM DSDS L1 FCCH Acquisition
-            0x5A66: lambda x, y, z: self.parse_gsm_dsds_sch(x, y, z), # GSM DSDS L1 SCH Acquisition
-            0x5A6C: lambda x, y, z: self.parse_gsm_dsds_l1_burst_metric(x, y, z), # GSM DSDS L1 Burst Metrics
-            0x5A71: lambda x, y, z: self.parse_gsm_dsds_l1_surround_cell_ba(x, y, z), # GSM DSDS Surround Cell BA List
-            0x5A7A: lambda x, y, z: self.parse_gsm_dsds_l1_serv_aux_meas(x, y, z), # GSM DSDS L1 Serving Auxiliary Measurments
-            0x5A7B: lambda x, y, z: self.parse_gsm_dsds_l1_neig_aux_meas(x, y, z), # GSM DSDS L1 Neighbor Cell Auxiliary Measurments
+            0x5A65: self.parse_gsm_dsds_fcch, # GSM DSDS L1 FCCH Acquisition
+            0x5A66: self.parse_gsm_dsds_sch, # GSM DSDS L1 SCH Acquisition
+            0x5A6C: self.parse_gsm_dsds_l1_burst_metric, # GSM DSDS L1 Burst Metrics
+            0x5A71: self.parse_gsm_dsds_l1_surround_cell_ba, # GSM DSDS Surround Cell BA List
+            0x5A7A: self.parse_gsm_dsds_l1_serv_aux_meas, # GSM DSDS L1 Serving Auxiliary Measurments
+            0x5A7B: self.parse_gsm_dsds_l1_neig_aux_meas, # GSM DSDS L1 Neighbor Cell Auxiliary Measurments
 
             # RR
-            0x5B2F: lambda x, y, z: self.parse_gsm_dsds_rr(x, y, z), # GSM DSDS RR Signaling Message
-            0x5B34: lambda x, y, z: self.parse_gsm_dsds_cell_info(x, y, z), # GSM DSDS RR Cell Information
+            0x5B2F: self.parse_gsm_dsds_rr, # GSM DSDS RR Signaling Message
+            0x5B34: self.parse_gsm_dsds_cell_info, # GSM DSDS RR Cell Information
         }
 
+        # Log packets updating the serving cell state kept in the parent
+        self.state_log_ids = {0x5065, 0x5066, 0x5134, 0x5A65, 0x5A66, 0x5B34}
+
     # GSM
 
     def parse_gsm_fcch(self, pkt_header, pkt_body, args):
@@ -56,8 +69,7 @@ class DiagGsmLogParser:
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
 
-        item_struct = namedtuple('QcDiagGsmL1Fcch', 'arfcn_band tone_id msw lsw coarse_freq_offset fine_freq_offset afc_freq snr')
-        item = item_struct._make(struct.unpack('<HHHHhhhH', pkt_body[0:16]))
+        item = gsm_l1_fcch.unpack(pkt_body)
 
         band = (item.arfcn_band & 0xF000) >> 12
         arfcn = (item.arfcn_band & 0x0FFF)
@@ -75,8 +87,7 @@ class DiagGsmLogParser:
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
 
-        item_struct = namedtuple('QcDiagGsmL1Sch', 'arfcn_band tone_id crc_pass dsp_rx bad_frame decoded_data_len decoded_data msw lsw peak_corr_energy freq_offset')
-        item = item_struct._make(struct.unpack('<HHHHHHLHHHH', pkt_body[0:24]))
+        item = gsm_l1_sch.unpack(pkt_body)
 
         band = (item.arfcn_band & 0xF000) >> 12
         arfcn = (item.arfcn_band & 0x0FFF)
@@ -92,7 +103,6 @@ class DiagGsmLogParser:
         return self.parse_gsm_sch(pkt_header, pkt_body[1:], {'radio_id': self.parent.sanitize_radio_id(radio_id_pkt)})
 
     def parse_gsm_l1_new_burst_metric(self, pkt_header, pkt_body, args):
-        item_struct_v4 = namedtuple('QcDiagGsmL1NewBurstMetricV4', 'sfn arfcn_band rssi rxpwr dcoff_i dcoff_q freq_offset time_offset snr_est gain_state aci q16 aqpsk timeslot jdet_reading_divrx wb_power ll_hl_state')
         stdout = ''
 
         pkt_version = pkt_body[0]
@@ -100,7 +110,7 @@ class DiagGsmLogParser:
             chan = pkt_body[1]
             for i in range(4):
                 cell_pkt = pkt_body[2+37*i:2+37*(i+1)]
-                item = item_struct_v4._make(struct.unpack('<LHLhhhhhhbbLBBHLB', cell_pkt))
+                item = gsm_l1_new_burst_metric_v4.unpack(cell_pkt)
                 c_arfcn = item.arfcn_band & 0xfff
                 c_band = (item.arfcn_band >> 12)
                 if item.rxpwr != 0:
@@ -115,12 +125,11 @@ class DiagGsmLogParser:
     def parse_gsm_l1_burst_metric(self, pkt_header, pkt_body, args):
         channel = pkt_body[0]
         # for each 23 bytes
-        item_struct = namedtuple('QcDiagGsmL1BurstMetric', 'sfn arfcn_band rssi rxpwr dcoff_i dcoff_q freq_offset time_offset snr_est gain_state')
         stdout = ''
 
         for i in range(4):
             cell_pkt = pkt_body[1+23*i:1+23*(i+1)]
-            item = item_struct._make(struct.unpack('<LHLhhhhhhb', cell_pkt))
+            item = gsm_l1_burst_metric.unpack(cell_pkt)
             c_arfcn = item.arfcn_band & 0xfff
             c_band = (item.arfcn_band >> 12)
             if item.rxpwr != 0:
@@ -134,13 +143,12 @@ class DiagGsmLogParser:
         return self.parse_gsm_l1_burst_metric(pkt_header, pkt_body[1:], {'radio_id': radio_id_pkt})
 
     def parse_gsm_l1_surround_cell_ba(self, pkt_header, pkt_body, args):
-        item_struct = namedtuple('QcDiagGsmL1SurroundCellBa', 'arfcn_band rxpwr bsic_valid bsic fn_offset time_offset')
         stdout = ''
         num_cells = pkt_body[0]
         stdout += 'GSM Surround Cell BA: {} cells\n'.format(num_cells)
         for i in range(num_cells):
             cell_pkt = pkt_body[1 + 12 * i:1 + 12 * (i + 1)]
-            item = item_struct._make(struct.unpack('<HhBBLH', cell_pkt))
+            item = gsm_l1_surround_cell_ba.unpack(cell_pkt)
             s_arfcn = item.arfcn_band & 0xfff
             s_band = (item.arfcn_band >> 12)
             s_rxpwr_real = item.rxpwr * 0.0625
@@ -156,8 +164,7 @@ class DiagGsmLogParser:
         return self.parse_gsm_l1_surround_cell_ba(pkt_header, pkt_body[1:], {'radio_id': radio_id_pkt})
 
     def parse_gsm_l1_serv_aux_meas(self, pkt_header, pkt_body, args):
-        item_struct = namedtuple('QcDiagGsmL1ServAuxMeas', 'rxpwr snr_is_bad')
-        item = item_struct._make(struct.unpack('<hB', pkt_body[0:3]))
+        item = gsm_l1_serv_aux_meas.unpack(pkt_body)
         rxpwr_real = item.rxpwr * 0.0625
         return {'stdout': 'GSM Serving Cell Aux Measurement: RxPwr {:.2f}'.format(rxpwr_real)}
 
@@ -167,12 +174,11 @@ class DiagGsmLogParser:
 
     def parse_gsm_l1_neig_aux_meas(self, pkt_header, pkt_body, args):
         stdout = ''
-        item_struct = namedtuple('QcDiagGsmL1NeigAuxMeas', 'arfcn_band rxpwr')
 
         num_cells = pkt_body[0]
         stdout += 'GSM Neighbor Cell Aux: {} cells\n'.format(num_cells)
         for i in range(num_cells):
-            item = item_struct._make(struct.unpack('<Hh', pkt_body[1+4*i:1+4*(i+1)]))
+            item = gsm_l1_neig_aux_meas.unpack(pkt_body, 1+4*i)
             n_arfcn = item.arfcn_band & 0xfff
             n_band = (item.arfcn_band >> 12)
             n_rxpwr_real = item.rxpwr * 0.0625
@@ -189,8 +195,7 @@ class DiagGsmLogParser:
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
 
-        item_struct = namedtuple('QcDiagGsmRrCellInfo', 'arfcn_band bcc ncc cid lai priority ncc_permitted')
-        item = item_struct._make(struct.unpack('<HBBH5sBB', pkt_body[0:13]))
+        item = gsm_rr_cell_info.unpack(pkt_body)
 
         band = (item.arfcn_band & 0xF000) >> 12
         arfcn = (item.arfcn_band & 0x0FFF)
@@ -208,8 +213,7 @@ class DiagGsmLogParser:
         radio_id = 0
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
-        item_struct = namedtuple('QcDiagGsmRrSignalingMessage', 'channel_type_dir message_type message_len')
-        item = item_struct._make(struct.unpack('<BBB', pkt_body[0:3]))
+        item = gsm_rr_signaling_message.unpack(pkt_body)
         l3_message = pkt_body[3:]
 
         if item.message_len != len(l3_message):
@@ -232,8 +236,7 @@ class DiagGsmLogParser:
         channel_type = rr_channel_map[chan]
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         # Attach L2 pseudo length
         #if chan == 0 or chan == 4:
@@ -292,8 +295,7 @@ class DiagGsmLogParser:
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
 
-        item_struct = namedtuple('QcDiagGsmGprsMac', 'chan_type_dir message_type message_len')
-        item = item_struct._make(struct.unpack('<BBB', pkt_body[0:3]))
+        item = gsm_gprs_mac.unpack(pkt_body)
         l3_message = pkt_body[3:]
 
         payload_type = util.gsmtap_type.UM
@@ -313,8 +315,7 @@ class DiagGsmLogParser:
         channel_type = chan
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         gsmtap_hdr = util.create_gsmtap_header(
             version = 3,
@@ -331,8 +332,7 @@ class DiagGsmLogParser:
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
 
-        item_struct = namedtuple('QcDiagGsmGprsOta', 'msg_dir message_type message_len')
-        item = item_struct._make(struct.unpack('<BBH', pkt_body[0:4]))
+        item = gsm_gprs_ota.unpack(pkt_body)
         l3_message = pkt_body[4:]
 
         arfcn = self.parent.gsm_last_arfcn[radio_id]
@@ -341,8 +341,7 @@ class DiagGsmLogParser:
             arfcn = arfcn | (1 << 14)
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         gsmtap_hdr = util.create_gsmtap_header(
             version = 3,
@@ -5,7 +5,6 @@ from functools import wraps
 import scat.util as util
 
 import struct
-import calendar, datetime
 import logging
 import binascii
 
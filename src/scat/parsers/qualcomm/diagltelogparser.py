@@ -4,9 +4,39 @@ from scat.parsers.qualcomm import diagcmd
 import scat.util as util
 
 import struct
-import calendar
+import functools
 import logging
-from collections import namedtuple
+
+lte_ml1_scell_meas_v4 = util.Layout('QcDiagLteMl1ScellMeasV4', 'rrc_rel reserved1 earfcn pci_serv_layer_prio meas_rsrp avg_rsrp rsrq rssi rxlev s_search', '<BHHHLLLLLL')
+lte_ml1_scell_meas_v5 = util.Layout('QcDiagLteMl1ScellMeasV5', 'rrc_rel reserved1 earfcn pci_serv_layer_prio meas_rsrp avg_rsrp rsrq rssi rxlev s_search', '<BHLLLLLLLL')
+lte_ml1_ncell_meas_v4 = util.Layout('QcDiagLteMl1NcellMeasV4', 'rrc_rel reserved1 earfcn q_rxlevmin_n_cells', '<BHHH')
+lte_ml1_ncell_meas_v5 = util.Layout('QcDiagLteMl1NcellMeasV5', 'rrc_rel reserved1 earfcn q_rxlevmin_n_cells', '<BHLL')
+lte_ml1_ncell_meas_ncell = util.Layout('QcDiagLteMl1NcellMeasNcell', 'val0 val1 val2 val3 n_freq_offset val5 ant0_offset ant1_offset', '<LLLLHHLL')
+lte_ml1_subpkt = util.Layout('QcDiagLteMl1Subpkt', 'id version size', '<BBH')
+lte_ml1_subpkt_scell_meas_v36 = util.Layout('QcDiagLteMl1SubpktScellMeasV36', 'earfcn num_cells valid_rx', '<LHH')
+lte_ml1_subpkt_scell_meas_v48 = util.Layout('QcDiagLteMl1SubpktScellMeasV48', 'earfcn num_cells valid_rx rx_map', '<LHHL')
+lte_ml1_cell_info_v1 = util.Layout('QcDiagLteMl1CellInfoV1', 'dl_bandwidth sfn earfcn pci_pbch_phich pss sss ref_time mib_bytes freq_offset num_antennas', '<BHHHLLQLhH')
+lte_ml1_cell_info_v2 = util.Layout('QcDiagLteMl1CellInfoV2', 'dl_bandwidth sfn earfcn pci_pbch_phich pss sss ref_time mib_bytes freq_offset num_antennas', '<BHLLLLQLhH')
+lte_mac_subpkt = util.Layout('QcDiagLteMacSubpkt', 'id version size', '<BBH')
+lte_mac_subpkt_rach_attempt = util.Layout('QcDiagLteMacSubpktRachAttempt', 'num_attempt rach_result contention msg_bitmask', '<BBBB')
+lte_mac_subpkt_rach_attempt_msg1 = util.Layout('QcDiagLteMacSubpktRachAttemptMsg1', 'preamble_index preamble_index_mask preamble_power_offset', '<BBh')
+lte_mac_subpkt_rach_attempt_msg2 = util.Layout('QcDiagLteMacSubpktRachAttemptMsg2', 'backoff result tc_rnti ta', '<HBHH')
+lte_mac_subpkt_rach_attempt_msg3 = util.Layout('QcDiagLteMacSubpktRachAttemptMsg3', 'grant_raw grant harq_id mac_pdu', '<LHB10s')
+lte_mac_subpkt_rach_attempt_v3 = util.Layout('QcDiagLteMacSubpktRachAttemptV3', 'subid cellid num_attempt rach_result contention msg_bitmask', '<BBBBBB')
+lte_mac_subpkt_dl_transport_block = util.Layout('QcDiagLteMacSubpktDlTransportBlock', 'sfn_subfn rnti_type harq_id pmch_id dl_tbs rlc_pdus padding header_len', '<HBBHHBHB')
+lte_mac_subpkt_dl_transport_block_v4 = util.Layout('QcDiagLteMacSubpktDlTransportBlockV4', 'subid cellid sfn_subfn rnti_type harq_id pmch_id dl_tbs rlc_pdus padding header_len', '<BBHBBHHBHB')
+lte_mac_subpkt_ul_transport_block = util.Layout('QcDiagLteMacSubpktUlTransportBlock', 'sfn_subfn rnti_type harq_id grant rlc_pdus padding bsr_event bsr_trig header_len', '<HBBHBHBBB')
+lte_mac_subpkt_ul_transport_block_v4 = util.Layout('QcDiagLteMacSubpktUlTransportBlockV4', 'subid cellid harq_id rnti_type sfn_subfn grant rlc_pdus padding bsr_event bsr_trig header_len', '<BBBBHHBHBBB')
+lte_mib_v1 = util.Layout('QcDiagLteMibV1', 'pci earfcn sfn tx_antenna bandwidth', '<HHH BB')
+lte_mib_v2 = util.Layout('QcDiagLteMibV2', 'pci earfcn sfn tx_antenna bandwidth', '<HLH BB')
+lte_mib_v17 = util.Layout('QcDiagLteMibV17', 'pci earfcn sfn sfn_msb4 hsfn_lsb2 sib1_sch_info si_value_tag access_barring opmode_type opmode_info tx_antenna', '<HLH BBBBB BHB')
+lte_rrc_serv_cell_info_v2 = util.Layout('QcDiagLteRrcServCellInfoV2', 'pci dl_earfcn ul_earfcn dl_bw ul_bw cell_id tac band mcc mnc_digit mnc allowed_access', '<H HH BB LH L HBH B')
+lte_rrc_serv_cell_info_v3 = util.Layout('QcDiagLteRrcServCellInfoV3', 'pci dl_earfcn ul_earfcn dl_bw ul_bw cell_id tac band mcc mnc_digit mnc allowed_access', '<H LL BB LH L HBH B')
+lte_rrc_ota_packet_v25 = util.Layout('QcDiagLteRrcOtaPacketV25', 'rrc_rel_maj rrc_rel_min nr_rrc_rel_maj nr_rrc_rel_min rbid pci earfcn sfn_subfn pdu_num sib_mask len', '<BBBB BHLH BLH')
+lte_rrc_ota_packet_v8 = util.Layout('QcDiagLteRrcOtaPacketV8', 'rrc_rel_maj rrc_rel_min rbid pci earfcn sfn_subfn pdu_num sib_mask len', '<BB BHLH BLH')
+lte_rrc_ota_packet_v5 = util.Layout('QcDiagLteRrcOtaPacketV5', 'rrc_rel_maj rrc_rel_min rbid pci earfcn sfn_subfn pdu_num sib_mask len', '<BB BHHH BLH')
+lte_rrc_ota_packet = util.Layout('QcDiagLteRrcOtaPacket', 'rrc_rel_maj rrc_rel_min rbid pci earfcn sfn_subfn pdu_num len', '<BB BHHH BH')
+lte_nas_msg = util.Layout('QcDiagLteNasMsg', 'vermaj vermid vermin', '<BBB')
 
 class DiagLteLogParser:
     def __init__(self, parent):
@@ -18,76 +48,77 @@ class DiagLteLogParser:
         self.process = {
             # LTE
             # LTE ML1
-            #0xB179: lambda x, y, z: self.parse_lte_ml1_connected_intra_freq_meas(x, y, z), # LTE ML1 Connected Mode LTE Intra-Freq Measurements
-            0xB17F: lambda x, y, z: self.parse_lte_ml1_scell_meas(x, y, z), # LTE ML1 Serving Cell Meas and Eval
-            0xB180: lambda x, y, z: self.parse_lte_ml1_ncell_meas(x, y, z), # LTE ML1 Neighbor Measurements
+            #0xB179: self.parse_lte_ml1_connected_intra_freq_meas, # LTE ML1 Connected Mode LTE Intra-Freq Measurements
+            0xB17F: self.parse_lte_ml1_scell_meas, # LTE ML1 Serving Cell Meas and Eval
+            0xB180: self.parse_lte_ml1_ncell_meas, # LTE ML1 Neighbor Measurements
             #0xB181 LTE ML1 Intra Frequency Cell Reselection
-            #0xB192: lambda x, y, z: self.parse_lte_ml1_ncell_meas_rr(x, y, z), # LTE ML1 Neighbor Cell Meas Request/Response
-            0xB193: lambda x, y, z: self.parse_lte_ml1_scell_meas_response(x, y, z), # LTE ML1 Serving Cell Meas Response
-            #0xB194: lambda x, y, z: self.parse_lte_ml1_search_rr(x, y, z), # LTE ML1 Search Request/Response
-            #0xB195: lambda x, y, z: self.parse_lte_ml1_connected_ncell_meas_rr(x, y, z), # LTE ML1 Connected Neighbor Meas Request/Response
-            0xB197: lambda x, y, z: self.parse_lte_ml1_cell_info(x, y, z), # LTE ML1 Serving Cell Info
+            #0xB192: self.parse_lte_ml1_ncell_meas_rr, # LTE ML1 Neighbor Cell Meas Request/Response
+            0xB193: self.parse_lte_ml1_scell_meas_response, # LTE ML1 Serving Cell Meas Response
+            #0xB194: self.parse_lte_ml1_search_rr, # LTE ML1 Search Request/Response
+            #0xB195: self.parse_lte_ml1_connected_ncell_meas_rr, # LTE ML1 Connected Neighbor Meas Request/Response
+            0xB197: self.parse_lte_ml1_cell_info, # LTE ML1 Serving Cell Info
 
             # LTE MAC
             #0xB167: lambda x, y, z: parse_lte_msg1_report(x, y, z), # LTE RAR (Msg1) Report
             #0xB168: lambda x, y, z: parse_lte_msg2_report(x, y, z), # LTE RAR (Msg2) Report
             #0xB169: lambda x, y, z: parse_lte_msg3_report(x, y, z), # LTE UE Identification Message (Msg3) Report
             #0xB16A: lambda x, y, z: parse_lte_msg3_report(x, y, z), # LTE Contention Resolution Message (Msg4) Report
-            0xB061: lambda x, y, z: self.parse_lte_mac_rach_trigger(x, y, z), # LTE MAC RACH Trigger
-            0xB062: lambda x, y, z: self.parse_lte_mac_rach_response(x, y, z), # LTE MAC RACH Response
-            0xB063: lambda x, y, z: self.parse_lte_mac_dl_block(x, y, z), # LTE MAC DL Transport Block
-            0xB064: lambda x, y, z: self.parse_lte_mac_ul_block(x, y, z), # LTE MAC UL Transport Block
+            0xB061: self.parse_lte_mac_rach_trigger, # LTE MAC RACH Trigger
+            0xB062: self.parse_lte_mac_rach_response, # LTE MAC RACH Response
+            0xB063: self.parse_lte_mac_dl_block, # LTE MAC DL Transport Block
+            0xB064: self.parse_lte_mac_ul_block, # LTE MAC UL Transport Block
 
             # LTE RLC
 
             # LTE PDCP
-            #0xB0A0: lambda x, y, z: self.parse_lte_pdcp_dl_cfg(x, y, z), # LTE PDCP DL Config
-            #0xB0B0: lambda x, y, z: self.parse_lte_pdcp_ul_cfg(x, y, z), # LTE PDCP UL Config
-            #0xB0A1: lambda x, y, z: self.parse_lte_pdcp_dl_data(x, y, z), # LTE PDCP DL Data PDU
-            #0xB0B1: lambda x, y, z: self.parse_lte_pdcp_ul_data(x, y, z), # LTE PDCP UL Data PDU
-            #0xB0A2: lambda x, y, z: self.parse_lte_pdcp_dl_ctrl(x, y, z), # LTE PDCP DL Ctrl PDU
-            #0xB0B2: lambda x, y, z: self.parse_lte_pdcp_ul_ctrl(x, y, z), # LTE PDCP UL Ctrl PDU
-            0xB0A3: lambda x, y, z: self.parse_lte_pdcp_dl_cip(x, y, z), # LTE PDCP DL Cipher Data PDU
-            0xB0B3: lambda x, y, z: self.parse_lte_pdcp_ul_cip(x, y, z), # LTE PDCP UL Cipher Data PDU
-            0xB0A5: lambda x, y, z: self.parse_lte_pdcp_dl_srb_int(x, y, z), # LTE PDCP DL SRB Integrity Data PDU
-            0xB0B5: lambda x, y, z: self.parse_lte_pdcp_ul_srb_int(x, y, z), # LTE PDCP UL SRB Integrity Data PDU
+            #0xB0A0: self.parse_lte_pdcp_dl_cfg, # LTE PDCP DL Config
+            #0xB0B0: self.parse_lte_pdcp_ul_cfg, # LTE PDCP UL Config
+            #0xB0A1: self.parse_lte_pdcp_dl_data, # LTE PDCP DL Data PDU
+            #0xB0B1: self.parse_lte_pdcp_ul_data, # LTE PDCP UL Data PDU
+            #0xB0A2: self.parse_lte_pdcp_dl_ctrl, # LTE PDCP DL Ctrl PDU
+            #0xB0B2: self.parse_lte_pdcp_ul_ctrl, # LTE PDCP UL Ctrl PDU
+            0xB0A3: self.parse_lte_pdcp_dl_cip, # LTE PDCP DL Cipher Data PDU
+            0xB0B3: self.parse_lte_pdcp_ul_cip, # LTE PDCP UL Cipher Data PDU
+            0xB0A5: self.parse_lte_pdcp_dl_srb_int, # LTE PDCP DL SRB Integrity Data PDU
+            0xB0B5: self.parse_lte_pdcp_ul_srb_int, # LTE PDCP UL SRB Integrity Data PDU
 
             # LTE RRC
-            0xB0C0: lambda x, y, z: self.parse_lte_rrc(x, y, z), # LTE RRC OTA Message
-            0xB0C1: lambda x, y, z: self.parse_lte_mib(x, y, z), # LTE RRC MIB Message
-            0xB0C2: lambda x, y, z: self.parse_lte_rrc_cell_info(x, y, z), # LTE RRC Serving Cell Info
+            0xB0C0: self.parse_lte_rrc, # LTE RRC OTA Message
+            0xB0C1: self.parse_lte_mib, # LTE RRC MIB Message
+            0xB0C2: self.parse_lte_rrc_cell_info, # LTE RRC Serving Cell Info
 
             # LTE CA COMBOS
-            # 0xB0CD: lambda x, y, z: self.parse_cacombos(x, y, z),
+            # 0xB0CD: self.parse_cacombos,
 
             # LTE NAS
-            0xB0E0: lambda x, y, z: self.parse_lte_nas(x, y, z, False), # NAS ESM RX Enc
-            0xB0E1: lambda x, y, z: self.parse_lte_nas(x, y, z, False), # NAS ESM TX Enc
-            0xB0EA: lambda x, y, z: self.parse_lte_nas(x, y, z, False), # NAS EMM RX Enc
-            0xB0EB: lambda x, y, z: self.parse_lte_nas(x, y, z, False), # NAS EMM TX Enc
-            0xB0E2: lambda x, y, z: self.parse_lte_nas(x, y, z, True), # NAS ESM RX
-            0xB0E3: lambda x, y, z: self.parse_lte_nas(x, y, z, True), # NAS ESM TX
-            0xB0EC: lambda x, y, z: self.parse_lte_nas(x, y, z, True), # NAS EMM RX
-            0xB0ED: lambda x, y, z: self.parse_lte_nas(x, y, z, True), # NAS EMM TX
+            0xB0E0: functools.partial(self.parse_lte_nas, plain=False), # NAS ESM RX Enc
+            0xB0E1: functools.partial(self.parse_lte_nas, plain=False), # NAS ESM TX Enc
+            0xB0EA: functools.partial(self.parse_lte_nas, plain=False), # NAS EMM RX Enc
+            0xB0EB: functools.partial(self.parse_lte_nas, plain=False), # NAS EMM TX Enc
+            0xB0E2: functools.partial(self.parse_lte_nas, plain=True), # NAS ESM RX
+            0xB0E3: functools.partial(self.parse_lte_nas, plain=True), # NAS ESM TX
+            0xB0EC: functools.partial(self.parse_lte_nas, plain=True), # NAS EMM RX
+            0xB0ED: functools.partial(self.parse_lte_nas, plain=True), # NAS EMM TX
         }
 
+        # Log packets updating the serving cell state kept in the parent
+        self.state_log_ids = {0xB197, 0xB0C2}
+
     # LTE
 
     def parse_lte_ml1_scell_meas(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
-
-        item_struct = namedtuple('QcDiagLteMl1ScellMeas', 'rrc_rel reserved1 earfcn pci_serv_layer_prio meas_rsrp avg_rsrp rsrq rssi rxlev s_search')
         if pkt_version == 4: # Version 4
             # Version, RRC standard release, EARFCN, PCI - Serving Layer Priority
             # Measured, Average RSRP, Measured, Average RSRQ, Measured RSSI
             # Q_rxlevmin, P_max, Max UE TX Power, S_rxlev, Num DRX S Fail
             # S Intra Searcn, S Non Intra Search, Meas Rules Updated, Meas Rules
             # R9 Info (last 4b) - Q Qual Min, S Qual, S Intra Search Q, S Non Intra Search Q
-            item = item_struct._make(struct.unpack('<BHHHLLLLLL', pkt_body[1:32]))
+            item = lte_ml1_scell_meas_v4.unpack(pkt_body, 1)
         elif pkt_version == 5: # Version 5
             # EARFCN -> 4 bytes
             # PCI, Serv Layer Priority -> 4 bytes
-            item = item_struct._make(struct.unpack('<BHLLLLLLLL', pkt_body[1:36]))
+            item = lte_ml1_scell_meas_v5.unpack(pkt_body, 1)
         else:
             self.parent.logger.log(logging.WARNING, 'Unknown LTE ML1 Serving Cell Meas packet version 0x{:02x}'.format(pkt_version))
             return None
@@ -140,9 +171,6 @@ class DiagLteLogParser:
         pkt_version = pkt_body[0]
         stdout = ''
 
-        item_struct = namedtuple('QcDiagLteMl1NcellMeas', 'rrc_rel reserved1 earfcn q_rxlevmin_n_cells')
-        n_cell_struct = namedtuple('QcDiagLteMl1NcellMeasNcell', 'val0 val1 val2 val3 n_freq_offset val5 ant0_offset ant1_offset')
-
         pos = 0
         if pkt_version == 4: # Version 4
             # Version, RRC standard release, EARFCN, Q_rxlevmin, Num Cells, Cell Info
@@ -150,11 +178,11 @@ class DiagLteLogParser:
             #    Measured RSRQ, Average RSRQ, S_rxlev, Freq Offset
             #    Ant0 Frame Offset, Ant0 Sample Offset, Ant1 Frame Offset, Ant1 Sample Offset
             #    S_qual
-            item = item_struct._make(struct.unpack('<BHHH', pkt_body[1:8]))
+            item = lte_ml1_ncell_meas_v4.unpack(pkt_body, 1)
             pos = 8
         elif pkt_version == 5: # Version 5
             # EARFCN -> 4 bytes
-            item = item_struct._make(struct.unpack('<BHLL', pkt_body[1:12]))
+            item = lte_ml1_ncell_meas_v5.unpack(pkt_body, 1)
             pos = 12
         else:
             self.parent.logger.log(logging.WARNING, 'Unknown LTE ML1 Neighbor Meas packet version 0x{:02x}'.format(pkt_version))
@@ -166,7 +194,7 @@ class DiagLteLogParser:
 
         for i in range(n_cells):
             n_cell_pkt = pkt_body[pos + 32 * i:pos + 32 * (i + 1)]
-            n_cell = n_cell_struct._make(struct.unpack('<LLLLHHLL', n_cell_pkt[0:28]))
+            n_cell = lte_ml1_ncell_meas_ncell.unpack(n_cell_pkt)
 
             n_pci = n_cell.val0 & 0x1ff
             n_meas_rssi = (n_cell.val0 >> 9) & 0x7ff
@@ -199,7 +227,6 @@ class DiagLteLogParser:
 
         # First 4b: Version, Number of subpackets, reserved
         # 01 | 01 | 35 0c
-        subpkt_struct = namedtuple('QcDiagLteMl1Subpkt', 'id version size')
         if pkt_version == 1: # Version 1
             num_subpkts = pkt_body[1]
             pos = 4
@@ -207,7 +234,7 @@ class DiagLteLogParser:
             for x in range(num_subpkts):
                 # 4b: Subpacket ID, Subpacket version, Subpacket size
                 # 19 | 30 | 40 02
-                subpkt_header = subpkt_struct._make(struct.unpack('<BBH', pkt_body[pos:pos+4]))
+                subpkt_header = lte_ml1_subpkt.unpack(pkt_body, pos)
                 subpkt_body = pkt_body[pos+4:pos+4+subpkt_header.size]
                 pos += subpkt_header.size
 
@@ -215,8 +242,7 @@ class DiagLteLogParser:
                     # Serving Cell Measurement Result
                     # EARFCN, num of cell, valid RX data
                     if subpkt_header.version == 36:
-                        subpkt_scell_meas_v36_struct = namedtuple('QcDiagLteMl1SubpktScellMeasV36', 'earfcn num_cells valid_rx')
-                        subpkt_scell_meas_v36 = subpkt_scell_meas_v36_struct._make(struct.unpack('<LHH', subpkt_body[0:8]))
+                        subpkt_scell_meas_v36 = lte_ml1_subpkt_scell_meas_v36.unpack(subpkt_body)
                         stdout += 'LTE ML1 SCell Meas Response: EARFCN {}, Number of cells = {}, Valid RX = {}\n'.format(subpkt_scell_meas_v36.earfcn,
                             subpkt_scell_meas_v36.num_cells, subpkt_scell_meas_v36.valid_rx)
 
@@ -275,8 +301,7 @@ class DiagLteLogParser:
                             stdout += 'LTE ML1 SCell Meas Response (Cell {}): PCI {}, Serving cell index {}, is_serving_cell = {}\n'.format(y, pci, scell_idx, is_scell)
                     elif subpkt_header.version == 48:
                         # EARFCN, num of cell, valid RX data
-                        subpkt_scell_meas_v48_struct = namedtuple('QcDiagLteMl1SubpktScellMeasV48', 'earfcn num_cells valid_rx rx_map')
-                        subpkt_scell_meas_v48 = subpkt_scell_meas_v48_struct._make(struct.unpack('<LHHL', subpkt_body[0:12]))
+                        subpkt_scell_meas_v48 = lte_ml1_subpkt_scell_meas_v48.unpack(subpkt_body)
                         stdout += 'LTE ML1 SCell Meas Response: EARFCN {}, Number of cells = {}, Valid RX = {}\n'.format(subpkt_scell_meas_v48.earfcn,
                             subpkt_scell_meas_v48.num_cells, subpkt_scell_meas_v48.valid_rx)
 
@@ -353,18 +378,16 @@ class DiagLteLogParser:
         radio_id = 0
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
-
-        item_struct = namedtuple('QcDiagLteMl1CellInfo', 'dl_bandwidth sfn earfcn pci_pbch_phich pss sss ref_time mib_bytes freq_offset num_antennas')
         item = None
         mib_payload = b''
         stdout = ''
 
         if pkt_version == 1: # Version 1
             # Version, DL BW, SFN, EARFCN, (Cell ID, PBCH, PHICH Duration, PHICH Resource), PSS, SSS, Ref Time, MIB Payload, Freq Offset, Num Antennas
-            item = item_struct._make(struct.unpack('<BHHHLLQLhH', pkt_body[1:32]))
+            item = lte_ml1_cell_info_v1.unpack(pkt_body, 1)
         elif pkt_version == 2: # Version 2
             # Version, DL BW, SFN, EARFCN, (Cell ID 9, PBCH 1, PHICH Duration 3, PHICH Resource 3), PSS, SSS, Ref Time, MIB Payload, Freq Offset, Num Antennas
-            item = item_struct._make(struct.unpack('<BHLLLLQLhH', pkt_body[1:36]))
+            item = lte_ml1_cell_info_v2.unpack(pkt_body, 1)
         else:
             self.parent.logger.log(logging.WARNING, 'Unknown LTE ML1 cell info packet version 0x{:02x}'.format(pkt_version))
             return None
@@ -386,8 +409,7 @@ class DiagLteLogParser:
             stdout = 'LTE ML1 Cell Info: EARFCN {}, PCI {}, Bandwidth {} PRBs, Num antennas {}'.format(item.earfcn, pci, item.dl_bandwidth, item.num_antennas)
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         gsmtap_hdr = util.create_gsmtap_header(
             version = 3,
@@ -409,8 +431,7 @@ class DiagLteLogParser:
 
         pos = 4
         for i in range(num_subpacket):
-            subpkt_mac_struct = namedtuple('QcDiagLteMacSubpkt', 'id version size')
-            subpkt_mac = subpkt_mac_struct._make(struct.unpack('<BBH', pkt_body[pos:pos+4]))
+            subpkt_mac = lte_mac_subpkt.unpack(pkt_body, pos)
             subpkt_body = pkt_body[pos+4:pos+4+subpkt_mac.size]
             pos += subpkt_mac.size
 
@@ -433,39 +454,33 @@ class DiagLteLogParser:
 
         pos = 4
         for i in range(num_subpacket):
-            subpkt_mac_struct = namedtuple('QcDiagLteMacSubpkt', 'id version size')
-            subpkt_mac = subpkt_mac_struct._make(struct.unpack('<BBH', pkt_body[pos:pos+4]))
+            subpkt_mac = lte_mac_subpkt.unpack(pkt_body, pos)
             subpkt_body = pkt_body[pos+4:pos+4+subpkt_mac.size]
             pos += subpkt_mac.size
 
             if subpkt_mac.id == 0x06: # RACH Attempt
-                subpkt_mac_rach_attempt_struct = namedtuple('QcDiagLteMacSubpktRachAttempt', 'num_attempt rach_result contention msg_bitmask')
-                subpkt_mac_rach_attempt_struct_v3 = namedtuple('QcDiagLteMacSubpktRachAttemptV3', 'subid cellid num_attempt rach_result contention msg_bitmask')
                 subpkt_mac_rach_attempt = None
 
-                subpkt_mac_rach_attempt_msg1_struct = namedtuple('QcDiagLteMacSubpktRachAttemptMsg1', 'preamble_index preamble_index_mask preamble_power_offset')
-                subpkt_mac_rach_attempt_msg2_struct = namedtuple('QcDiagLteMacSubpktRachAttemptMsg2', 'backoff result tc_rnti ta')
-                subpkt_mac_rach_attempt_msg3_struct = namedtuple('QcDiagLteMacSubpktRachAttemptMsg3', 'grant_raw grant harq_id mac_pdu')
                 rach_msg1 = None
                 rach_msg2 = None
                 rach_msg3 = None
 
                 if subpkt_mac.version == 0x02: # Version 2
-                    subpkt_mac_rach_attempt = subpkt_mac_rach_attempt_struct._make(struct.unpack('<BBBB', subpkt_body[0:4]))
+                    subpkt_mac_rach_attempt = lte_mac_subpkt_rach_attempt.unpack(subpkt_body)
                     if subpkt_mac_rach_attempt.msg_bitmask & 0x01: # Msg1
-                        rach_msg1 = subpkt_mac_rach_attempt_msg1_struct._make(struct.unpack('<BBh', subpkt_body[4:8]))
+                        rach_msg1 = lte_mac_subpkt_rach_attempt_msg1.unpack(subpkt_body, 4)
                     if subpkt_mac_rach_attempt.msg_bitmask & 0x02: # Msg2
-                        rach_msg2 = subpkt_mac_rach_attempt_msg2_struct._make(struct.unpack('<HBHH', subpkt_body[8:15]))
+                        rach_msg2 = lte_mac_subpkt_rach_attempt_msg2.unpack(subpkt_body, 8)
                     if subpkt_mac_rach_attempt.msg_bitmask & 0x04: # Msg3
-                        rach_msg3 = subpkt_mac_rach_attempt_msg3_struct._make(struct.unpack('<LHB10s', subpkt_body[15:32]))
+                        rach_msg3 = lte_mac_subpkt_rach_attempt_msg3.unpack(subpkt_body, 15)
                 elif subpkt_mac.version == 0x03: # Version 3
-                    subpkt_mac_rach_attempt = subpkt_mac_rach_attempt_struct_v3._make(struct.unpack('<BBBBBB', subpkt_body[0:6]))
+                    subpkt_mac_rach_attempt = lte_mac_subpkt_rach_attempt_v3.unpack(subpkt_body)
                     if subpkt_mac_rach_attempt.msg_bitmask & 0x01: # Msg1
-                        rach_msg1 = subpkt_mac_rach_attempt_msg1_struct._make(struct.unpack('<BBh', subpkt_body[6:10]))
+                        rach_msg1 = lte_mac_subpkt_rach_attempt_msg1.unpack(subpkt_body, 6)
                     if subpkt_mac_rach_attempt.msg_bitmask & 0x02: # Msg2
-                        rach_msg2 = subpkt_mac_rach_attempt_msg2_struct._make(struct.unpack('<HBHH', subpkt_body[10:17]))
+                        rach_msg2 = lte_mac_subpkt_rach_attempt_msg2.unpack(subpkt_body, 10)
                     if subpkt_mac_rach_attempt.msg_bitmask & 0x04: # Msg3
-                        rach_msg3 = subpkt_mac_rach_attempt_msg3_struct._make(struct.unpack('<LHB10s', subpkt_body[17:34]))
+                        rach_msg3 = lte_mac_subpkt_rach_attempt_msg3.unpack(subpkt_body, 17)
                 else:
                     self.parent.logger.log(logging.WARNING, 'Unexpected MAC RACH Response Subpacket version {}'.format(subpkt_mac.version))
                     self.parent.logger.log(logging.DEBUG, util.xxd(subpkt_body))
@@ -480,8 +495,7 @@ class DiagLteLogParser:
                     continue
 
                 pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-                ts_sec = calendar.timegm(pkt_ts.timetuple())
-                ts_usec = pkt_ts.microsecond
+                ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
                 # MAC header required by Wireshark MAC-LTE: radioType, direction, rntiType
                 # Additional headers required for each message types
@@ -513,7 +527,7 @@ class DiagLteLogParser:
                     grant & 0x00ffff,
                     rach_msg2.tc_rnti)
 
-                packet_mac_rar = gsmtap_hdr + mac_header_rar + rar_body
+                packet_mac_rar = (gsmtap_hdr, mac_header_rar, rar_body)
 
                 # MAC PDU in Msg3
                 mac_header_msg = struct.pack('!BBBBHBBBB',
@@ -527,15 +541,14 @@ class DiagLteLogParser:
                     subpkt_mac_rach_attempt.num_attempt,
                     util.mac_lte_tags.MAC_LTE_PAYLOAD_TAG)
 
-                packet_mac_pdu = gsmtap_hdr + mac_header_msg + rach_msg3.mac_pdu
+                packet_mac_pdu = (gsmtap_hdr, mac_header_msg, rach_msg3.mac_pdu)
 
                 return {'cp': [packet_mac_rar, packet_mac_pdu], 'ts': pkt_ts}
             else:
                 self.parent.logger.log(logging.WARNING, 'Unexpected MAC RACH Response Subpacket ID 0x{:02x}'.format(subpkt_mac.id))
 
     def create_lte_mac_gsmtap_packet(self, pkt_ts, is_downlink, header, body):
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         # RNTI Type: {0: C-RNTI, 2: P-RNTI, 3: RA-RNTI, 4: T-C-RNTI, 5: SI-RNTI}
         rnti_type_map = {
@@ -565,7 +578,7 @@ class DiagLteLogParser:
             device_sec = ts_sec,
             device_usec = ts_usec)
 
-        return gsmtap_hdr + mac_hdr + body
+        return (gsmtap_hdr, mac_hdr, body)
 
     def parse_lte_mac_dl_block(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
@@ -578,26 +591,23 @@ class DiagLteLogParser:
 
         pos = 4
         for i in range(num_subpacket):
-            subpkt_mac_struct = namedtuple('QcDiagLteMacSubpkt', 'id version size')
-            subpkt_mac = subpkt_mac_struct._make(struct.unpack('<BBH', pkt_body[pos:pos+4]))
+            subpkt_mac = lte_mac_subpkt.unpack(pkt_body, pos)
             subpkt_body = pkt_body[pos+4:pos+4+subpkt_mac.size]
             pos += subpkt_mac.size
 
             if subpkt_mac.id == 0x07: # DL Transport Block
                 n_samples = subpkt_body[0]
-                subpkt_mac_dl_tb_struct = namedtuple('QcDiagLteMacSubpktDlTransportBlock', 'sfn_subfn rnti_type harq_id pmch_id dl_tbs rlc_pdus padding header_len')
-                subpkt_mac_dl_tb_struct_v4 = namedtuple('QcDiagLteMacSubpktDlTransportBlockV4', 'subid cellid sfn_subfn rnti_type harq_id pmch_id dl_tbs rlc_pdus padding header_len')
                 subpkt_mac_dl_tb = None
                 mac_hdr = b''
 
                 subpkt_pos = 1
                 for j in range(n_samples):
                     if subpkt_mac.version == 0x02:
-                        subpkt_mac_dl_tb = subpkt_mac_dl_tb_struct._make(struct.unpack('<HBBHHBHB', subpkt_body[subpkt_pos:subpkt_pos+12]))
+                        subpkt_mac_dl_tb = lte_mac_subpkt_dl_transport_block.unpack(subpkt_body, subpkt_pos)
                         mac_hdr = subpkt_body[subpkt_pos+12:subpkt_pos+12+subpkt_mac_dl_tb.header_len]
                         subpkt_pos += (12 + subpkt_mac_dl_tb.header_len)
                     elif subpkt_mac.version == 0x04:
-                        subpkt_mac_dl_tb = subpkt_mac_dl_tb_struct_v4._make(struct.unpack('<BBHBBHHBHB', subpkt_body[subpkt_pos:subpkt_pos+14]))
+                        subpkt_mac_dl_tb = lte_mac_subpkt_dl_transport_block_v4.unpack(subpkt_body, subpkt_pos)
                         mac_hdr = subpkt_body[subpkt_pos+14:subpkt_pos+14+subpkt_mac_dl_tb.header_len]
                         subpkt_pos += (14 + subpkt_mac_dl_tb.header_len)
                     else:
@@ -629,26 +639,23 @@ class DiagLteLogParser:
 
         pos = 4
         for i in range(num_subpacket):
-            subpkt_mac_struct = namedtuple('QcDiagLteMacSubpkt', 'id version size')
-            subpkt_mac = subpkt_mac_struct._make(struct.unpack('<BBH', pkt_body[pos:pos+4]))
+            subpkt_mac = lte_mac_subpkt.unpack(pkt_body, pos)
             subpkt_body = pkt_body[pos+4:pos+4+subpkt_mac.size]
             pos += subpkt_mac.size
 
             if subpkt_mac.id == 0x08: # UL Transport Block
                 n_samples = subpkt_body[0]
-                subpkt_mac_ul_tb_struct = namedtuple('QcDiagLteMacSubpktUlTransportBlock', 'sfn_subfn rnti_type harq_id grant rlc_pdus padding bsr_event bsr_trig header_len')
-                subpkt_mac_ul_tb_struct_v2 = namedtuple('QcDiagLteMacSubpktUlTransportBlockV4', 'subid cellid harq_id rnti_type sfn_subfn grant rlc_pdus padding bsr_event bsr_trig header_len')
                 subpkt_mac_ul_tb = None
                 mac_hdr = b''
 
                 subpkt_pos = 1
                 for j in range(n_samples):
                     if subpkt_mac.version == 0x01:
-                        subpkt_mac_ul_tb = subpkt_mac_ul_tb_struct._make(struct.unpack('<HBBHBHBBB', subpkt_body[subpkt_pos:subpkt_pos+12]))
+                        subpkt_mac_ul_tb = lte_mac_subpkt_ul_transport_block.unpack(subpkt_body, subpkt_pos)
                         mac_hdr = subpkt_body[subpkt_pos+12:subpkt_pos+12+subpkt_mac_ul_tb.header_len]
                         subpkt_pos += (12 + subpkt_mac_ul_tb.header_len)
                     elif subpkt_mac.version == 0x02:
-                        subpkt_mac_ul_tb = subpkt_mac_ul_tb_struct_v2._make(struct.unpack('<BBBBHHBHBBB', subpkt_body[subpkt_pos:subpkt_pos+14]))
+                        subpkt_mac_ul_tb = lte_mac_subpkt_ul_transport_block_v4.unpack(subpkt_body, subpkt_pos)
                         mac_hdr = subpkt_body[subpkt_pos+14:subpkt_pos+14+subpkt_mac_ul_tb.header_len]
                         subpkt_pos += (14 + subpkt_mac_ul_tb.header_len)
                     else:
@@ -678,8 +685,7 @@ class DiagLteLogParser:
             radio_id = args['radio_id']
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
         rbid = -1
         pdcp_pkts = []
 
@@ -749,7 +755,7 @@ class DiagLteLogParser:
 
                             ws_hdr += struct.pack('!B',
                                 util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
-                            self.parent.writer.write_up(b'pdcp-lte' + ws_hdr + pdcp_pdu)
+                            self.parent.writer.write_up((b'pdcp-lte', ws_hdr, pdcp_pdu))
                             pos_sample += (13 + pdu_hdr[2])
 
                     else:
@@ -769,8 +775,7 @@ class DiagLteLogParser:
             radio_id = args['radio_id']
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
         pdcp_pkts = []
 
         if pkt_version == 1:
@@ -839,7 +844,7 @@ class DiagLteLogParser:
 
                             ws_hdr += struct.pack('!B',
                                 util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
-                            pdcp_pkts.append(b'pdcp-lte' + ws_hdr + pdcp_pdu)
+                            pdcp_pkts.append((b'pdcp-lte', ws_hdr, pdcp_pdu))
                             pos_sample += (13 + pdu_hdr[2])
 
                     else:
@@ -871,8 +876,7 @@ class DiagLteLogParser:
             radio_id = args['radio_id']
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
         rbid = -1
         pdcp_pkts = []
 
@@ -954,7 +958,7 @@ class DiagLteLogParser:
 
                             ws_hdr += struct.pack('!B',
                                 util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
-                            pdcp_pkts.append(b'pdcp-lte' + ws_hdr + pdcp_pdu)
+                            pdcp_pkts.append((b'pdcp-lte', ws_hdr, pdcp_pdu))
                             pos_sample += (20 + pdu_hdr[2])
 
                     else:
@@ -975,8 +979,7 @@ class DiagLteLogParser:
             radio_id = args['radio_id']
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
         rbid = -1
         pdcp_pkts = []
 
@@ -1058,7 +1061,7 @@ class DiagLteLogParser:
 
                             ws_hdr += struct.pack('!B',
                                 util.pdcp_lte_tags.PDCP_LTE_PAYLOAD_TAG)
-                            pdcp_pkts.append(b'pdcp-lte' + ws_hdr + pdcp_pdu)
+                            pdcp_pkts.append((b'pdcp-lte', ws_hdr, pdcp_pdu))
                             pos_sample += (16 + pdu_hdr[2])
 
                     else:
@@ -1075,17 +1078,14 @@ class DiagLteLogParser:
     def parse_lte_mib(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
         prb_to_mhz = {6: 1.4, 15: 3, 25: 5, 50: 10, 75: 15, 100: 20}
-
-        item_struct = namedtuple('QcDiagLteMib', 'pci earfcn sfn tx_antenna bandwidth')
-        item_struct_v17 = namedtuple('QcDiagLteMibV17', 'pci earfcn sfn sfn_msb4 hsfn_lsb2 sib1_sch_info si_value_tag access_barring opmode_type opmode_info tx_antenna')
         item = None
 
         if pkt_version == 1:
-            item = item_struct._make(struct.unpack('<HHH BB', pkt_body[1:10]))
+            item = lte_mib_v1.unpack(pkt_body, 1)
         elif pkt_version == 2:
-            item = item_struct._make(struct.unpack('<HLH BB', pkt_body[1:12]))
+            item = lte_mib_v2.unpack(pkt_body, 1)
         elif pkt_version == 17:
-            item = item_struct_v17._make(struct.unpack('<HLH BBBBB BHB', pkt_body[1:18]))
+            item = lte_mib_v17.unpack(pkt_body, 1)
         else:
             self.parent.logger.log(logging.WARNING, 'Unknown LTE MIB packet version 0x{:02x}'.format(pkt_version))
             return None
@@ -1109,14 +1109,12 @@ class DiagLteLogParser:
         radio_id = 0
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
-
-        item_struct = namedtuple('QcDiagLteRrcServCellInfo', 'pci dl_earfcn ul_earfcn dl_bw ul_bw cell_id tac band mcc mnc_digit mnc allowed_access')
         if pkt_version == 2:
             # Version, Physical CID, DL EARFCN, UL EARFCN, DL BW, UL BW, Cell ID, TAC, Band, MCC, MNC Digit/MNC, Allowed Access
-            item = item_struct._make(struct.unpack('<H HH BB LH L HBH B', pkt_body[1:25]))
+            item = lte_rrc_serv_cell_info_v2.unpack(pkt_body, 1)
         elif pkt_version == 3:
             # Version, Physical CID, DL EARFCN, UL EARFCN, DL BW, UL BW, Cell ID, TAC, Band, MCC, MNC Digit/MNC, Allowed Access
-            item = item_struct._make(struct.unpack('<H LL BB LH L HBH B', pkt_body[1:29]))
+            item = lte_rrc_serv_cell_info_v3.unpack(pkt_body, 1)
         else:
             self.parent.logger.log(logging.WARNING, 'Unknown LTE RRC cell info packet version 0x{:02x}'.format(pkt_version))
             return None
@@ -1148,27 +1146,23 @@ class DiagLteLogParser:
     def parse_lte_rrc(self, pkt_header, pkt_body, args):
         pkt_version = pkt_body[0]
         msg_content = b''
-
-        item_struct = namedtuple('QcDiagLteRrcOtaPacket', 'rrc_rel_maj rrc_rel_min rbid pci earfcn sfn_subfn pdu_num len')
-        item_struct_v5 = namedtuple('QcDiagLteRrcOtaPacketV5', 'rrc_rel_maj rrc_rel_min rbid pci earfcn sfn_subfn pdu_num sib_mask len')
-        item_struct_v25 = namedtuple('QcDiagLteRrcOtaPacketV25', 'rrc_rel_maj rrc_rel_min nr_rrc_rel_maj nr_rrc_rel_min rbid pci earfcn sfn_subfn pdu_num sib_mask len')
         item = None
 
         if pkt_version >= 25:
             # Version 25, 26, 27
-            item = item_struct_v25._make(struct.unpack('<BBBB BHLH BLH', pkt_body[1:21]))
+            item = lte_rrc_ota_packet_v25.unpack(pkt_body, 1)
             msg_content = pkt_body[21:]
         elif pkt_version >= 8:
             # Version 8, 9, 12, 13, 15, 16, 19, 20, 22, 24
-            item = item_struct_v5._make(struct.unpack('<BB BHLH BLH', pkt_body[1:19]))
+            item = lte_rrc_ota_packet_v8.unpack(pkt_body, 1)
             msg_content = pkt_body[19:]
         elif pkt_version >= 5:
             # Version 6, 7
-            item = item_struct_v5._make(struct.unpack('<BB BHHH BLH', pkt_body[1:17]))
+            item = lte_rrc_ota_packet_v5.unpack(pkt_body, 1)
             msg_content = pkt_body[17:]
         else:
             # Version 2, 3, 4
-            item = item_struct._make(struct.unpack('<BB BHHH BH', pkt_body[1:13]))
+            item = lte_rrc_ota_packet.unpack(pkt_body, 1)
             msg_content = pkt_body[13:]
 
         if item.len != len(msg_content):
@@ -1272,8 +1266,7 @@ class DiagLteLogParser:
             return None
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         if not (item.pdu_num in rrc_subtype_map):
             if self.parent:
@@ -1292,18 +1285,16 @@ class DiagLteLogParser:
             device_sec = ts_sec,
             device_usec = ts_usec)
 
-        return {'cp': [gsmtap_hdr + msg_content], 'ts': pkt_ts}
+        return {'cp': [(gsmtap_hdr, msg_content)], 'ts': pkt_ts}
 
     def parse_lte_nas(self, pkt_header, pkt_body, args, plain = False):
         pkt_version = pkt_body[0]
 
-        item_struct = namedtuple('QcDiagLteNasMsg', 'vermaj vermid vermin')
-        item = item_struct._make(struct.unpack('<BBB', pkt_body[1:4]))
+        item = lte_nas_msg.unpack(pkt_body, 1)
         msg_content = pkt_body[4:]
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         gsmtap_hdr = util.create_gsmtap_header(
             version = 3,
@@ -1313,7 +1304,7 @@ class DiagLteLogParser:
             device_sec = ts_sec,
             device_usec = ts_usec)
 
-        return {'cp': [gsmtap_hdr + msg_content], 'ts': pkt_ts}
+        return {'cp': [(gsmtap_hdr, msg_content)], 'ts': pkt_ts}
 
     def parse_cacombos(self, pkt_header, pkt_body, args):
         self.parent.logger.log(logging.WARNING, "0xB0CD " + util.xxd_oneline(pkt_body))
@@ -4,23 +4,23 @@ from scat.parsers.qualcomm import diagcmd
 import scat.util as util
 
 import struct
-from collections import namedtuple
 import logging
 
+nr_mib_info = util.Layout('QcDiagNrMibInfo', 'pci nrarfcn props', '<HI4s')
+nr_mib_info_v2 = util.Layout('QcDiagNrMibInfoV2', 'pci nrarfcn props', '<HI5s')
+
 class DiagNrLogParser:
     def __init__(self, parent):
         self.parent = parent
 
         self.process = {
             # NR
-            0xB822: lambda x, y, z: self.parse_nr_mib_info(x, y, z), # NR RRC MIB Info
-            0xB826: lambda x, y, z: self.parse_cacombos(x, y, z), # NR RRC Supported CA Combos
+            0xB822: self.parse_nr_mib_info, # NR RRC MIB Info
+            0xB826: self.parse_cacombos, # NR RRC Supported CA Combos
         }
 
     def parse_nr_mib_info(self, pkt_header, pkt_body, args):
         pkt_ver = struct.unpack('<I', pkt_body[0:4])[0]
-
-        item_struct = namedtuple('QcDiagNrMibInfo', 'pci nrarfcn props')
         scs_map = {
             0: 15,
             1: 30,
@@ -30,11 +30,11 @@ class DiagNrLogParser:
 
         scs_str = ''
         if pkt_ver == 0x03: # Version 3
-            item = item_struct._make(struct.unpack('<HI4s', pkt_body[4:14]))
+            item = nr_mib_info.unpack(pkt_body, 4)
             sfn = (item.props[0]) | (((item.props[1] & 0b11000000) >> 6) << 8)
             scs = (item.props[3] & 0b11000000) >> 6
         elif pkt_ver == 0x20000: # Version 131072
-            item = item_struct._make(struct.unpack('<HI5s', pkt_body[4:15]))
+            item = nr_mib_info_v2.unpack(pkt_body, 4)
             sfn = (item.props[0]) | (((item.props[1] & 0b11000000) >> 6) << 8)
             scs = (item.props[3] & 0b10000000) >> 7 | ((item.props[4] & 0b00000001) << 1)
         else:
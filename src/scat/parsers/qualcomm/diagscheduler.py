@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import collections
+import struct
+import time
+import logging
+
+from scat.parsers.qualcomm import diagcmd
+from scat.hdlc import HdlcFramer
+import scat.util as util
+
+class DiagCommandScheduler:
+    """Sends queued DIAG commands back to back and matches the responses
+    by command code, and by subcommand for DIAG_LOG_CONFIG_F and
+    DIAG_EXT_MSG_CONFIG_F.
+
+    Up to window commands are outstanding at once. Responses to the same
+    command arrive in order, error responses (DIAG_BAD_*_F) carry the
+    command they refer to after their first byte. Frames with a bad CRC
+    and other frames received in between, such as log packets, are
+    dropped. Late responses to commands that timed out are dropped as
+    well, instead of being taken for the response of a later command.
+    """
+
+    error_codes = (diagcmd.DIAG_BAD_CMD_F, diagcmd.DIAG_BAD_PARM_F, diagcmd.DIAG_BAD_LEN_F)
+
+    def __init__(self, io_device, window=8, timeout=2.0):
+        self.io_device = io_device
+        self.window = window
+        self.timeout = timeout
+        self.framer = HdlcFramer()
+        self.commands = []
+        # Expiry times of the responses still expected for timed out
+        # commands, by match key
+        self.stale = collections.defaultdict(collections.deque)
+
+        self.elapsed = 0.0
+        self.num_commands = 0
+        self.num_errors = 0
+        self.num_timeouts = 0
+        self.num_dropped = 0
+        self.num_crc_errors = 0
+        self.logger = logging.getLogger('scat.qualcommparser')
+
+    def queue(self, cmd):
+        # cmd: DIAG command without CRC and HDLC framing
+        # Returns the index of its response in the list returned by flush()
+        self.commands.append(cmd)
+        return len(self.commands) - 1
+
+    def match_key(self, cmd):
+        if cmd[0] == diagcmd.DIAG_LOG_CONFIG_F and len(cmd) >= 8:
+            return (cmd[0], struct.unpack('<L', cmd[4:8])[0])
+        elif cmd[0] == diagcmd.DIAG_EXT_MSG_CONFIG_F and len(cmd) >= 2:
+            return (cmd[0], cmd[1])
+        return (cmd[0], None)
+
+    def is_stale(self, key):
+        stale = self.stale.get(key)
+        if not stale:
+            return False
+        now = time.monotonic()
+        while len(stale) > 0 and stale[0] < now:
+            stale.popleft()
+        if len(stale) == 0:
+            return False
+        stale.popleft()
+        return True
+
+    def _receive(self, pending, responses):
+        # Matches the frames of one read, returns the number of responses
+        buf = self.io_device.read(0x1000)
+        if len(buf) == 0:
+            return 0
+
+        num_matched = 0
+        self.framer.feed(buf)
+        for frame in self.framer.frames():
+            pkt = util.unwrap(frame)
+            if len(pkt) < 3:
+                continue
+            crc_pkt = (pkt[-1] << 8) | pkt[-2]
+            pkt = pkt[:-2]
+            if util.dm_crc16(pkt) != crc_pkt:
+                self.num_crc_errors += 1
+                continue
+
+            if pkt[0] in self.error_codes and len(pkt) > 1:
+                key = self.match_key(pkt[1:])
+                self.num_errors += 1
+                self.logger.log(logging.WARNING, 'DIAG command 0x{:02x} rejected with 0x{:02x}'.format(pkt[1], pkt[0]))
+            else:
+                key = self.match_key(pkt)
+
+            if key[1] is None and len(pending[key]) == 0:
+                # Response too short to carry the subcommand, take the
+                # oldest pending command with the same code
+                key = min((x for x in pending if x[0] == key[0] and len(pending[x]) > 0),
+                    key=lambda x: pending[x][0], default=key)
+
+            if self.is_stale(key):
+                self.num_dropped += 1
+            elif len(pending[key]) > 0:
+                responses[pending[key].popleft()] = pkt
+                num_matched += 1
+            else:
+                self.num_dropped += 1
+        return num_matched
+
+    def flush(self):
+        # Sends all queued commands and returns their responses in order,
+        # None for commands without a response before the timeout
+        start = time.monotonic()
+        commands = self.commands
+        self.commands = []
+        responses = [None] * len(commands)
+        pending = collections.defaultdict(collections.deque)
+
+        next_cmd = 0
+        outstanding = 0
+        deadline = start + self.timeout
+        while next_cmd < len(commands) or outstanding > 0:
+            if outstanding < self.window and next_cmd < len(commands):
+                batch = commands[next_cmd:next_cmd + self.window - outstanding]
+                for cmd in batch:
+                    pending[self.match_key(cmd)].append(next_cmd)
+                    next_cmd += 1
+                self.io_device.write(b''.join(util.generate_packet(x) for x in batch), False)
+                outstanding += len(batch)
+
+            num_matched = self._receive(pending, responses)
+            outstanding -= num_matched
+            if num_matched > 0:
+                deadline = time.monotonic() + self.timeout
+            elif time.monotonic() > deadline:
+                # Give up on the outstanding commands, but drop their
+                # responses if they still arrive
+                self.num_timeouts += outstanding
+                expiry = time.monotonic() + self.timeout
+                for key, x in pending.items():
+                    self.stale[key].extend([expiry] * len(x))
+                    x.clear()
+                outstanding = 0
+
+        self.num_commands += len(commands)
+        self.elapsed += time.monotonic() - start
+        return responses
+
+    def stats_str(self):
+        return '{} commands in {:.2f} s, {} errors, {} timeouts, {} CRC errors, {} other frames dropped'.format(
+            self.num_commands, self.elapsed, self.num_errors, self.num_timeouts, self.num_crc_errors, self.num_dropped)
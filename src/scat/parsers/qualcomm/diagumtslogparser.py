@@ -2,10 +2,9 @@
 
 import scat.util as util
 
-import struct
-import calendar
 import logging
-from collections import namedtuple
+
+umts_ue_ota = util.Layout('QcDiagUmtsUeOta', 'direction length', '<BL')
 
 class DiagUmtsLogParser:
     def __init__(self, parent):
@@ -13,8 +12,8 @@ class DiagUmtsLogParser:
 
         self.process = {
             # UMTS (3G NAS)
-            0x713A: lambda x, y, z: self.parse_umts_ue_ota(x, y, z), # UMTS UE OTA
-            0x7B3A: lambda x, y, z: self.parse_umts_ue_ota_dsds(x, y, z), # UMTS DSDS NAS Signaling Messages
+            0x713A: self.parse_umts_ue_ota, # UMTS UE OTA
+            0x7B3A: self.parse_umts_ue_ota_dsds, # UMTS DSDS NAS Signaling Messages
         }
 
     def parse_umts_ue_ota(self, pkt_header, pkt_body, args):
@@ -22,8 +21,7 @@ class DiagUmtsLogParser:
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
 
-        item_struct = namedtuple('QcDiagUmtsUeOta', 'direction length')
-        item = item_struct._make(struct.unpack('<BL', pkt_body[0:5]))
+        item = umts_ue_ota.unpack(pkt_body)
         msg_content = pkt_body[5:]
 
         if item.length != len(msg_content):
@@ -32,8 +30,7 @@ class DiagUmtsLogParser:
             return None
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         # msg_hdr[1] == L3 message length
         # Rest of content: L3 message
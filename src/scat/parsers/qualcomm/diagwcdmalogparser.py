@@ -3,18 +3,34 @@
 import scat.util as util
 
 import struct
-import calendar
 import logging
 import math
-from collections import namedtuple
 import binascii
 
+wcdma_cell_search_v0_3g = util.Layout('QcDiagWcdmaSearchCellReselectionV03G',
+    'uarfcn psc rscp rank_rscp ecio rank_ecio', '<HHbhbh')
+wcdma_cell_search_v1_3g = util.Layout('QcDiagWcdmaSearchCellReselectionV13G',
+    'uarfcn psc rscp rank_rscp ecio rank_ecio resel_status', '<HHbhbhb')
+wcdma_cell_search_v2_3g = util.Layout('QcDiagWcdmaSearchCellReselectionV23G',
+    'uarfcn psc rscp rank_rscp ecio rank_ecio resel_status hcs_priority h_value hcs_cell_qualify', '<HHbhbhbhhb')
+wcdma_cell_search_v0_2g = util.Layout('QcDiagWcdmaSearchCellReselectionV02G',
+    'arfcn bsic rssi rank', '<HHbh')
+wcdma_cell_search_v1_2g = util.Layout('QcDiagWcdmaSearchCellReselectionV12G',
+    'arfcn bsic rssi rank resel_status', '<HHbhb')
+wcdma_cell_search_v2_2g = util.Layout('QcDiagWcdmaSearchCellReselectionV22G',
+    'arfcn bsic rssi rank resel_status hcs_priority h_value hcs_cell_qualify', '<HHbhbhhb')
+wcdma_rlc_dl_am_signaling_pdu = util.Layout('QcDiagWcdmaRlcDlAmSignalingPdu', 'lcid pdu_count pdu_size', '<BHH')
+wcdma_dl_rlc_cipher_pdu = util.Layout('QcDiagWcdmaDlRlcCipherPdu', 'rlc_id ck ciph_alg ciph_msg count_c', '<BLBLL')
+wcdma_ul_rlc_cipher_pdu = util.Layout('QcDiagWcdmaUlRlcCipherPdu', 'rlc_id ck ciph_alg count_c', '<BLBL')
+wcdma_rrc_cell_id = util.Layout('QcDiagWcdmaRrcCellId', 'ul_uarfcn dl_uarfcn cell_id ura_id flags access psc mcc mnc lac rac', '<LL LH BB H 3s 3s LL')
+wcdma_rrc_ota_packet = util.Layout('QcDiagWcdmaRrcOtaPacket', 'channel_type rbid len', '<BBH')
+
 class DiagWcdmaLogParser:
     def __init__(self, parent):
         self.parent = parent
         self.process = {
             # WCDMA Layer 1
-            0x4005: lambda x, y, z: self.parse_wcdma_search_cell_reselection(x, y, z), # WCDMA Search Cell Reselection Rank
+            0x4005: self.parse_wcdma_search_cell_reselection, # WCDMA Search Cell Reselection Rank
             #0x4179 WCDMA PN Search Edition 2
             # 05 00 01 94 FE 00 02 00 02 00 02 00 FE 00 FE 00 A7 29 FF FF FF FF FF FF 00 00 01 04 01 23 00 00 CB 69 D0 18 C0 00 00 00 00 00 00 00 00 00 00 00 00 00 00 5C 51 03 00 AC 4F 03 00 F8 52 03 00 24 51 03 00 18 54 03 00 04 54 03 00 08 02 00 00 78 00 00 00 78 00 00 00 74 00 00 00 71 00 00 00 70 00 00 00
             # 05 00 01 74 FE 00 02 00 02 00 02 00 FE 00 FE 00 A7 29 FF FF FF FF FF FF 00 00 02 04 01 23 00 00 CB 69 D0 18 C0 00 04 01 23 00 00 56 5C 50 12 C0 00 04 00 00 00 00 00 00 00 00 00 00 00 00 5C 51 03 00 48 4F 03 00 88 4E 03 00 4C 51 03 00 2C 52 03 00 6C 52 03 00 BE 03 00 00 86 00 00 00 7E 00 00 00 75 00 00 00 6F 00 00 00 6F 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 B8 E5 02 00 3C E6 02 00 24 E8 02 00 08 E3 02 00 9C E3 02 00 80 E5 02 00 98 02 00 00 7F 00 00 00 78 00 00 00 77 00 00 00 77 00 00 00 76 00 00 00
@@ -22,18 +38,21 @@ class DiagWcdmaLogParser:
             # 01 03 1E FE 01 A3 FF A7 29
 
             # WCDMA Layer 2
-            0x4135: lambda x, y, z: self.parse_wcdma_rlc_dl_am_signaling_pdu(x, y, z), # WCDMA RLC DL AM Signaling PDU
-            0x413C: lambda x, y, z: self.parse_wcdma_rlc_ul_am_signaling_pdu(x, y, z), # WCDMA RLC UL AM Signaling PDU
-            0x4145: lambda x, y, z: self.parse_wcdma_rlc_ul_am_control_pdu_log(x, y, z), # WCDMA RLC UL AM Control PDU Log
-            0x4146: lambda x, y, z: self.parse_wcdma_rlc_dl_am_control_pdu_log(x, y, z), # WCDMA RLC DL AM Control PDU Log
-            0x4168: lambda x, y, z: self.parse_wcdma_rlc_dl_pdu_cipher_packet(x, y, z), # WCDMA RLC DL PDU Cipher Packet
-            0x4169: lambda x, y, z: self.parse_wcdma_rlc_ul_pdu_cipher_packet(x, y, z), # WCDMA RLC UL PDU Cipher Packet
+            0x4135: self.parse_wcdma_rlc_dl_am_signaling_pdu, # WCDMA RLC DL AM Signaling PDU
+            0x413C: self.parse_wcdma_rlc_ul_am_signaling_pdu, # WCDMA RLC UL AM Signaling PDU
+            0x4145: self.parse_wcdma_rlc_ul_am_control_pdu_log, # WCDMA RLC UL AM Control PDU Log
+            0x4146: self.parse_wcdma_rlc_dl_am_control_pdu_log, # WCDMA RLC DL AM Control PDU Log
+            0x4168: self.parse_wcdma_rlc_dl_pdu_cipher_packet, # WCDMA RLC DL PDU Cipher Packet
+            0x4169: self.parse_wcdma_rlc_ul_pdu_cipher_packet, # WCDMA RLC UL PDU Cipher Packet
 
             # WCDMA RRC
-            0x4127: lambda x, y, z: self.parse_wcdma_cell_id(x, y, z), # WCDMA Cell ID
-            0x412F: lambda x, y, z: self.parse_wcdma_rrc(x, y, z), # WCDMA Signaling Messages
+            0x4127: self.parse_wcdma_cell_id, # WCDMA Cell ID
+            0x412F: self.parse_wcdma_rrc, # WCDMA Signaling Messages
         }
 
+        # Log packets updating the serving cell state kept in the parent
+        self.state_log_ids = {0x4127}
+
     def get_real_rscp(self, rscp):
         return rscp - 21
 
@@ -47,19 +66,6 @@ class DiagWcdmaLogParser:
         num_gsm_cells = pkt_body[1] & 0x3f # lower 6b
         stdout = ''
 
-        cell_search_v0_3g = namedtuple('QcDiagWcdmaSearchCellReselectionV03G',
-            'uarfcn psc rscp rank_rscp ecio rank_ecio')
-        cell_search_v0_2g = namedtuple('QcDiagWcdmaSearchCellReselectionV02G',
-            'arfcn bsic rssi rank')
-        cell_search_v1_3g = namedtuple('QcDiagWcdmaSearchCellReselectionV13G',
-            'uarfcn psc rscp rank_rscp ecio rank_ecio resel_status')
-        cell_search_v1_2g = namedtuple('QcDiagWcdmaSearchCellReselectionV12G',
-            'arfcn bsic rssi rank resel_status')
-        cell_search_v2_3g = namedtuple('WcdmaSearchCellReselectionV23G',
-            'uarfcn psc rscp rank_rscp ecio rank_ecio resel_status hcs_priority h_value hcs_cell_qualify')
-        cell_search_v2_2g = namedtuple('WcdmaSearchCellReselectionV22G',
-            'arfcn bsic rssi rank resel_status hcs_priority h_value hcs_cell_qualify')
-
         if pkt_version not in (0, 1, 2):
             self.parent.logger.log(logging.WARNING, 'Unsupported WCDMA search cell reselection version {}'.format(pkt_version))
             self.parent.logger.log(logging.DEBUG, util.xxd(pkt_body))
@@ -72,14 +78,14 @@ class DiagWcdmaLogParser:
 
         for i in range(num_wcdma_cells):
             if pkt_version == 0:
-                cell_3g = cell_search_v0_3g._make(struct.unpack('<HHbhbh', pkt_body[pos:pos+10]))
-                pos += 10
+                cell_3g = wcdma_cell_search_v0_3g.unpack(pkt_body, pos)
+                pos += wcdma_cell_search_v0_3g.size
             elif pkt_version == 1:
-                cell_3g = cell_search_v1_3g._make(struct.unpack('<HHbhbhb', pkt_body[pos:pos+11]))
-                pos += 11
+                cell_3g = wcdma_cell_search_v1_3g.unpack(pkt_body, pos)
+                pos += wcdma_cell_search_v1_3g.size
             elif pkt_version == 2:
-                cell_3g = cell_search_v2_3g._make(struct.unpack('<HHbhbhbhhb', pkt_body[pos:pos+16]))
-                pos += 16
+                cell_3g = wcdma_cell_search_v2_3g.unpack(pkt_body, pos)
+                pos += wcdma_cell_search_v2_3g.size
 
             stdout += 'WCDMA Search Cell: 3G Cell {}: UARFCN {}, PSC {:3d}, RSCP {}, Ec/Io {:.2f}\n'.format(i,
                     cell_3g.uarfcn, cell_3g.psc,
@@ -87,14 +93,14 @@ class DiagWcdmaLogParser:
 
         for i in range(num_gsm_cells):
             if pkt_version == 0:
-                cell_2g = cell_search_v0_2g._make(struct.unpack('<HHbh', pkt_body[pos:pos+7]))
-                pos += 7
+                cell_2g = wcdma_cell_search_v0_2g.unpack(pkt_body, pos)
+                pos += wcdma_cell_search_v0_2g.size
             elif pkt_version == 1:
-                cell_2g = cell_search_v1_2g._make(struct.unpack('<HHbhb', pkt_body[pos:pos+8]))
-                pos += 8
+                cell_2g = wcdma_cell_search_v1_2g.unpack(pkt_body, pos)
+                pos += wcdma_cell_search_v1_2g.size
             elif pkt_version == 2:
-                cell_2g = cell_search_v2_2g._make(struct.unpack('<HHbhbhhb', pkt_body[pos:pos+13]))
-                pos += 13
+                cell_2g = wcdma_cell_search_v2_2g.unpack(pkt_body, pos)
+                pos += wcdma_cell_search_v2_2g.size
 
             stdout += 'WCDMA Search Cell: 2G Cell {}: ARFCN {}, RSSI {:.2f}, Rank {}'.format(i,
                     cell_2g.arfcn & 0xfff, cell_2g.rssi, cell_2g.rank)
@@ -104,13 +110,12 @@ class DiagWcdmaLogParser:
     # WCDMA Layer 2
     def parse_wcdma_rlc_dl_am_signaling_pdu(self, pkt_header, pkt_body, args):
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        item_struct = namedtuple('QcDiagWcdmaRlcDlAmSignalingPdu', 'lcid pdu_count pdu_size')
         num_packets = pkt_body[0]
         packets = []
 
         pos = 1
         for x in range(num_packets):
-            item = item_struct._make(struct.unpack('<BHH', pkt_body[pos:pos+5]))
+            item = wcdma_rlc_dl_am_signaling_pdu.unpack(pkt_body, pos)
             pos += 5
             actual_pdu_size = min(math.ceil(item.pdu_size / 8), len(pkt_body) - pos)
             rlc_pdu = pkt_body[pos:pos+actual_pdu_size]
@@ -126,7 +131,7 @@ class DiagWcdmaLogParser:
                 util.wcdma_rlc_direction_types.DIRECTION_DOWNLINK,
                 util.wcdma_rlc_tags.RLC_PAYLOAD_TAG)
 
-            packets.append(b'umts-rlc' + ws_hdr + rlc_pdu)
+            packets.append((b'umts-rlc', ws_hdr, rlc_pdu))
 
         return {'up': packets, 'ts': pkt_ts}
 
@@ -149,7 +154,7 @@ class DiagWcdmaLogParser:
             util.wcdma_rlc_direction_types.DIRECTION_DOWNLINK,
             util.wcdma_rlc_tags.RLC_PAYLOAD_TAG)
 
-        return {'up': [b'umts-rlc' + ws_hdr + rlc_pdu], 'ts': pkt_ts}
+        return {'up': [(b'umts-rlc', ws_hdr, rlc_pdu)], 'ts': pkt_ts}
 
     def parse_wcdma_rlc_ul_am_control_pdu_log(self, pkt_header, pkt_body, args):
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
@@ -167,16 +172,15 @@ class DiagWcdmaLogParser:
             util.wcdma_rlc_direction_types.DIRECTION_UPLINK,
             util.wcdma_rlc_tags.RLC_PAYLOAD_TAG)
 
-        return {'up': [b'umts-rlc' + ws_hdr + rlc_pdu], 'ts': pkt_ts}
+        return {'up': [(b'umts-rlc', ws_hdr, rlc_pdu)], 'ts': pkt_ts}
 
     def parse_wcdma_rlc_dl_pdu_cipher_packet(self, pkt_header, pkt_body, args):
         num_packets = struct.unpack('<H', pkt_body[0:2])[0]
         pos = 2
         stdout = ''
-        item_struct = namedtuple('QcDiagWcdmaDlRlcCipherPdu', 'rlc_id ck ciph_alg ciph_msg count_c')
 
         for x in range(num_packets):
-            item = item_struct._make(struct.unpack('<BLBLL', pkt_body[pos:pos+14]))
+            item = wcdma_dl_rlc_cipher_pdu.unpack(pkt_body, pos)
             pos += 14
             if item.ciph_alg == 0xff:
                 continue
@@ -189,10 +193,9 @@ class DiagWcdmaLogParser:
         num_packets = struct.unpack('<H', pkt_body[0:2])[0]
         pos = 2
         stdout = ''
-        item_struct = namedtuple('QcDiagWcdmaUlRlcCipherPdu', 'rlc_id ck ciph_alg count_c')
 
         for x in range(num_packets):
-            item = item_struct._make(struct.unpack('<BLBL', pkt_body[pos:pos+10]))
+            item = wcdma_ul_rlc_cipher_pdu.unpack(pkt_body, pos)
             pos += 10
             if item.ciph_alg == 0xff:
                 continue
@@ -206,10 +209,9 @@ class DiagWcdmaLogParser:
         radio_id = 0
         if args is not None and 'radio_id' in args:
             radio_id = args['radio_id']
-        item_struct = namedtuple('QcDiagWcdmaRrcCellId', 'ul_uarfcn dl_uarfcn cell_id ura_id flags access psc mcc mnc lac rac')
         if len(pkt_body) < 32:
             pkt_body += b'\x00' * (32 - len(pkt_body))
-        item = item_struct._make(struct.unpack('<LL LH BB H 3s 3s LL', pkt_body[0:32]))
+        item = wcdma_rrc_cell_id.unpack(pkt_body)
 
         psc = item.psc >> 4
         # UARFCN UL, UARFCN DL, CID, URA_ID, FLAGS, PSC, PLMN_ID, LAC, RAC
@@ -223,8 +225,7 @@ class DiagWcdmaLogParser:
             binascii.hexlify(item.mcc).decode('utf-8'), binascii.hexlify(item.mnc).decode('utf-8'))}
 
     def parse_wcdma_rrc(self, pkt_header, pkt_body, args):
-        item_struct = namedtuple('QcDiagWcdmaRrcOtaPacket', 'channel_type rbid len')
-        item = item_struct._make(struct.unpack('<BBH', pkt_body[0:4]))
+        item = wcdma_rrc_ota_packet.unpack(pkt_body)
         msg_content = b''
         radio_id = 0
         if args is not None and 'radio_id' in args:
@@ -379,8 +380,7 @@ class DiagWcdmaLogParser:
             return None
 
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
-        ts_sec = calendar.timegm(pkt_ts.timetuple())
-        ts_usec = pkt_ts.microsecond
+        ts_sec, ts_usec = util.ts_sec_usec(pkt_ts)
 
         gsmtap_hdr = util.create_gsmtap_header(
             version = 3,
@@ -390,4 +390,4 @@ class DiagWcdmaLogParser:
             device_sec = ts_sec,
             device_usec = ts_usec)
 
-        return {'cp': [gsmtap_hdr + msg_content], 'ts': pkt_ts}
+        return {'cp': [(gsmtap_hdr, msg_content)], 'ts': pkt_ts}
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import multiprocessing
+import collections
+import tempfile
+import pickle
+import mmap
+import logging
+import os
+
+from scat.hdlc import HdlcFramer
+
+def split_chunks(buf, num_chunks, min_chunk_size=0x100000, max_chunk_size=0x2000000):
+    # Cuts buf into (start, end) ranges of roughly equal size, each ending
+    # right after a 0x7e delimiter so that no frame spans two chunks
+    chunk_size = min(max(len(buf) // max(num_chunks, 1), min_chunk_size), max_chunk_size)
+    chunks = []
+    start = 0
+    while start < len(buf):
+        end = buf.find(b'\x7e', start + chunk_size - 1)
+        if end < 0:
+            end = len(buf)
+        else:
+            end += 1
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+def imap_bounded(pool, func, tasks, window):
+    # Like Pool.imap, but with at most window tasks submitted at once, so
+    # that the workers do not run far ahead of the consumer
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task, )))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while len(pending) > 0:
+        yield pending.popleft().get()
+
+def load_results(result_fname):
+    # Yields the objects pickled one by one into result_fname, then
+    # removes the file
+    with open(result_fname, 'rb') as f:
+        unpickler = pickle.Unpickler(f)
+        while True:
+            try:
+                yield unpickler.load()
+            except EOFError:
+                break
+    os.remove(result_fname)
+
+# State of the worker processes, set up by _init_worker
+_worker = None
+
+class _Worker:
+    def __init__(self, parser_class, fname, params, result_dir):
+        self.f = open(fname, 'rb')
+        self.buf = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.result_dir = result_dir
+
+        self.parser = parser_class()
+        self.parser.set_parameter(params)
+        self.process = self.parser.process
+        self.state_process = {x: self.parser.process[x] for x in self.parser.state_log_ids if x in self.parser.process}
+
+    def scan_state(self, chunk):
+        # Runs only the log packets updating the serving cell state and
+        # returns the fields they changed, None for untouched entries.
+        # Frames are checked with the configured CRC policy, so that frames
+        # dropped by the decoding pass do not change the state either.
+        # Warnings are left to the decoding pass
+        parser = self.parser
+        parser.set_state(parser.empty_state())
+        parser.process = self.state_process
+        log_level = parser.logger.level
+        parser.logger.setLevel(logging.ERROR)
+        try:
+            for pkt in HdlcFramer().scan(self.buf, False, chunk[0], chunk[1]):
+                if pkt[0] in (0x10, 0x98):
+                    parser.parse_diag(pkt)
+        finally:
+            parser.process = self.process
+            parser.logger.setLevel(log_level)
+        return parser.get_state()
+
+    def decode(self, index, chunk, state):
+        # Results are pickled into a file one by one instead of being
+        # returned as a list in a single message
+        parser = self.parser
+        parser.set_state(state)
+        checker = parser.crc_checker
+        checker.num_checked = checker.num_skipped = checker.num_errors = 0
+        if parser.log_filter is not None:
+            parser.log_filter.reset()
+
+        result_fname = os.path.join(self.result_dir, '{:06d}.results'.format(index))
+        with open(result_fname, 'wb') as f:
+            pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+            for pkt in HdlcFramer().scan(self.buf, False, chunk[0], chunk[1]):
+                parse_result = parser.parse_diag(pkt)
+                if parse_result is not None:
+                    pickler.dump(parse_result)
+        filter_stats = parser.log_filter.stats() if parser.log_filter is not None else None
+        return result_fname, checker.stats(), filter_stats
+
+def _init_worker(parser_class, fname, params, result_dir):
+    global _worker
+    _worker = _Worker(parser_class, fname, params, result_dir)
+
+def _scan_state(chunk):
+    return _worker.scan_state(chunk)
+
+def _decode(args):
+    return _worker.decode(*args)
+
+def apply_state(state, delta):
+    # Overlays the entries a chunk changed on the state at its start
+    new_state = {}
+    for field, values in state.items():
+        new_state[field] = [y if y is not None else x for x, y in zip(values, delta[field])]
+    return new_state
+
+def run_parallel(parser, fname, jobs, chunks_per_job=4, min_chunk_size=0x100000, max_chunk_size=0x2000000):
+    """Decodes a memory-mapped QMDL dump with a pool of worker processes.
+
+    The dump is split into chunks of at most max_chunk_size bytes at 0x7e
+    boundaries. A first pass over all chunks collects the serving cell
+    state each chunk leaves behind, so that every chunk is decoded starting
+    from the state the sequential decoder would have had. Results are
+    streamed back through temporary files and handed to
+    postprocess_parse_result in file order. At most two chunks per job are
+    decoded ahead of the writer.
+    """
+    logger = logging.getLogger('scat.qualcommparser')
+    chunks = split_chunks(parser.io_device.mapped_buf, jobs * chunks_per_job, min_chunk_size, max_chunk_size)
+    params = parser.get_worker_parameters()
+
+    with tempfile.TemporaryDirectory(prefix='scat-') as tmpdir, \
+            multiprocessing.Pool(jobs, _init_worker, (type(parser), fname, params, tmpdir)) as pool:
+        deltas = pool.map(_scan_state, chunks)
+
+        states = []
+        state = parser.get_state()
+        for delta in deltas:
+            states.append(state)
+            state = apply_state(state, delta)
+
+        checker = parser.crc_checker
+        tasks = zip(range(len(chunks)), chunks, states)
+        for result_fname, crc_stats, filter_stats in imap_bounded(pool, _decode, tasks, 2 * jobs):
+            for parse_result in load_results(result_fname):
+                parser.postprocess_parse_result(parse_result)
+            checker.num_checked += crc_stats['checked']
+            checker.num_skipped += crc_stats['skipped']
+            checker.num_errors += crc_stats['errors']
+            if filter_stats is not None:
+                parser.log_filter.merge(filter_stats)
+
+    parser.set_state(state)
+    logger.log(logging.INFO, 'Decoded {} chunks with {} jobs'.format(len(chunks), jobs))
+    logger.log(logging.INFO, 'CRC: {}'.format(parser.crc_checker.stats_str()))
+    if parser.log_filter is not None:
+        logger.log(logging.INFO, 'Filter: {}'.format(parser.log_filter.stats_str()))
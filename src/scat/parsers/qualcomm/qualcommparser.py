@@ -18,14 +18,26 @@ from scat.parsers.qualcomm.diaglteeventparser import DiagLteEventParser
 from scat.parsers.qualcomm.diaggsmeventparser import DiagGsmEventParser
 from scat.parsers.qualcomm.diagfallbackeventparser import DiagFallbackEventParser
 
+from scat.parsers.qualcomm import parallel
+from scat.parsers.qualcomm.diagscheduler import DiagCommandScheduler
+from scat.parsers.qualcomm.capcache import CapabilityCache
+from scat.hdlc import HdlcFramer, CrcChecker
+from scat.logfilter import LogFilter
 import scat.util as util
 import struct
-import datetime
+import time
 import logging
-from collections import namedtuple
 import binascii
 
 class QualcommParser:
+    # Serving cell state carried from one packet to the next
+    state_fields = ('gsm_last_cell_id', 'gsm_last_arfcn',
+        'umts_last_cell_id', 'umts_last_uarfcn_dl', 'umts_last_uarfcn_ul',
+        'lte_last_cell_id', 'lte_last_earfcn_dl', 'lte_last_earfcn_ul',
+        'lte_last_earfcn_tdd', 'lte_last_sfn', 'lte_last_tx_ant',
+        'lte_last_bw_dl', 'lte_last_bw_ul', 'lte_last_band_ind',
+        'lte_last_tcrnti')
+
     def __init__(self):
         self.gsm_last_cell_id = [0, 0]
         self.gsm_last_arfcn = [0, 0]
@@ -47,11 +59,22 @@ class QualcommParser:
 
         self.io_device = None
         self.writer = None
+        self.crc_checker = CrcChecker()
         self.parse_msgs = False
         self.parse_events = False
         self.qsr_hash_filename = ''
         self.qsr4_hash_filename = ''
         self.emr_id_range = []
+        self.jobs = 1
+        self.scheduler = None
+        self.capability_cache = None
+        self.capabilities = None
+        self.build_id = None
+        self.log_profile = None
+        self.log_ids = []
+        self.include_ids = []
+        self.exclude_ids = []
+        self.log_filter = None
 
         self.name = 'qualcomm'
         self.shortname = 'qc'
@@ -63,6 +86,7 @@ class QualcommParser:
             DiagLteLogParser(self), Diag1xLogParser(self), DiagNrLogParser(self)]
         self.process = { }
         self.no_process = { }
+        self.state_log_ids = set()
 
         for p in self.diag_log_parsers:
             self.process.update(p.process)
@@ -70,6 +94,10 @@ class QualcommParser:
                 self.no_process.update(p.no_process)
             except AttributeError:
                 pass
+            try:
+                self.state_log_ids.update(p.state_log_ids)
+            except AttributeError:
+                pass
 
         self.diag_event_parsers = [DiagCommonEventParser(self),
             DiagGsmEventParser(self), DiagLteEventParser(self)]
@@ -85,6 +113,27 @@ class QualcommParser:
             except AttributeError:
                 pass
 
+        self.diag_handlers = { }
+        self.update_diag_handlers()
+
+    def update_diag_handlers(self):
+        # Command code to handler, looked up once per packet in parse_diag
+        handlers = {
+            diagcmd.DIAG_LOG_F: self.parse_diag_log,
+            diagcmd.DIAG_MULTI_RADIO_CMD_F: self.parse_diag_multisim,
+            diagcmd.DIAG_VERNO_F: self.parse_diag_version,
+            diagcmd.DIAG_EXT_BUILD_ID_F: self.parse_diag_ext_build_id,
+            diagcmd.DIAG_LOG_CONFIG_F: self.parse_diag_log_config,
+            diagcmd.DIAG_EXT_MSG_CONFIG_F: self.parse_diag_ext_msg_config,
+        }
+        if self.parse_events:
+            handlers[diagcmd.DIAG_EVENT_REPORT_F] = self.parse_diag_event
+        if self.parse_msgs:
+            handlers[diagcmd.DIAG_EXT_MSG_F] = self.parse_diag_ext_msg
+            handlers[diagcmd.DIAG_QSR_EXT_MSG_TERSE_F] = self.parse_diag_qsr_ext_msg
+            handlers[diagcmd.DIAG_QSR4_EXT_MSG_TERSE_F] = self.parse_diag_qsr4_ext_msg
+        self.diag_handlers = handlers
+
     def set_io_device(self, io_device):
         self.io_device = io_device
 
@@ -95,6 +144,10 @@ class QualcommParser:
         for p in params:
             if p == 'log_level':
                 self.logger.setLevel(params[p])
+            elif p == 'crc-policy':
+                self.crc_checker.set_policy(params[p])
+            elif p == 'crc-sample':
+                self.crc_checker.set_policy(self.crc_checker.policy, params[p])
             elif p == 'qsr-hash':
                 self.qsr_hash_filename = params[p]
                 self.parse_msgs = True
@@ -105,6 +158,72 @@ class QualcommParser:
                 self.parse_events = params[p]
             elif p == 'msgs':
                 self.parse_msgs = params[p]
+            elif p == 'jobs':
+                self.jobs = params[p]
+            elif p == 'log-profile':
+                self.log_profile = params[p]
+            elif p == 'log-ids':
+                self.log_ids = params[p]
+            elif p == 'include-ids':
+                self.include_ids = params[p]
+                self.set_log_filter()
+            elif p == 'exclude-ids':
+                self.exclude_ids = params[p]
+                self.set_log_filter()
+            elif p == 'capability-cache':
+                self.capability_cache = CapabilityCache(params[p]) if params[p] else None
+        self.update_diag_handlers()
+
+    def get_worker_parameters(self):
+        # Parameters for the parsers of the parallel decoding workers
+        params = {'log_level': self.logger.level,
+            'crc-policy': self.crc_checker.policy,
+            'crc-sample': self.crc_checker.sample_interval,
+            'events': self.parse_events,
+            'msgs': self.parse_msgs}
+        if self.qsr_hash_filename:
+            params['qsr-hash'] = self.qsr_hash_filename
+        if self.qsr4_hash_filename:
+            params['qsr4-hash'] = self.qsr4_hash_filename
+        if self.log_filter is not None:
+            params['include-ids'] = self.include_ids
+            params['exclude-ids'] = self.exclude_ids
+        return params
+
+    def set_log_filter(self):
+        if len(self.include_ids) > 0 or len(self.exclude_ids) > 0:
+            self.log_filter = LogFilter(self.include_ids, self.exclude_ids)
+        else:
+            self.log_filter = None
+
+    def get_framer(self):
+        # Splits device reads into whole frames for the pipeline reader
+        return HdlcFramer(keep_delimiter=True)
+
+    def get_frame_id(self, frame):
+        # Log ID of DIAG_LOG_F frames, command code of other frames, taken
+        # from the header of a still escaped frame
+        # Only the header bytes are unescaped, and only if needed
+        hdr = bytes(frame[:16])
+        if hdr.find(b'\x7d') >= 0:
+            hdr = util.unwrap(bytes(frame[:32]))
+
+        pos = 0
+        if hdr[0] == diagcmd.DIAG_MULTI_RADIO_CMD_F and len(hdr) > 8:
+            pos = 8
+        if hdr[pos] == diagcmd.DIAG_LOG_F and len(hdr) >= pos + 8:
+            return hdr[pos + 6] | (hdr[pos + 7] << 8)
+        return hdr[pos]
+
+    def get_state(self):
+        return {x: list(getattr(self, x)) for x in self.state_fields}
+
+    def empty_state(self):
+        return {x: [None] * len(getattr(self, x)) for x in self.state_fields}
+
+    def set_state(self, state):
+        for x in self.state_fields:
+            setattr(self, x, list(state[x]))
 
     def sanitize_radio_id(self, radio_id):
         if radio_id <= 0:
@@ -119,97 +238,135 @@ class QualcommParser:
         # Disable static event reporting
         self.io_device.read(0x1000)
 
-        self.io_device.write(util.generate_packet(struct.pack('<B', diagcmd.DIAG_VERNO_F)), False)
-        ver_buf = self.io_device.read(0x1000)
-        result = self.parse_diag(ver_buf[:-1])
-        if result:
-            self.postprocess_parse_result(result)
+        self.scheduler = DiagCommandScheduler(self.io_device)
+        queue = self.scheduler.queue
 
-        self.io_device.write(util.generate_packet(struct.pack('<B', diagcmd.DIAG_EXT_BUILD_ID_F)), False)
-        build_id_buf = self.io_device.read(0x1000)
-        result = self.parse_diag(build_id_buf[:-1])
-        if result:
-            self.postprocess_parse_result(result)
-
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x00)), 0x1000, False)
-
-        self.io_device.write(util.generate_packet(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, diagcmd.LOG_CONFIG_RETRIEVE_ID_RANGES_OP)), False)
-        log_config_buf = self.io_device.read(0x1000)
-        result = self.parse_diag(log_config_buf[:-1])
-        if result:
-            self.postprocess_parse_result(result)
+        ver = queue(struct.pack('<B', diagcmd.DIAG_VERNO_F))
+        build_id = queue(struct.pack('<B', diagcmd.DIAG_EXT_BUILD_ID_F))
+        queue(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x00))
 
         # Send empty masks
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_1x()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_wcdma()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_gsm()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_umts()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_dtv()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_lte()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_empty_tdscdma()), 0x1000, False)
-
-        self.io_device.write(util.generate_packet(struct.pack('<BB', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x01)), False)
-        ext_msg_buf = self.io_device.read(0x1000)
-        result = self.parse_diag(ext_msg_buf[:-1])
-        if result:
-            self.postprocess_parse_result(result)
-
-        emr = lambda x, y: diagcmd.create_extended_message_config_set_mask(x, y)
-        if 'id_range' in result:
-            self.emr_id_range = result['id_range']
-            for x in result['id_range']:
-                self.io_device.write_then_read_discard(util.generate_packet(emr(x[0], x[1])), 0x1000, False)
+        queue(diagcmd.log_mask_empty_1x())
+        queue(diagcmd.log_mask_empty_wcdma())
+        queue(diagcmd.log_mask_empty_gsm())
+        queue(diagcmd.log_mask_empty_umts())
+        queue(diagcmd.log_mask_empty_dtv())
+        queue(diagcmd.log_mask_empty_lte())
+        queue(diagcmd.log_mask_empty_tdscdma())
+        responses = self.scheduler.flush()
+
+        self.build_id = None
+        for i in (ver, build_id):
+            if responses[i] is None:
+                continue
+            result = self.parse_diag(responses[i], hdlc_encoded=False, check_crc=False)
+            if result:
+                self.postprocess_parse_result(result)
+                if 'build_id' in result:
+                    self.build_id = result['build_id']
+
+        # ID ranges and levels do not change for a given firmware
+        self.capabilities = None
+        if self.capability_cache and self.build_id:
+            self.capabilities = self.capability_cache.get(self.build_id)
+
+        if self.capabilities:
+            self.logger.log(logging.INFO, 'Using cached capabilities of {}'.format(self.build_id))
+            self.emr_id_range = self.capabilities['id_range']
         else:
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x0000, 0x0065)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x01f4, 0x01fa)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x03e8, 0x033f)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x07d0, 0x07d8)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x0bb8, 0x0bc6)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x0fa0, 0x0faa)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1194, 0x11ae)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x11f8, 0x1206)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1388, 0x13a6)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x157c, 0x158c)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1770, 0x17c0)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1964, 0x1979)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1b58, 0x1b5b)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1bbc, 0x1bc7)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1c20, 0x1c21)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x1f40, 0x1f40)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x2134, 0x214c)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x2328, 0x2330)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x251c, 0x2525)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x27d8, 0x27e2)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x280b, 0x280f)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x283c, 0x283c)), 0x1000, False)
-            self.io_device.write_then_read_discard(util.generate_packet(emr(0x286e, 0x2886)), 0x1000, False)
+            queue(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, diagcmd.LOG_CONFIG_RETRIEVE_ID_RANGES_OP))
+            queue(struct.pack('<BB', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x01))
+            for resp in self.scheduler.flush():
+                if resp is None:
+                    continue
+                result = self.parse_diag(resp, hdlc_encoded=False, check_crc=False)
+                if result:
+                    self.postprocess_parse_result(result)
+                    if 'id_range' in result:
+                        self.emr_id_range = result['id_range']
+                        self.capabilities = {'id_range': result['id_range'], 'levels': None}
+                        self.save_capabilities()
+
+        emr = diagcmd.create_extended_message_config_set_mask
+        if len(self.emr_id_range) > 0:
+            for x in self.emr_id_range:
+                queue(emr(x[0], x[1]))
+        else:
+            queue(emr(0x0000, 0x0065))
+            queue(emr(0x01f4, 0x01fa))
+            queue(emr(0x03e8, 0x033f))
+            queue(emr(0x07d0, 0x07d8))
+            queue(emr(0x0bb8, 0x0bc6))
+            queue(emr(0x0fa0, 0x0faa))
+            queue(emr(0x1194, 0x11ae))
+            queue(emr(0x11f8, 0x1206))
+            queue(emr(0x1388, 0x13a6))
+            queue(emr(0x157c, 0x158c))
+            queue(emr(0x1770, 0x17c0))
+            queue(emr(0x1964, 0x1979))
+            queue(emr(0x1b58, 0x1b5b))
+            queue(emr(0x1bbc, 0x1bc7))
+            queue(emr(0x1c20, 0x1c21))
+            queue(emr(0x1f40, 0x1f40))
+            queue(emr(0x2134, 0x214c))
+            queue(emr(0x2328, 0x2330))
+            queue(emr(0x251c, 0x2525))
+            queue(emr(0x27d8, 0x27e2))
+            queue(emr(0x280b, 0x280f))
+            queue(emr(0x283c, 0x283c))
+            queue(emr(0x286e, 0x2886))
+        self.scheduler.flush()
 
     def prepare_diag(self):
         self.logger.log(logging.INFO, 'Starting diag')
+        if self.scheduler is None:
+            self.scheduler = DiagCommandScheduler(self.io_device)
+        queue = self.scheduler.queue
 
         emr_level_range = []
         if self.parse_msgs:
-            if len(self.emr_id_range) > 0:
+            if self.capabilities and self.capabilities['levels'] is not None:
+                emr_level_range = self.capabilities['levels']
+            elif len(self.emr_id_range) > 0:
                 for x in self.emr_id_range:
-                    self.io_device.write(util.generate_packet(struct.pack('<BBHH', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x02, x[0], x[1])), False)
-                    ext_msg_level_buf = self.io_device.read(0x1000)
-                    result = self.parse_diag(ext_msg_level_buf[:-1])
+                    queue(struct.pack('<BBHH', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x02, x[0], x[1]))
+                for ext_msg_level_buf in self.scheduler.flush():
+                    if ext_msg_level_buf is None:
+                        continue
+                    result = self.parse_diag(ext_msg_level_buf, hdlc_encoded=False, check_crc=False)
                     if result:
                         self.postprocess_parse_result(result)
-                    emr_level_range.append((result['start'], result['end'], result['level']))
+                        emr_level_range.append((result['start'], result['end'], result['level']))
+                if self.capabilities and len(emr_level_range) == len(self.emr_id_range):
+                    self.capabilities['levels'] = emr_level_range
+                    self.save_capabilities()
 
             if len(emr_level_range) > 0:
                 for x in emr_level_range:
-                    self.io_device.write_then_read_discard(util.generate_packet(diagcmd.create_extended_message_config_set_mask(x[0], x[1], *x[2])), 0x1000, False)
+                    queue(diagcmd.create_extended_message_config_set_mask(x[0], x[1], *x[2]))
 
         # Static event reporting Enable
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x01)), 0x1000, False)
+        queue(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x01))
+
+        for mask in self.get_log_masks():
+            queue(mask)
+        self.scheduler.flush()
 
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_1x()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_wcdma()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_gsm()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_umts()), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(diagcmd.log_mask_scat_lte()), 0x1000, False)
+        self.logger.log(logging.INFO, 'Diag setup: {}'.format(self.scheduler.stats_str()))
+        self.scheduler = None
+
+    def get_log_masks(self):
+        # Without a profile or log IDs the preferred SCAT masks are used
+        log_profile = self.log_profile
+        if log_profile is None and len(self.log_ids) == 0:
+            log_profile = 'full'
+
+        log_ids = diagcmd.log_mask_profile(log_profile) if log_profile else []
+        return diagcmd.create_log_config_set_masks(log_ids + self.log_ids)
+
+    def save_capabilities(self):
+        if self.capability_cache and self.build_id:
+            self.capability_cache.put(self.build_id, self.capabilities)
 
     def parse_diag(self, pkt, hdlc_encoded = True, check_crc = True, args = None):
         # Should contain DIAG command and CRC16
@@ -221,143 +378,204 @@ class QualcommParser:
             return
 
         if hdlc_encoded:
+            if self.log_filter is not None and not self.log_filter.accept(self.get_frame_id(pkt)):
+                return None
             pkt = util.unwrap(pkt)
 
         # Check and strip CRC if existing
         if check_crc:
-            crc = util.dm_crc16(pkt[:-2])
             crc_pkt = (pkt[-1] << 8) | pkt[-2]
-            if crc != crc_pkt:
+            pkt = pkt[:-2]
+            if not self.crc_checker.check_body(pkt, crc_pkt):
+                crc = util.dm_crc16(pkt)
                 self.logger.log(logging.WARNING, "CRC mismatch: expected 0x{:04x}, got 0x{:04x}".format(crc, crc_pkt))
                 self.logger.log(logging.DEBUG, util.xxd(pkt))
-            pkt = pkt[:-2]
 
-        if pkt[0] == diagcmd.DIAG_LOG_F:
-            return self.parse_diag_log(pkt, args)
-        elif pkt[0] == diagcmd.DIAG_EVENT_REPORT_F and self.parse_events:
-            return self.parse_diag_event(pkt)
-        elif pkt[0] == diagcmd.DIAG_EXT_MSG_F and self.parse_msgs:
-            return self.parse_diag_ext_msg(pkt)
-        elif pkt[0] == diagcmd.DIAG_QSR_EXT_MSG_TERSE_F and self.parse_msgs:
-            return self.parse_diag_qsr_ext_msg(pkt)
-        elif pkt[0] == diagcmd.DIAG_QSR4_EXT_MSG_TERSE_F and self.parse_msgs:
-            return self.parse_diag_qsr4_ext_msg(pkt)
-        elif pkt[0] == diagcmd.DIAG_MULTI_RADIO_CMD_F:
-            return self.parse_diag_multisim(pkt)
-        elif pkt[0] == diagcmd.DIAG_VERNO_F:
-            return self.parse_diag_version(pkt)
-        elif pkt[0] == diagcmd.DIAG_EXT_BUILD_ID_F:
-            return self.parse_diag_ext_build_id(pkt)
-        elif pkt[0] == diagcmd.DIAG_LOG_CONFIG_F:
-            return self.parse_diag_log_config(pkt)
-        elif pkt[0] == diagcmd.DIAG_EXT_MSG_CONFIG_F:
-            return self.parse_diag_ext_msg_config(pkt)
-        else:
+        handler = self.diag_handlers.get(pkt[0])
+        if handler is None:
             #print("Not parsing non-Log packet %02x" % pkt[0])
             #util.xxd(pkt)
             return None
+        return handler(pkt, args)
 
-    def run_diag(self, writer_qmdl = None):
-        oldbuf = b''
-        loop = True
-        try:
-            while loop:
-                buf = self.io_device.read(0x1000)
-                if len(buf) == 0:
-                    if self.io_device.block_until_data:
-                        continue
-                    else:
-                        loop = False
-                buf = oldbuf + buf
-                buf_atom = buf.split(b'\x7e')
+    def read_frames(self, framer):
+        if self.io_device.mapped_buf is not None:
+            # Memory-mapped dump, scan it in place
+            yield from framer.scan(self.io_device.mapped_buf)
+            return
 
-                if len(buf) < 1 or buf[-1] != 0x7e:
-                    oldbuf = buf_atom.pop()
+        loop = True
+        while loop:
+            buf = self.io_device.read(0x1000)
+            if len(buf) == 0:
+                if self.io_device.block_until_data:
+                    continue
                 else:
-                    oldbuf = b''
+                    loop = False
+            framer.feed(buf)
+            yield from framer.frames()
 
-                for pkt in buf_atom:
-                    if len(pkt) == 0:
-                        continue
-                    parse_result = self.parse_diag(pkt)
+    def run_diag(self, writer_qmdl = None):
+        framer = HdlcFramer()
+        try:
+            for pkt in self.read_frames(framer):
+                parse_result = self.parse_diag(pkt)
 
-                    if writer_qmdl:
-                        writer_qmdl.write_cp(pkt + b'\x7e')
+                if writer_qmdl:
+                    writer_qmdl.write_cp(b''.join((pkt, b'\x7e')))
 
-                    if parse_result is not None:
-                        self.postprocess_parse_result(parse_result)
+                if parse_result is not None:
+                    self.postprocess_parse_result(parse_result)
 
         except KeyboardInterrupt:
             return
+        finally:
+            self.logger.log(logging.INFO, 'Framing: {}'.format(framer.stats_str()))
+            self.logger.log(logging.INFO, 'CRC: {}'.format(self.crc_checker.stats_str()))
+            if self.log_filter is not None:
+                self.logger.log(logging.INFO, 'Filter: {}'.format(self.log_filter.stats_str()))
 
     def stop_diag(self):
         self.io_device.read(0x1000)
         self.logger.log(logging.INFO, 'Stopping diag')
+        scheduler = DiagCommandScheduler(self.io_device)
         # Static event reporting Disable
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x00)), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, diagcmd.LOG_CONFIG_DISABLE_OP)), 0x1000, False)
-        self.io_device.write_then_read_discard(util.generate_packet(struct.pack('<BBHHH', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x05, 0x0000, 0x0000, 0x0000)), 0x1000, False)
+        scheduler.queue(struct.pack('<BB', diagcmd.DIAG_EVENT_REPORT_F, 0x00))
+        scheduler.queue(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, diagcmd.LOG_CONFIG_DISABLE_OP))
+        scheduler.queue(struct.pack('<BBHHH', diagcmd.DIAG_EXT_MSG_CONFIG_F, 0x05, 0x0000, 0x0000, 0x0000))
+        scheduler.flush()
+
+    def iter_dlf_records(self):
+        # Walks the length-prefixed DLF records by offset
+        # Yields (file offset, buffer, record offset in buffer, record length)
+        if self.io_device.mapped_buf is not None:
+            # Memory-mapped dump, walk it in place
+            buf = self.io_device.mapped_buf
+            eof = True
+        else:
+            buf = b''
+            eof = False
+        buf_offset = 0
+        pos = 0
 
-    def parse_dlf(self):
-        oldbuf = b''
         while True:
-            buf = self.io_device.read(0x100000)
-            #print("%d"% len(buf))
-            if len(buf) == 0:
-                break
-            buf = oldbuf + buf
-
-            pkt_len = struct.unpack('<H', buf[0:2])[0]
-            while len(buf) >= pkt_len:
-                # DLF lacks CRC16/other fancy stuff
-                pkt = buf[0:pkt_len]
-                pkt = b'\x10\x00' + pkt[0:2] + pkt
-                parse_result = self.parse_diag(pkt, check_crc=False, hdlc_encoded=False)
+            if pos + 2 <= len(buf):
+                pkt_len = struct.unpack_from('<H', buf, pos)[0]
+                if pkt_len < 2:
+                    self.logger.log(logging.WARNING, 'Invalid DLF record length {} at offset {}, stopping'.format(pkt_len, buf_offset + pos))
+                    break
+                if pos + pkt_len <= len(buf):
+                    yield (buf_offset + pos, buf, pos, pkt_len)
+                    pos += pkt_len
+                    continue
 
-                if parse_result is not None:
-                    self.postprocess_parse_result(parse_result)
+            if eof:
+                break
+            chunk = self.io_device.read(0x100000)
+            if len(chunk) == 0:
+                eof = True
+            buf_offset += pos
+            buf = buf[pos:] + chunk
+            pos = 0
+
+    def parse_dlf_record(self, buf, pos, pkt_len):
+        # DLF records are DIAG_LOG_F packets without the command code,
+        # reserved byte and first length field, and lack CRC16
+        if pkt_len < 12:
+            return None
+        length2, log_id, timestamp = struct.unpack_from('<HHQ', buf, pos)
+        if self.log_filter is not None and not self.log_filter.accept(log_id):
+            return None
+        pkt_header = self.log_header.type(diagcmd.DIAG_LOG_F, 0, pkt_len, length2, log_id, timestamp)
+        return self.process_diag_log(pkt_header, buf[pos + 12:pos + pkt_len])
 
-                buf = buf[pkt_len:]
+    def parse_dlf(self):
+        for offset, buf, pos, pkt_len in self.iter_dlf_records():
+            parse_result = self.parse_dlf_record(buf, pos, pkt_len)
 
-                if len(buf) < 2:
-                    break
-                pkt_len = struct.unpack('<H', buf[0:2])[0]
+            if parse_result is not None:
+                self.postprocess_parse_result(parse_result)
 
-            oldbuf = buf
+    def build_dlf_index(self):
+        # Returns (file offset, record length, log ID, timestamp) of every record
+        index = []
+        for offset, buf, pos, pkt_len in self.iter_dlf_records():
+            if pkt_len < 12:
+                continue
+            log_id, timestamp = struct.unpack_from('<HQ', buf, pos + 2)
+            index.append((offset, pkt_len, log_id, timestamp))
+        return index
+
+    def parse_dlf_at(self, offset):
+        # Parses a single record at a file offset taken from build_dlf_index()
+        self.io_device.seek(offset)
+        hdr = self.io_device.read(2)
+        if len(hdr) < 2:
+            return None
+        pkt_len = struct.unpack('<H', hdr)[0]
+        if pkt_len < 2:
+            return None
+        pkt = hdr + self.io_device.read(pkt_len - 2)
+        if len(pkt) < pkt_len:
+            return None
+        return self.parse_dlf_record(pkt, 0, pkt_len)
 
     # Experimental HDF parser.
     # It scans the file for packets in the format "0x10 0x00 packet_length body"
     # Ignoring any additional fields that the file might contain
     def parse_hdf(self):
-        while True:
-            header = self.io_device.read(1)
-
-            # EOF check
-            if len(header) == 0:
-                break
+        if self.io_device.mapped_buf is not None:
+            # Memory-mapped dump, scan it in place
+            buf = self.io_device.mapped_buf
+            eof = True
+        else:
+            buf = b''
+            eof = False
+        pos = 0
 
-            # First byte must be 0x10
-            if header != b'\x10':
-                continue
+        while True:
+            pos = buf.find(b'\x10\x00', pos)
 
-            # Second byte must be 0x00
-            header += self.io_device.read(1)
-            if header != b'\x10\x00':
+            # Header and duplicated length field must be in the buffer
+            if pos < 0 or pos + 6 > len(buf):
+                if eof:
+                    break
+                if pos < 0:
+                    # Last byte might be the beginning of the header
+                    pos = max(len(buf) - 1, 0)
+                chunk = self.io_device.read(0x100000)
+                if len(chunk) == 0:
+                    eof = True
+                buf = buf[pos:] + chunk
+                pos = 0
                 continue
 
             # pkt length from header and pkt length from body must be equal
-            header += self.io_device.read(2)
-            body = self.io_device.read(2)
-            if header[2:4] != body[0:2]:
+            if buf[pos+2:pos+4] != buf[pos+4:pos+6]:
+                pos += 1
                 continue
 
-            # Convert pkt length to int
-            pkt_len = struct.unpack('<H', header[2:4])[0]
+            pkt_len = struct.unpack_from('<H', buf, pos + 2)[0]
+            if pkt_len < 2:
+                pos += 1
+                continue
 
             # Read full body
-            body += self.io_device.read(pkt_len - 2)
-            pkt = header + body
+            end = pos + 4 + pkt_len
+            if end > len(buf) and not eof:
+                chunk = self.io_device.read(0x100000)
+                if len(chunk) == 0:
+                    eof = True
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+
+            pkt = buf[pos:end]
+            pos = min(end, len(buf))
 
+            # Unescaped DIAG_LOG_F packets, log ID at offset 6
+            if self.log_filter is not None and len(pkt) >= 8 and not self.log_filter.accept(pkt[6] | (pkt[7] << 8)):
+                continue
             parse_result = self.parse_diag(pkt, check_crc=False, hdlc_encoded=False)
             if parse_result is not None:
                 self.postprocess_parse_result(parse_result)
@@ -366,7 +584,10 @@ class QualcommParser:
         while self.io_device.file_available:
             self.logger.log(logging.INFO, "Reading from {}".format(self.io_device.fname))
             if self.io_device.fname.find('.qmdl') > 0:
-                self.run_diag()
+                if self.jobs > 1 and self.io_device.mapped_buf is not None:
+                    parallel.run_parallel(self, self.io_device.fname, self.jobs)
+                else:
+                    self.run_diag()
             elif self.io_device.fname.find('.dlf') > 0:
                 self.parse_dlf()
             elif self.io_device.fname.find('.hdf') > 0:
@@ -385,7 +606,7 @@ class QualcommParser:
         if 'ts' in parse_result:
             ts = parse_result['ts']
         else:
-            ts = datetime.datetime.now()
+            ts = time.time_ns()
 
         if 'cp' in parse_result:
             for sock_content in parse_result['cp']:
@@ -399,8 +620,12 @@ class QualcommParser:
             if len(parse_result['stdout']) > 0:
                 for l in parse_result['stdout'].split('\n'):
                     print('Radio {}: {}'.format(radio_id, l))
+                # Writers able to store text, e.g. as pcapng comments
+                write_comment = getattr(self.writer, 'write_comment', None)
+                if write_comment is not None:
+                    write_comment(parse_result['stdout'], radio_id, ts)
 
-    log_header = namedtuple('QcDiagLogHeader', 'cmd_code reserved length1 length2 log_id timestamp')
+    log_header = util.Layout('QcDiagLogHeader', 'cmd_code reserved length1 length2 log_id timestamp', '<BBHHHQ')
 
     def parse_diag_log(self, pkt, args=None):
         """Parses the DIAG_LOG_F packet.
@@ -412,25 +637,32 @@ class QualcommParser:
         if len(pkt) < 16:
             return
 
-        pkt_header = self.log_header._make(struct.unpack('<BBHHHQ', pkt[0:16]))
+        pkt_header = self.log_header.unpack(pkt)
         pkt_body = pkt[16:]
 
+        return self.process_diag_log(pkt_header, pkt_body, args)
+
+    def process_diag_log(self, pkt_header, pkt_body, args=None):
+        """Dispatches a DIAG log packet to the handler of its log ID.
+
+        Parameters:
+        pkt_header (QcDiagLogHeader): parsed DIAG_LOG_F header
+        pkt_body (bytes): log packet body following the header
+        args (dict): 'radio_id' (int): used SIM or subscription ID on multi-SIM devices
+        """
         if len(pkt_body) != (pkt_header.length2 - 12):
             self.logger.log(logging.WARNING, "Packet length mismatch: expected {}, got {}".format(pkt_header.length2, len(pkt_body)+12))
 
-        if pkt_header.log_id in self.process.keys():
-            return self.process[pkt_header.log_id](pkt_header, pkt_body, args)
-        elif pkt_header.log_id in self.no_process.keys():
-            #print("Not handling XDM Header 0x%04x (%s)" % (xdm_hdr[1], self.no_process[xdm_hdr[1]]))
-            return None
-        else:
-            #print("Unhandled XDM Header 0x%04x" % xdm_hdr[1])
-            #util.xxd(pkt)
-            return None
+        handler = self.process.get(pkt_header.log_id)
+        if handler is not None:
+            return handler(pkt_header, pkt_body, args)
+        #print("Unhandled XDM Header 0x%04x" % xdm_hdr[1])
+        #util.xxd(pkt)
+        return None
 
-    ext_msg_header = namedtuple('QcDiagExtMsgHeader', 'cmd_code ts_type num_args drop_cnt timestamp line_no message_subsys_id reserved1')
+    ext_msg_header = util.Layout('QcDiagExtMsgHeader', 'cmd_code ts_type num_args drop_cnt timestamp line_no message_subsys_id reserved1', '<BBBBQHHL')
 
-    def parse_diag_ext_msg(self, pkt):
+    def parse_diag_ext_msg(self, pkt, args=None):
         """Parses the DIAG_EXT_MSG_F packet.
 
         Parameters:
@@ -439,7 +671,7 @@ class QualcommParser:
         # 79 | 00 | 00 | 00 | 00 00 1c fc 0f 16 e4 00 | e6 04 | 94 13 | 02 00 00 00
         # cmd_code, ts_type, num_args, drop_cnt, TS, Line number, Message subsystem ID, ?
         # Message: two null-terminated strings, one for log and another for filename
-        pkt_header = self.ext_msg_header._make(struct.unpack('<BBBBQHHL', pkt[0:20]))
+        pkt_header = self.ext_msg_header.unpack(pkt)
         pkt_ts = util.parse_qxdm_ts(pkt_header.timestamp)
         pkt_body = pkt[20 + 4 * pkt_header.num_args:]
         pkt_body = pkt_body.rstrip(b'\0').rsplit(b'\0', maxsplit=1)
@@ -462,11 +694,11 @@ class QualcommParser:
             version = 2,
             payload_type = util.gsmtap_type.OSMOCORE_LOG)
 
-        return {'cp': [gsmtap_hdr + osmocore_log_hdr + log_content], 'ts': pkt_ts}
+        return {'cp': [(gsmtap_hdr, osmocore_log_hdr, log_content)], 'ts': pkt_ts}
 
-    multisim_header = namedtuple('QcDiagMultiSimHeader', 'cmd_code reserved1 reserved2 radio_id')
+    multisim_header = util.Layout('QcDiagMultiSimHeader', 'cmd_code reserved1 reserved2 radio_id', '<BBHL')
 
-    def parse_diag_multisim(self, pkt):
+    def parse_diag_multisim(self, pkt, args=None):
         """Parses the DIAG_MULTI_RADIO_CMD_F packet. This function calls nexted DIAG log packet with correct radio ID attached.
 
         Parameters:
@@ -478,7 +710,7 @@ class QualcommParser:
         if len(pkt) < 8:
             return
 
-        pkt_header = self.multisim_header._make(struct.unpack('<BBHL', pkt[0:8]))
+        pkt_header = self.multisim_header.unpack(pkt)
         pkt_body = pkt[8:]
 
         ret = self.parse_diag(pkt_body, hdlc_encoded=False, check_crc=False, args={'radio_id': self.sanitize_radio_id(pkt_header.radio_id)})
@@ -486,19 +718,19 @@ class QualcommParser:
             ret['radio_id'] = self.sanitize_radio_id(pkt_header.radio_id)
         return ret
 
-    event_header = namedtuple('QcDiagEventHeader', 'cmd_code msg_len')
+    event_header = util.Layout('QcDiagEventHeader', 'cmd_code msg_len', '<BH')
 
-    def parse_diag_event(self, pkt):
+    def parse_diag_event(self, pkt, args=None):
         """Parses the DIAG_EVENT_REPORT_F packet.
 
         Parameters:
         pkt (bytes): DIAG_EVENT_REPORT_F data without trailing CRC
         """
-        pkt_header = self.event_header._make(struct.unpack('<BH', pkt[0:3]))
+        pkt_header = self.event_header.unpack(pkt)
 
         pos = 3
         event_pkts = []
-        ts = datetime.datetime.now()
+        ts = time.time_ns()
         while pos < len(pkt):
             # id 12b, _pad 1b, payload_len 2b, ts_trunc 1b
             _eid = struct.unpack('<H', pkt[pos:pos+2])[0]
@@ -512,27 +744,25 @@ class QualcommParser:
             else:
                 #ts = struct.unpack('<H', pkt[pos+2:pos+4])[0]
                 # TODO: correctly parse ts
-                ts = datetime.datetime.now()
+                ts = time.time_ns()
                 pos += 4
 
             assert (payload_len >= 0) and (payload_len <= 3)
             if payload_len == 0:
                 # No payload
-                if event_id in self.process_event.keys():
-                    event_pkts.append(self.process_event[event_id][0](ts, event_id))
-                elif event_id in self.no_process_event.keys():
-                    pass
-                else:
+                event = self.process_event.get(event_id)
+                if event is not None:
+                    event_pkts.append(event[0](ts, event_id))
+                elif event_id not in self.no_process_event:
                     event_pkts.append(self.diag_fallback_event_parser.parse_event_fallback(ts, event_id))
             elif payload_len == 1:
                 # 1x uint8
                 arg1 = pkt[pos]
 
-                if event_id in self.process_event.keys():
-                    event_pkts.append(self.process_event[event_id][0](ts, event_id, arg1))
-                elif event_id in self.no_process_event.keys():
-                    pass
-                else:
+                event = self.process_event.get(event_id)
+                if event is not None:
+                    event_pkts.append(event[0](ts, event_id, arg1))
+                elif event_id not in self.no_process_event:
                     event_pkts.append(self.diag_fallback_event_parser.parse_event_fallback(ts, event_id, arg1))
                 pos += 1
             elif payload_len == 2:
@@ -540,11 +770,10 @@ class QualcommParser:
                 arg1 = pkt[pos]
                 arg2 = pkt[pos+1]
 
-                if event_id in self.process_event.keys():
-                    event_pkts.append(self.process_event[event_id][0](ts, event_id, arg1, arg2))
-                elif event_id in self.no_process_event.keys():
-                    pass
-                else:
+                event = self.process_event.get(event_id)
+                if event is not None:
+                    event_pkts.append(event[0](ts, event_id, arg1, arg2))
+                elif event_id not in self.no_process_event:
                     event_pkts.append(self.diag_fallback_event_parser.parse_event_fallback(ts, event_id, arg1, arg2))
                 pos += 2
             elif payload_len == 3:
@@ -552,27 +781,30 @@ class QualcommParser:
                 bin_len = pkt[pos]
                 arg_bin = pkt[pos+1:pos+1+bin_len]
 
-                if event_id in self.process_event.keys():
-                    event_pkts.append(self.process_event[event_id][0](ts, event_id, arg_bin))
-                elif event_id in self.no_process_event.keys():
-                    pass
-                else:
+                event = self.process_event.get(event_id)
+                if event is not None:
+                    event_pkts.append(event[0](ts, event_id, arg_bin))
+                elif event_id not in self.no_process_event:
                     event_pkts.append(self.diag_fallback_event_parser.parse_event_fallback(ts, event_id, arg_bin))
                 pos += (1 + pkt[pos])
 
         return {'cp': event_pkts, 'ts': ts}
 
-    def parse_diag_qsr_ext_msg(self, pkt):
+    def parse_diag_qsr_ext_msg(self, pkt, args=None):
         return None
 
-    def parse_diag_qsr4_ext_msg(self, pkt):
+    def parse_diag_qsr4_ext_msg(self, pkt, args=None):
         return None
 
-    def parse_diag_version(self, pkt):
-        header = namedtuple('QcDiagVersion', 'compile_date compile_time release_date release_time chipset')
+    version_info = util.Layout('QcDiagVersion', 'compile_date compile_time release_date release_time chipset', '<11s 8s 11s 8s 8s')
+    log_config_header = util.Layout('QcDiagLogConfig', 'pkt_id cmd_id', '<LL')
+    ext_msg_range_header = util.Layout('QcDiagExtMsgRange', 'cmd_code ts_type unk1 num_ranges unk2', '<BBHHH')
+    ext_msg_level_header = util.Layout('QcDiagExtMsgLevel', 'cmd_code ts_type start_id end_id unk1', '<BBHHH')
+
+    def parse_diag_version(self, pkt, args=None):
         if len(pkt) < 47:
             return None
-        ver_info = header._make(struct.unpack('<11s 8s 11s 8s 8s', pkt[1:47]))
+        ver_info = self.version_info.unpack(pkt, 1)
 
         stdout = 'Compile: {}/{}, Release: {}/{}, Chipset: {}'.format(
             ver_info.compile_date.decode(errors="ignore"),
@@ -583,18 +815,18 @@ class QualcommParser:
 
         return {'stdout': stdout}
 
-    def parse_diag_ext_build_id(self, pkt):
+    def parse_diag_ext_build_id(self, pkt, args=None):
         if len(pkt) < 12:
             return None
 
-        stdout = 'Build ID: {}'.format(pkt[12:-2].decode())
-        return {'stdout': stdout}
+        build_id = pkt[12:-2].decode()
+        stdout = 'Build ID: {}'.format(build_id)
+        return {'stdout': stdout, 'build_id': build_id}
 
-    def parse_diag_log_config(self, pkt):
+    def parse_diag_log_config(self, pkt, args=None):
         if len(pkt) < 8:
             return None
-        header = namedtuple('QcDiagLogConfig', 'pkt_id cmd_id')
-        header_val = header._make(struct.unpack('<LL', pkt[0:8]))
+        header_val = self.log_config_header.unpack(pkt)
         payload = pkt[8:]
         stdout = 'Log Config: '
 
@@ -621,14 +853,13 @@ class QualcommParser:
 
         return {'stdout': stdout}
 
-    def parse_diag_ext_msg_config(self, pkt):
+    def parse_diag_ext_msg_config(self, pkt, args=None):
         if len(pkt) < 2:
             return None
 
         if pkt[1] == 0x01:
             # Ranges
-            ext_msg_range_header = namedtuple('QcDiagExtMsgRange', 'cmd_code ts_type unk1 num_ranges unk2')
-            pkt_header = ext_msg_range_header._make(struct.unpack('<BBHHH', pkt[0:8]))
+            pkt_header = self.ext_msg_range_header.unpack(pkt)
             stdout = 'Extended message range: '
             id_ranges = []
 
@@ -642,8 +873,7 @@ class QualcommParser:
             return {'stdout': stdout, 'id_range': id_ranges}
         elif pkt[1] == 0x02:
             # Levels
-            ext_msg_level_header = namedtuple('QcDiagExtMsgLevel', 'cmd_code ts_type start_id end_id unk1')
-            pkt_header = ext_msg_level_header._make(struct.unpack('<BBHHH', pkt[0:8]))
+            pkt_header = self.ext_msg_level_header.unpack(pkt)
             stdout = 'Extended message level: \n'
             levels = []
 
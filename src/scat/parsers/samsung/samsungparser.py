@@ -2,6 +2,7 @@
 # coding: utf8
 
 import scat.util as util
+from scat.logfilter import LogFilter
 import struct
 import logging
 from scat.parsers.samsung.sdmcmd import *
@@ -16,9 +17,61 @@ from scat.parsers.samsung.sdmipparser import SdmIpParser
 def content(pkt):
     return pkt[11:-1]
 
+sdm_logger_header = util.Layout('SdmLoggerHeader', 'magic streamid logger_version seqnr direction group command timestamp', '<HLHHBBBL')
+
+class SdmFramer:
+    """Splits a byte stream into whole SDM packets, from the 0x7f start
+    byte to the 0x7e end byte given by the header length. Data not forming
+    a packet is skipped, as run_diag does.
+    """
+
+    def __init__(self):
+        self.buf = b''
+        self.num_frames = 0
+        self.num_skipped = 0
+
+    def feed(self, data):
+        self.buf = self.buf + data if len(self.buf) > 0 else bytes(data)
+
+    def frames(self):
+        buf = self.buf
+        cur_pos = 0
+        while True:
+            pos = buf.find(b'\x7f', cur_pos)
+            if pos < 0:
+                self.num_skipped += len(buf) - cur_pos
+                cur_pos = len(buf)
+                break
+            self.num_skipped += pos - cur_pos
+            if len(buf) < pos + 15:
+                cur_pos = pos
+                break
+
+            sdm_pkt_hdr = sdmheader.unpack(buf, pos+1)
+            if len(buf) < (pos + 2 + sdm_pkt_hdr.length1):
+                cur_pos = pos
+                break
+
+            if buf[pos+1+sdm_pkt_hdr.length1] != 0x7e or sdm_pkt_hdr.length2 + 3 != sdm_pkt_hdr.length1:
+                self.num_skipped += 2
+                cur_pos = pos + 2
+                continue
+
+            cur_pos = pos + sdm_pkt_hdr.length1 + 2
+            self.num_frames += 1
+            yield buf[pos:cur_pos]
+        self.buf = buf[cur_pos:]
+
 class SamsungParser:
     pkg_header_len = 10
 
+    # Serving cell state carried from one packet to the next
+    state_fields = ('gsm_last_cell_id', 'gsm_last_arfcn',
+        'umts_last_cell_id', 'umts_last_psc', 'umts_last_uarfcn_dl', 'umts_last_uarfcn_ul',
+        'lte_last_cell_id', 'lte_last_pci', 'lte_last_earfcn_dl', 'lte_last_earfcn_ul',
+        'lte_last_earfcn_tdd', 'lte_last_sfn', 'lte_last_tx_ant',
+        'lte_last_bw_dl', 'lte_last_bw_ul', 'lte_last_band_ind')
+
     def __init__(self):
         self.gsm_last_cell_id = [0, 0]
         self.gsm_last_arfcn = [0, 0]
@@ -56,6 +109,11 @@ class SamsungParser:
         self.tcpip_mtu_tx = 1500
         self.icd_ver_maj = 0
         self.icd_ver_min = 0
+        self.log_profile = None
+        self.log_ids = []
+        self.include_ids = []
+        self.exclude_ids = []
+        self.log_filter = None
 
         self.logger = logging.getLogger('scat.samsungparser')
 
@@ -64,6 +122,7 @@ class SamsungParser:
             SdmHspaParser(self), SdmTraceParser(self), SdmIpParser(self)]
         self.process = { }
         self.no_process = { }
+        self.state_log_ids = set()
 
         for p in self.sdm_parsers:
             self.process.update(p.process)
@@ -71,6 +130,10 @@ class SamsungParser:
                 self.no_process.update(p.no_process)
             except AttributeError:
                 pass
+            try:
+                self.state_log_ids.update(p.state_log_ids)
+            except AttributeError:
+                pass
 
     def set_io_device(self, io_device):
         self.io_device = io_device
@@ -90,6 +153,54 @@ class SamsungParser:
                 self.logger.setLevel(params[p])
             elif p == 'start-magic':
                 self.start_magic = int(params[p], base=16)
+            elif p == 'log-profile':
+                self.log_profile = params[p]
+            elif p == 'log-ids':
+                self.log_ids = params[p]
+            elif p == 'include-ids':
+                self.include_ids = params[p]
+                self.set_log_filter()
+            elif p == 'exclude-ids':
+                self.exclude_ids = params[p]
+                self.set_log_filter()
+
+    def get_worker_parameters(self):
+        # Parameters for the parsers of the parallel decoding workers
+        return {'log_level': self.logger.level,
+            'model': self.model,
+            'start-magic': '{:#x}'.format(self.start_magic),
+            'include-ids': self.include_ids,
+            'exclude-ids': self.exclude_ids}
+
+    def get_state(self):
+        return {x: list(getattr(self, x)) for x in self.state_fields}
+
+    def empty_state(self):
+        return {x: [None] * len(getattr(self, x)) for x in self.state_fields}
+
+    def set_state(self, state):
+        for x in self.state_fields:
+            setattr(self, x, list(state[x]))
+
+    def set_log_filter(self):
+        if len(self.include_ids) > 0 or len(self.exclude_ids) > 0:
+            self.log_filter = LogFilter(self.include_ids, self.exclude_ids)
+        else:
+            self.log_filter = None
+
+    def get_framer(self):
+        # Splits device reads into whole packets for the pipeline reader
+        return SdmFramer()
+
+    def get_frame_id(self, buf, pos=0):
+        # (group << 8) | command signature in the SDM header of the packet
+        # starting at pos
+        return ((buf[pos + 9] & 0x1f) << 8) | buf[pos + 10]
+
+    def accept_packet(self, buf, pos):
+        # Checks the signature of the packet starting at pos, before it is
+        # parsed
+        return self.log_filter.accept(self.get_frame_id(buf, pos))
 
     def init_diag(self):
         self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.CONTROL_START, struct.pack('>L', self.start_magic)))
@@ -101,11 +212,16 @@ class SamsungParser:
         self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.HSPA_ITEM_SELECT_REQUEST, create_sdm_item_selection(0x00)))
         self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.CDMA_ITEM_SELECT_REQUEST, create_sdm_item_selection(0x00)))
 
-        self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.COMMON_ITEM_SELECT_REQUEST, scat_sdm_common_selection()))
-        self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.LTE_ITEM_SELECT_REQUEST, scat_sdm_lte_selection()))
-        self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.EDGE_ITEM_SELECT_REQUEST, scat_sdm_edge_selection()))
-        self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.HSPA_ITEM_SELECT_REQUEST, scat_sdm_hspa_selection()))
-        self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.CDMA_ITEM_SELECT_REQUEST, create_sdm_item_selection(0xff)))
+        if self.log_profile in (None, 'full') and len(self.log_ids) == 0:
+            self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.COMMON_ITEM_SELECT_REQUEST, scat_sdm_common_selection()))
+            self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.LTE_ITEM_SELECT_REQUEST, scat_sdm_lte_selection()))
+            self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.EDGE_ITEM_SELECT_REQUEST, scat_sdm_edge_selection()))
+            self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.HSPA_ITEM_SELECT_REQUEST, scat_sdm_hspa_selection()))
+            self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.CDMA_ITEM_SELECT_REQUEST, create_sdm_item_selection(0xff)))
+        else:
+            item_ids = sdm_item_profile(self.log_profile) if self.log_profile else []
+            for select_request, selection in create_sdm_item_selections(item_ids + self.log_ids):
+                self.io_device.write(generate_sdm_packet(0xa0, 0x00, select_request, selection))
 
         self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.COMMON_ITEM_REFRESH_REQUEST, b'\xff'))
         self.io_device.write(generate_sdm_packet(0xa0, 0x00, sdm_control_message.LTE_ITEM_REFRESH_REQUEST, b'\xff'))
@@ -136,13 +252,18 @@ class SamsungParser:
         cur_pos = 0
         try:
             while loop:
-                buf = self.io_device.read(0x1000)
-                if len(buf) == 0:
-                    if self.io_device.block_until_data:
-                        continue
-                    else:
-                        loop = False
-                buf = oldbuf + buf
+                if self.io_device.mapped_buf is not None:
+                    # Memory-mapped dump, parse it in place in a single pass
+                    buf = self.io_device.mapped_buf
+                    loop = False
+                else:
+                    buf = self.io_device.read(0x1000)
+                    if len(buf) == 0:
+                        if self.io_device.block_until_data:
+                            continue
+                        else:
+                            loop = False
+                    buf = oldbuf + buf
 
                 cur_pos = 0
                 while cur_pos < len(buf):
@@ -158,7 +279,7 @@ class SamsungParser:
                         oldbuf = buf[pos:]
                         break
 
-                    sdm_pkt_hdr = sdmheader._make(struct.unpack('<HBHHBBBL', buf[pos+1:pos+15]))
+                    sdm_pkt_hdr = sdmheader.unpack(buf, pos+1)
 
                     # Sanity check
                     if len(buf) < (pos + 2 + sdm_pkt_hdr.length1):
@@ -176,7 +297,10 @@ class SamsungParser:
                         cur_pos = pos + 2
                         continue
 
-                    parse_result = self.parse_diag(buf[pos:pos + sdm_pkt_hdr.length1 + 2])
+                    if self.log_filter is None or self.accept_packet(buf, pos):
+                        parse_result = self.parse_diag(buf[pos:pos + sdm_pkt_hdr.length1 + 2])
+                    else:
+                        parse_result = None
 
                     if writer_sdmraw:
                         writer_sdmraw.write_cp(buf[pos:pos + sdm_pkt_hdr.length1 + 2])
@@ -191,6 +315,9 @@ class SamsungParser:
 
         except KeyboardInterrupt:
             return
+        finally:
+            if self.log_filter is not None:
+                self.logger.log(logging.INFO, 'Filter: {}'.format(self.log_filter.stats_str()))
 
     def stop_diag(self):
         self.logger.log(logging.INFO, 'Stopping diag')
@@ -201,44 +328,66 @@ class SamsungParser:
         self.logger.log(logging.INFO, 'Starting diag from dump')
 
         oldbuf = b''
-        cur_pos = 0
+        eof = False
         try:
-            while True:
-                buf = self.io_device.read(0x90000)
-                #util.xxd(buf, True)
-                if len(buf) == 0:
-                    continue
+            while not eof:
+                if self.io_device.mapped_buf is not None:
+                    # Memory-mapped dump, parse it in place in a single pass
+                    buf = self.io_device.mapped_buf
+                    eof = True
+                else:
+                    buf = self.io_device.read(0x90000)
+                    if len(buf) == 0:
+                        if self.io_device.block_until_data:
+                            continue
+                        else:
+                            eof = True
+                    buf = oldbuf + buf
+                oldbuf = b''
+
                 cur_pos = 0
-                first = False
-                while cur_pos < len(buf):
-                    #print('---- subpacket ----')
-                    #print(buf)
-                    #assert buf[cur_pos] == 0x7f
-                    if buf[cur_pos] != 0x7f:
-                        # if first:
-                        #     self.logger.log(logging.WARNING, 'Unexpected end of the packet, dropping it')
-                        #     self.logger.log(logging.DEBUG, util.xxd(buf))
-                        #     break
+                while True:
+                    cur_pos = buf.find(b'\x7f', cur_pos)
+                    if cur_pos < 0:
+                        break
+
+                    if cur_pos + SamsungParser.pkg_header_len >= len(buf):
+                        len_1 = None
+                    else:
+                        len_1 = buf[cur_pos + 1] | (buf[cur_pos + 2] << 8)
+
+                    if len_1 is None or cur_pos + len_1 + 2 > len(buf):
+                        if eof:
+                            # No more data to complete it, not a packet
+                            cur_pos += 1
+                            continue
+                        # Packet is incomplete, carry it over to the next read
+                        oldbuf = buf[cur_pos:]
+                        break
+
+                    if buf[cur_pos + len_1 + 1] != 0x7e:
+                        # Not a packet boundary, look for the next start marker
                         cur_pos += 1
                         continue
-                    first = True
-                    if cur_pos+SamsungParser.pkg_header_len < len(buf):
-                        len_1 = buf[cur_pos + 1] | (buf[cur_pos + 2] << 8)
-                        len_2 = buf[cur_pos + 3] | (buf[cur_pos + 4] << 8)
-                        #util.xxd(buf[cur_pos:cur_pos+len_1 + 2])
-                        #util.xxd(buf[cur_pos: cur_pos + len_1 + 2], True)
-                        self.parse_diag(buf[cur_pos:cur_pos + len_1 + 2])
-                    # cur_pos += (len_1 + 2)
-                    cur_pos += 1
-                    #print('%s/%s' % (cur_pos, len(buf)))
-                #print('---- end ----')
+
+                    if self.log_filter is not None and len_1 >= 9 and not self.accept_packet(buf, cur_pos):
+                        cur_pos += (len_1 + 2)
+                        continue
+
+                    parse_result = self.parse_diag(buf[cur_pos:cur_pos + len_1 + 2])
+                    if parse_result is not None:
+                        self.postprocess_parse_result(parse_result)
+
+                    cur_pos += (len_1 + 2)
 
         except KeyboardInterrupt:
             return
+        finally:
+            if self.log_filter is not None:
+                self.logger.log(logging.INFO, 'Filter: {}'.format(self.log_filter.stats_str()))
 
     def run_logger(self):
         self.logger.log(logging.INFO, 'Starting diag from logger output')
-        logger_header_struct = namedtuple('SdmLoggerHeader', 'magic streamid logger_version seqnr direction group command timestamp')
 
         oldbuf = b''
         loop = True
@@ -272,7 +421,7 @@ class SamsungParser:
                     if len(pkt) < 17:
                         self.logger.log(logging.INFO, 'Skipping packet as shorter than expected')
                         continue
-                    logger_header = logger_header_struct._make(struct.unpack('<HLHHBBBL', pkt[0:17]))
+                    logger_header = sdm_logger_header.unpack(pkt)
                     if not (logger_header.magic == 0x7f39):
                         self.logger.log(logging.INFO, 'Skipping packet as magic does not match')
                         continue
@@ -322,6 +471,10 @@ class SamsungParser:
             if len(parse_result['stdout']) > 0:
                 for l in parse_result['stdout'].split('\n'):
                     print('Radio {}: {}'.format(radio_id, l))
+                # Writers able to store text, e.g. as pcapng comments
+                write_comment = getattr(self.writer, 'write_comment', None)
+                if write_comment is not None:
+                    write_comment(parse_result['stdout'], radio_id, ts)
 
     def parse_diag_log(self, pkt):
         if not (pkt[0] == 0x7f and pkt[-1] == 0x7e):
@@ -351,9 +504,10 @@ class SamsungParser:
         self.logger.log(logging.DEBUG, 'Payload: {}'.format(util.xxd(pkt[15:-1])))
 
         cmd_sig = (sdm_pkt_hdr.group << 8) | sdm_pkt_hdr.command
-        if cmd_sig in self.process.keys():
-            parse_result = self.process[cmd_sig](pkt)
-        elif cmd_sig in self.no_process.keys():
+        handler = self.process.get(cmd_sig)
+        if handler is not None:
+            parse_result = handler(pkt)
+        elif cmd_sig in self.no_process:
             print("Not handling group 0x{:02x} command 0x{:02x}".format(sdm_pkt_hdr.group, sdm_pkt_hdr.command))
             parse_result = None
         else:
@@ -361,6 +515,8 @@ class SamsungParser:
 
         if type(parse_result) == dict:
             parse_result['radio_id'] = sdm_pkt_hdr.radio_id
+            # Raw SDM timestamp, used to merge results of several dumps
+            parse_result['device_ts'] = sdm_pkt_hdr.timestamp
             return parse_result
         else:
             return None
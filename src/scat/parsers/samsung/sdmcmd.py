@@ -3,6 +3,8 @@ from enum import IntEnum, unique
 from collections import namedtuple
 import struct
 
+import scat.util as util
+
 @unique
 class sdm_command_type(IntEnum):
     IPC_DM_CMD = 0xa0
@@ -429,16 +431,106 @@ def scat_sdm_hspa_selection_ext():
         (0x61, True),
     )
 
-sdmheader = namedtuple('SdmHeader', 'length1 zero length2 stamp direction group command timestamp')
+def sdm_item_selection_items(group, selection):
+    # Inverse of create_sdm_item_selection: (group << 8) | item of the
+    # selected items
+    items = []
+    for pos in range(1, len(selection) - 1, 2):
+        if selection[pos + 1]:
+            items.append((group << 8) | selection[pos])
+    return items
+
+sdm_item_select_requests = {
+    sdm_command_group.CMD_COMMON_DATA: sdm_control_message.COMMON_ITEM_SELECT_REQUEST,
+    sdm_command_group.CMD_LTE_DATA: sdm_control_message.LTE_ITEM_SELECT_REQUEST,
+    sdm_command_group.CMD_EDGE_DATA: sdm_control_message.EDGE_ITEM_SELECT_REQUEST,
+    sdm_command_group.CMD_HSPA_DATA: sdm_control_message.HSPA_ITEM_SELECT_REQUEST,
+}
+
+def create_sdm_item_selections(item_ids):
+    # (select request, item selection) for each group of (group << 8) | item
+    items = {}
+    for item_id in item_ids:
+        if (item_id >> 8) not in sdm_item_select_requests:
+            raise ValueError('No item selection for SDM group {:#x}'.format(item_id >> 8))
+        items.setdefault(item_id >> 8, set()).add(item_id & 0xff)
+
+    selections = []
+    for group in sorted(items):
+        selections.append((sdm_item_select_requests[group],
+            create_sdm_item_selection(len(items[group]), *[(x, True) for x in sorted(items[group])])))
+    return selections
+
+sdm_items_cell_info = (
+    (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_BASIC_INFO,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_SERVING_CELL,
+    (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_SCELL_INFO,
+    (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_URRC_NETWORK_INFO,
+)
+
+sdm_items_rrc_nas = sdm_items_cell_info + (
+    (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_SIGNALING_INFO,
+    (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_MULTI_SIGNALING_INFO,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_OTA_PACKET,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_EMM_MESSAGE,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_ESM_MESSAGE,
+)
+
+sdm_items_signaling = sdm_items_rrc_nas + (
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_L2_RACH_INFO,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_L2_RNTI_INFO,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_STATUS,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_TIMER,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_ASN_VERSION,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_RACH_MSG,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_SIM_DATA,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_STATUS_VARIABLE,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_PLMN_SELECTION,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_SECURITY,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_PDP,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_IP,
+    (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_HANDOVER_INFO,
+    (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_URRC_RRC_STATUS,
+)
+
+sdm_items_meas = sdm_items_cell_info + (
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_PHY_STATUS,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_PHY_CELL_SEARCH_MEAS,
+    (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_PHY_NCELL_INFO,
+    (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_NCELL_INFO,
+    (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_3G_NCELL_INFO,
+    (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_MEAS_INFO,
+    (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_UL1_UMTS_RF_INFO,
+    (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_UL1_SERV_CELL,
+)
+
+sdm_item_profiles = ('signaling-only', 'rrc+nas', 'meas', 'full')
+
+def sdm_item_profile(name):
+    # Items selected by a profile, 'full' is the preferred SCAT selection
+    if name == 'signaling-only':
+        return list(sdm_items_signaling)
+    elif name == 'rrc+nas':
+        return list(sdm_items_rrc_nas)
+    elif name == 'meas':
+        return list(sdm_items_meas)
+    elif name == 'full':
+        return (sdm_item_selection_items(sdm_command_group.CMD_COMMON_DATA, scat_sdm_common_selection()) +
+            sdm_item_selection_items(sdm_command_group.CMD_LTE_DATA, scat_sdm_lte_selection()) +
+            sdm_item_selection_items(sdm_command_group.CMD_EDGE_DATA, scat_sdm_edge_selection()) +
+            sdm_item_selection_items(sdm_command_group.CMD_HSPA_DATA, scat_sdm_hspa_selection()))
+    raise ValueError('Unknown item selection profile {}'.format(name))
+
+sdmheader = util.Layout('SdmHeader', 'length1 zero length2 stamp direction group command timestamp', '<HBHHBBBL')
 sdmheader_ext = namedtuple('SdmHeaderExt', 'length1 zero length2 stamp direction radio_id group command timestamp')
 
 def generate_sdm_packet(direction, group, command, payload, timestamp=0):
     pkt_len = 2 + 3 + 4 + len(payload) + 2
-    pkt_header = struct.pack('<HBHHBBBL', pkt_len + 3, 0, pkt_len, 0, direction, group, command, timestamp)
+    pkt_header = sdmheader.struct.pack(pkt_len + 3, 0, pkt_len, 0, direction, group, command, timestamp)
     return b'\x7f' + pkt_header + payload + b'\x7e'
 
 def parse_sdm_header(hdr):
-    tmp_hdr = sdmheader._make(struct.unpack('<HBHHBBBL', hdr))
+    tmp_hdr = sdmheader.unpack(hdr)
     radio_id = (tmp_hdr.group) >> 5
     group_real = tmp_hdr.group & 0x1F
     if radio_id <= 0:
@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 
 from scat.parsers.samsung.sdmcmd import *
-from collections import namedtuple
 import scat.util as util
 import binascii
 
-import struct
 import logging
 
+common_basic_info = util.Layout('SdmCommonBasicInfo', 'rat status mimo dlfreq ulfreq', '<BBBLL')
+common_signaling_header = util.Layout('SdmCommonSignalingHeader', 'type subtype direction length', '<BBBH')
+common_multi_signaling_header = util.Layout('SdmCommonMultiSignalingHeader', 'total_chunks num_chunk msgid type subtype direction length', '<BBBBBBH')
+
 class SdmCommonParser:
     def __init__(self, parent, model=None):
         self.parent = parent
@@ -19,11 +21,11 @@ class SdmCommonParser:
         self.multi_message_chunk = {}
 
         self.process = {
-            (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_BASIC_INFO: lambda x: self.sdm_common_basic_info(x),
-            (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_DATA_INFO: lambda x: self.sdm_common_0x02(x),
-            (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_SIGNALING_INFO: lambda x: self.sdm_common_signaling(x),
-            (sdm_command_group.CMD_COMMON_DATA << 8) | 0x04: lambda x: self.sdm_common_0x04(x),
-            (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_MULTI_SIGNALING_INFO: lambda x: self.sdm_common_multi_signaling(x),
+            (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_BASIC_INFO: self.sdm_common_basic_info,
+            (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_DATA_INFO: self.sdm_common_0x02,
+            (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_SIGNALING_INFO: self.sdm_common_signaling,
+            (sdm_command_group.CMD_COMMON_DATA << 8) | 0x04: self.sdm_common_0x04,
+            (sdm_command_group.CMD_COMMON_DATA << 8) | sdm_common_data.COMMON_MULTI_SIGNALING_INFO: self.sdm_common_multi_signaling,
         }
 
     def set_model(self, model):
@@ -38,8 +40,7 @@ class SdmCommonParser:
         stdout = ''
 
         # rat: GSM 10, 13 / WCDMA 12, 14 / LTE 17, 19, 20 / 5G TODO
-        header = namedtuple('SdmCommonBasicInfo', 'rat status mimo dlfreq ulfreq')
-        common_basic = header._make(struct.unpack('<BBBLL', pkt[0:11]))
+        common_basic = common_basic_info.unpack(pkt)
 
         if len(pkt) > 11:
             extra = pkt[11:]
@@ -174,8 +175,7 @@ class SdmCommonParser:
         sdm_pkt_hdr = parse_sdm_header(pkt[1:15])
         pkt = pkt[15:-1]
 
-        header = namedtuple('SdmCommonSignalingHeader', 'type subtype direction length')
-        pkt_header = header._make(struct.unpack('<BBBH', pkt[0:5]))
+        pkt_header = common_signaling_header.unpack(pkt)
         msg_content = pkt[5:]
 
         return self._parse_sdm_common_signaling(sdm_pkt_hdr, pkt_header.type, pkt_header.subtype, pkt_header.direction, pkt_header.length, msg_content)
@@ -189,8 +189,7 @@ class SdmCommonParser:
         pkt = pkt[15:-1]
 
         # num_chunk is base 1, should be <= total_chunks
-        header = namedtuple('SdmCommonMultiSignalingHeader', 'total_chunks num_chunk msgid type subtype direction length')
-        pkt_header = header._make(struct.unpack('<BBBBBBH', pkt[0:8]))
+        pkt_header = common_multi_signaling_header.unpack(pkt)
         msg_content = pkt[8:]
 
         if pkt_header.msgid not in self.multi_message_chunk:
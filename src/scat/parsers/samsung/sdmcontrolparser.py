@@ -6,6 +6,15 @@ import scat.util as util
 import struct
 import logging
 import binascii
+import functools
+
+control_change_update_period_response = util.Layout('SdmControlChangeUpdatePeriodResponse', 'val1 val2', '<BB')
+dm_trace_table_get_response = util.Layout('SdmDmTraceTableGetResponse', 'is_end two trace_group_id', '<BBH')
+ilm_table_get_response = util.Layout('SdmIlmTableGetResponse', 'is_end unk total_item_count packet_item_count', '<BBBB')
+ilm_table_ilm_item = util.Layout('SdmIlmTableIlmItem', 'id unk1 unk2 unk3 text_len', '<BLBBB')
+control_tcpip_dump_response = util.Layout('SdmControlTcpipDumpResponse', 'dl_size ul_size', '<HH')
+trigger_table_response = util.Layout('SdmTriggerTableResponse', 'num_items1 num_items2', '<LL')
+trigger_table_item = util.Layout('SdmTriggerTableItem', 'id text_len', '<LL')
 
 class SdmControlParser:
     def __init__(self, parent, model=None):
@@ -22,17 +31,17 @@ class SdmControlParser:
         self.trigger_group = {}
 
         self.process = {
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.CONTROL_START_RESPONSE: lambda x: self.sdm_control_start_response(x),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.CHANGE_UPDATE_PERIOD_RESPONSE: lambda x: self.sdm_control_change_update_period_response(x),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.COMMON_ITEM_SELECT_RESPONSE: lambda x: self.sdm_control_item_select_response(x, 0x10),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.LTE_ITEM_SELECT_RESPONSE: lambda x: self.sdm_control_item_select_response(x, 0x20),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.EDGE_ITEM_SELECT_RESPONSE: lambda x: self.sdm_control_item_select_response(x, 0x30),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.HSPA_ITEM_SELECT_RESPONSE: lambda x: self.sdm_control_item_select_response(x, 0x40),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.CDMA_ITEM_SELECT_RESPONSE: lambda x: self.sdm_control_item_select_response(x, 0x44),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.TRACE_TABLE_GET_RESPONSE: lambda x: self.sdm_dm_trace_table_get_response(x),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.ILM_ENTITY_TAGLE_GET_RESPONSE: lambda x: self.sdm_dm_ilm_table_get_response(x),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.TCPIP_DUMP_RESPONSE: lambda x: self.sdm_control_tcpip_dump_response(x),
-            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.TRIGGER_TABLE_RESPONSE: lambda x: self.sdm_dm_trigger_table_response(x),
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.CONTROL_START_RESPONSE: self.sdm_control_start_response,
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.CHANGE_UPDATE_PERIOD_RESPONSE: self.sdm_control_change_update_period_response,
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.COMMON_ITEM_SELECT_RESPONSE: functools.partial(self.sdm_control_item_select_response, group=0x10),
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.LTE_ITEM_SELECT_RESPONSE: functools.partial(self.sdm_control_item_select_response, group=0x20),
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.EDGE_ITEM_SELECT_RESPONSE: functools.partial(self.sdm_control_item_select_response, group=0x30),
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.HSPA_ITEM_SELECT_RESPONSE: functools.partial(self.sdm_control_item_select_response, group=0x40),
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.CDMA_ITEM_SELECT_RESPONSE: functools.partial(self.sdm_control_item_select_response, group=0x44),
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.TRACE_TABLE_GET_RESPONSE: self.sdm_dm_trace_table_get_response,
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.ILM_ENTITY_TAGLE_GET_RESPONSE: self.sdm_dm_ilm_table_get_response,
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.TCPIP_DUMP_RESPONSE: self.sdm_control_tcpip_dump_response,
+            (sdm_command_group.CMD_CONTROL_MESSAGE << 8) | sdm_control_message.TRIGGER_TABLE_RESPONSE: self.sdm_dm_trigger_table_response,
         }
 
     def set_model(self, model):
@@ -83,8 +92,7 @@ class SdmControlParser:
         pkt = pkt[15:-1]
         if len(pkt) < 2:
             return None
-        item_struct = namedtuple('SdmControlChangeUpdatePeriodResponse', 'val1 val2')
-        item = item_struct._make(struct.unpack('<BB', pkt[0:2]))
+        item = control_change_update_period_response.unpack(pkt)
 
         stdout = 'Change Update Period Response: {} {}'.format(item.val1, item.val2)
         return {'stdout': stdout}
@@ -121,8 +129,7 @@ class SdmControlParser:
     def sdm_dm_trace_table_get_response(self, pkt):
         pkt = pkt[15:-1]
 
-        item_struct = namedtuple('SdmDmTraceTableGetResponse', 'is_end two trace_group_id')
-        item = item_struct._make(struct.unpack('<BBH', pkt[0:4]))
+        item = dm_trace_table_get_response.unpack(pkt)
         content = pkt[4:]
         trace_items_list = []
         stdout = ''
@@ -145,9 +152,7 @@ class SdmControlParser:
     def sdm_dm_ilm_table_get_response(self, pkt):
         pkt = pkt[15:-1]
 
-        item_struct = namedtuple('SdmIlmTableGetResponse', 'is_end unk total_item_count packet_item_count')
-        subitem_struct = namedtuple('SdmIlmTableIlmItem', 'id unk1 unk2 unk3 text_len')
-        item = item_struct._make(struct.unpack('<BBBB', pkt[0:4]))
+        item = ilm_table_get_response.unpack(pkt)
         content = pkt[4:]
         stdout = ''
         if self.ilm_total_count != 0:
@@ -159,7 +164,7 @@ class SdmControlParser:
 
         for i in range(item.packet_item_count):
             subitem = content[33*i:33*(i+1)]
-            item_hdr = subitem_struct._make(struct.unpack('<BLBBB', subitem[0:8]))
+            item_hdr = ilm_table_ilm_item.unpack(subitem)
             if item_hdr.text_len > 25:
                 item_str = subitem[8:].decode('utf-8')
             else:
@@ -181,8 +186,7 @@ class SdmControlParser:
 
     def sdm_control_tcpip_dump_response(self, pkt):
         pkt = pkt[15:-1]
-        item_struct = namedtuple('SdmControlTcpipDumpResponse', 'dl_size ul_size')
-        item = item_struct._make(struct.unpack('<HH', pkt[0:4]))
+        item = control_tcpip_dump_response.unpack(pkt)
 
         stdout = 'TCP/IP Dump Response: DL max {} bytes, UL max {} bytes'.format(item.dl_size, item.ul_size)
         return {'stdout': stdout}
@@ -190,16 +194,14 @@ class SdmControlParser:
     def sdm_dm_trigger_table_response(self, pkt):
         pkt = pkt[15:-1]
 
-        item_struct = namedtuple('SdmTriggerTableResponse', 'num_items1 num_items2')
-        subitem_struct = namedtuple('SdmTriggerTableItem', 'id text_len')
-        item = item_struct._make(struct.unpack('<LL', pkt[0:8]))
+        item = trigger_table_response.unpack(pkt)
         content = pkt[8:]
 
         pos = 0
         stdout = ''
 
         for i in range(item.num_items1):
-            subitem = subitem_struct._make(struct.unpack('<LL', content[pos:pos+8]))
+            subitem = trigger_table_item.unpack(content, pos)
             subitem_text = content[pos+8:pos+8+subitem.text_len].decode('utf-8')
             self.trigger_group[subitem.id] = subitem_text
             pos += (8 + subitem.text_len)
@@ -6,7 +6,12 @@ import scat.util as util
 import struct
 import logging
 import binascii
-from collections import namedtuple
+import functools
+
+edge_3g_ncell_meas = util.Layout('SdmEdge3GNCellNCell', 'uarfcn psc rssi rscp ecno', '<HHBBB')
+edge_scell_info = util.Layout('SdmEdgeSCellInfo', 'arfcn bsic rxlev nco crh nmo lai rac cid', '<HBBBBB 5s BH')
+edge_scell_meas_info = util.Layout('SdmEdgeSCellMeasInfo', 'arfcn bsic rxlev rxlev_p rxq_p rxlev_s rxq_s txlev', '<HHHHHHHH')
+edge_ncell_meas_info = util.Layout('SdmEdgeNCellMeasInfo', 'arfcn bsic rxlev unk', '<HHHL')
 
 class SdmEdgeParser:
     def __init__(self, parent, model=None):
@@ -17,12 +22,12 @@ class SdmEdgeParser:
             self.model = self.parent.model
 
         self.process = {
-            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_SCELL_INFO: lambda x: self.sdm_edge_scell_info(x),
-            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_NCELL_INFO: lambda x: self.sdm_edge_dummy(x, 0x06),
-            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_3G_NCELL_INFO: lambda x: self.sdm_edge_3g_ncell_info(x),
-            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_HANDOVER_INFO: lambda x: self.sdm_edge_dummy(x, 0x08),
-            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_HANDOVER_HISTORY_INFO: lambda x: self.sdm_edge_dummy(x, 0x09),
-            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_MEAS_INFO: lambda x: self.sdm_edge_meas_info(x),
+            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_SCELL_INFO: self.sdm_edge_scell_info,
+            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_NCELL_INFO: functools.partial(self.sdm_edge_dummy, num=0x06),
+            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_3G_NCELL_INFO: self.sdm_edge_3g_ncell_info,
+            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_HANDOVER_INFO: functools.partial(self.sdm_edge_dummy, num=0x08),
+            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_HANDOVER_HISTORY_INFO: functools.partial(self.sdm_edge_dummy, num=0x09),
+            (sdm_command_group.CMD_EDGE_DATA << 8) | sdm_edge_data.EDGE_MEAS_INFO: self.sdm_edge_meas_info,
         }
 
     def set_model(self, model):
@@ -35,11 +40,8 @@ class SdmEdgeParser:
     def sdm_edge_scell_info(self, pkt):
         sdm_pkt_hdr = parse_sdm_header(pkt[1:15])
         pkt = pkt[15:-1]
-        header = namedtuple('SdmEdgeSCellInfo', '''arfcn bsic rxlev nco crh nmo
-        lai rac cid''')
-        struct_str = '<HBBBBB 5s BH'
 
-        scell_info = header._make(struct.unpack(struct_str, pkt[0:struct.calcsize(struct_str)]))
+        scell_info = edge_scell_info.unpack(pkt)
         plmn_str = util.unpack_mcc_mnc(scell_info.lai[0:3])
         lac = struct.unpack('>H', scell_info.lai[3:5])[0]
         cid = struct.unpack('>H', struct.pack('<H',scell_info.cid))[0]
@@ -69,9 +71,8 @@ class SdmEdgeParser:
         stdout += 'EDGE 3G Neighbor Cell Info: {} Cells\n'.format(num_3g_cells)
 
         pos = 1
-        n_meas = namedtuple('SdmEdge3GNCellNCell', 'uarfcn psc rssi rscp ecno')
         for i in range(num_3g_cells):
-            n_meas_pkt = n_meas._make(struct.unpack('<HHBBB', pkt[pos:pos+7]))
+            n_meas_pkt = edge_3g_ncell_meas.unpack(pkt, pos)
             stdout += "NCell {}: UARFCN {}, PSC {}, RSSI {}, RSCP {}, Ec/No {}\n".format(
                 i, n_meas_pkt.uarfcn, n_meas_pkt.psc,
                 n_meas_pkt.rssi, n_meas_pkt.rscp * -1, n_meas_pkt.ecno / -10
@@ -89,10 +90,8 @@ class SdmEdgeParser:
     def sdm_edge_meas_info(self, pkt):
         sdm_pkt_hdr = parse_sdm_header(pkt[1:15])
         pkt = pkt[15:-1]
-        header_s = namedtuple('SdmEdgeSCellMeasInfo', 'arfcn bsic rxlev rxlev_p rxq_p rxlev_s rxq_s txlev')
-        header_n = namedtuple('SdmEdgeNCellMeasInfo', 'arfcn bsic rxlev unk')
 
-        scell_meas_info = header_s._make(struct.unpack('<HHHHHHHH', pkt[0:16]))
+        scell_meas_info = edge_scell_meas_info.unpack(pkt)
         extra = pkt[16:]
 
         if scell_meas_info.arfcn < 1024:
@@ -103,7 +102,7 @@ class SdmEdgeParser:
             stdout = ''
 
         for i in range(int(len(extra)/10)):
-            ncell_meas_info = header_n._make(struct.unpack('<HHHL', extra[i*10:(i+1)*10]))
+            ncell_meas_info = edge_ncell_meas_info.unpack(extra, i*10)
             if ncell_meas_info.arfcn < 1024:
                 stdout += 'EDGE Measurement Info (Neighbor Cell): ARFCN {}, BSIC {:#04x}, RxLev {} (RSSI {})\n'.format(
                     ncell_meas_info.arfcn, ncell_meas_info.bsic & 0b111111,
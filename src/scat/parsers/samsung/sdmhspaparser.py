@@ -4,9 +4,13 @@ from scat.parsers.samsung.sdmcmd import *
 import scat.util as util
 import binascii
 
-import struct
 import logging
-from collections import namedtuple
+
+hspa_ul1_rf_info_old = util.Layout('SdmHspaUL1RfInfoOld', 'uarfcn zero rssi txpwr', '<HHhh')
+hspa_ul1_rf_info = util.Layout('SdmHspaUL1RfInfo', 'uarfcn psc rssi ecno rscp txpwr', '<HHBBBB')
+hspa_ul1_serving_cell = util.Layout('SdmHspaUL1ServingCell', 'psc cpich_rscp cpich_delta_rscp cpich_ecno drx_cycle', '<HhhhH')
+hspa_wcdma_rrc_state = util.Layout('SdmHspaWcdmaRrcState', 'val1 val2 val3 val4 val5', '<BBBBB')
+hspa_wcdma_serving_cell = util.Layout('SdmHspaWcdmaServingCell', 'ul_uarfcn dl_uarfcn mcc mnc', '<HHHH')
 
 class SdmHspaParser:
     def __init__(self, parent, model=None):
@@ -17,22 +21,24 @@ class SdmHspaParser:
             self.model = self.parent.model
 
         self.process = {
-            (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_UL1_UMTS_RF_INFO: lambda x: self.sdm_hspa_ul1_rf_info(x),
-            (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_UL1_SERV_CELL: lambda x: self.sdm_hspa_ul1_serving_cell(x),
+            (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_UL1_UMTS_RF_INFO: self.sdm_hspa_ul1_rf_info,
+            (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_UL1_SERV_CELL: self.sdm_hspa_ul1_serving_cell,
 
-            (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_URRC_RRC_STATUS: lambda x: self.sdm_hspa_wcdma_rrc_status(x),
-            (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_URRC_NETWORK_INFO: lambda x: self.sdm_hspa_wcdma_serving_cell(x),
+            (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_URRC_RRC_STATUS: self.sdm_hspa_wcdma_rrc_status,
+            (sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_URRC_NETWORK_INFO: self.sdm_hspa_wcdma_serving_cell,
         }
 
+        # Packets updating the serving cell state kept in the parent
+        self.state_log_ids = {(sdm_command_group.CMD_HSPA_DATA << 8) | sdm_hspa_data.HSPA_URRC_NETWORK_INFO}
+
     def set_model(self, model):
         self.model = model
 
     def sdm_hspa_ul1_rf_info_old(self, pkt):
         sdm_pkt_hdr = parse_sdm_header(pkt[1:15])
         pkt = pkt[15:-1]
-        header = namedtuple('SdmHspaUL1RfInfoOld', 'uarfcn zero rssi txpwr')
 
-        ul1_rf_info = header._make(struct.unpack('<HHhh', pkt[0:12]))
+        ul1_rf_info = hspa_ul1_rf_info_old.unpack(pkt)
         extra = pkt[12:]
 
         stdout = 'HSPA UL1 RF Info: DL UARFCN {}, RSSI {:.2f}, TxPwr {:.2f}'.format(
@@ -48,9 +54,8 @@ class SdmHspaParser:
     def sdm_hspa_ul1_rf_info_e355(self, pkt):
         sdm_pkt_hdr = parse_sdm_header(pkt[1:15])
         pkt = pkt[15:-1]
-        header = namedtuple('SdmHspaUL1RfInfo', 'uarfcn psc rssi ecno rscp txpwr')
 
-        ul1_rf_info = header._make(struct.unpack('<HHBBBB', pkt[0:12]))
+        ul1_rf_info = hspa_ul1_rf_info.unpack(pkt)
         extra = pkt[12:]
 
         stdout = 'HSPA UL1 RF Info: DL UARFCN {}, PSC {}, RSSI {:.2f}, Ec/No {:.2f}, RSCP {:.2f}, TxPwr {:.2f}'.format(
@@ -74,9 +79,8 @@ class SdmHspaParser:
     def sdm_hspa_ul1_serving_cell(self, pkt):
         sdm_pkt_hdr = parse_sdm_header(pkt[1:15])
         pkt = pkt[15:-1]
-        header = namedtuple('SdmHspaUL1ServingCell', 'psc cpich_rscp cpich_delta_rscp cpich_ecno drx_cycle')
 
-        ul1_meas = header._make(struct.unpack('<HhhhH', pkt[0:10]))
+        ul1_meas = hspa_ul1_serving_cell.unpack(pkt)
         extra = pkt[10:]
 
         stdout = 'HSPA UL1 Serving Cell: PSC {}, CPICH RSCP {:.2f}, Delta RSCP {:.2f}, Ec/No {:.2f}, DRX {} ms'.format(
@@ -101,8 +105,7 @@ class SdmHspaParser:
                 self.parent.logger.log(logging.WARNING, 'Packet length ({}) shorter than expected (5)'.format(len(pkt)))
             return None
 
-        header = namedtuple('SdmHspaWcdmaRrcState', 'val1 val2 val3 val4 val5')
-        rrc_state = header._make(struct.unpack('<BBBBB', pkt[0:5]))
+        rrc_state = hspa_wcdma_rrc_state.unpack(pkt)
         # print(rrc_state)
 
     def sdm_hspa_wcdma_serving_cell(self, pkt):
@@ -114,8 +117,7 @@ class SdmHspaParser:
                 self.parent.logger.log(logging.WARNING, 'Packet length ({}) shorter than expected (8)'.format(len(pkt)))
             return None
 
-        header = namedtuple('SdmHspaWcdmaServingCell', 'ul_uarfcn dl_uarfcn mcc mnc')
-        scell_info = header._make(struct.unpack('<HHHH', pkt[0:8]))
+        scell_info = hspa_wcdma_serving_cell.unpack(pkt)
         if scell_info.dl_uarfcn == 0:
             return None
         stdout = 'WCDMA Serving Cell: UARFCN {}/{}, MCC {:x}, MNC {:x}'.format(scell_info.dl_uarfcn,
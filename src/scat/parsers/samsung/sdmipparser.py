@@ -3,10 +3,11 @@
 from scat.parsers.samsung.sdmcmd import *
 import scat.util as util
 
-import struct
 import logging
 import binascii
-from collections import namedtuple
+
+ip_data = util.Layout('SdmIpData', 'seq_num direction unknown length', '<HHHH')
+ip_0x0710_data = util.Layout('Sdm0x0710Data', 'seq_num direction', '<HH')
 
 class SdmIpParser:
     def __init__(self, parent, model=None):
@@ -17,8 +18,8 @@ class SdmIpParser:
             self.model = self.parent.model
 
         self.process = {
-            (sdm_command_group.CMD_IP_DATA << 8) | 0x00: lambda x: self.sdm_ip_data(x),
-            (sdm_command_group.CMD_IP_DATA << 8) | 0x10: lambda x: self.sdm_0x0710(x),
+            (sdm_command_group.CMD_IP_DATA << 8) | 0x00: self.sdm_ip_data,
+            (sdm_command_group.CMD_IP_DATA << 8) | 0x10: self.sdm_0x0710,
         }
 
     def set_model(self, model):
@@ -28,8 +29,7 @@ class SdmIpParser:
         # Unknown: 0x0800, 0x150D
         pkt = pkt[15:-1]
 
-        header_struct = namedtuple('SdmIpData', 'seq_num direction unknown length')
-        header = header_struct._make(struct.unpack('<HHHH', pkt[0:8]))
+        header = ip_data.unpack(pkt)
         payload = pkt[8:]
 
         if header.length != len(payload):
@@ -40,7 +40,6 @@ class SdmIpParser:
 
     def sdm_0x0710(self, pkt):
         pkt = pkt[15:-1]
-        header_struct = namedtuple('Sdm0x0710Data', 'seq_num direction')
-        header = header_struct._make(struct.unpack('<HH', pkt[0:4]))
+        header = ip_0x0710_data.unpack(pkt)
         payload = pkt[4:]
         return {'stdout': 'SDM 0x0710: {}, {}'.format(header, binascii.hexlify(payload).decode('utf-8'))}
@@ -6,7 +6,20 @@ import scat.util as util
 import struct
 import logging
 import binascii
-from collections import namedtuple
+
+lte_phy_status = util.Layout('SdmLtePhyStatus', 'sfn', '<H')
+lte_phy_cell_info = util.Layout('SdmLtePhyCellInfo', 'plmn zero1 arfcn pci zero2 reserved1 reserved2 rsrp rsrq num_ncell', '<IIHHHHHLLB')
+lte_phy_cell_info_e5123 = util.Layout('SdmLtePhyCellInfoE5123', 'plmn zero1 arfcn pci zero2 reserved1 reserved2 rsrp rsrq num_ncell', '<IIIHHHHLLB')
+lte_phy_cell_info_ncell_meas = util.Layout('SdmLtePhyCellInfoNCellMeas', 'type earfcn pci zero1 reserved1 rsrp rsrq reserved2', '<BHHHHLLH')
+lte_phy_cell_info_ncell_meas_e5123 = util.Layout('SdmLtePhyCellInfoNCellMeasE5123', 'type earfcn pci zero1 reserved1 rsrp rsrq reserved2', '<BLHHHLLH')
+lte_l2_rnti_info = util.Layout('SdmLteL2RntiInfo', 'si_rnti p_rnti tc_rnti c_rnti val5 val6', '<HHHHHH')
+lte_rrc_serving_cell_e5123 = util.Layout('SdmLteRrcServingCellE5123', 'cid zero1 zero2 plmn tac band_indicator', '<IIIIHH')
+lte_rrc_serving_cell = util.Layout('SdmLteRrcServingCell', 'cid zero1 zero2 plmn tac', '<IIIIH')
+lte_rrc_state = util.Layout('SdmLteRrcState', 'state', '<B')
+lte_rrc_ota_packet = util.Layout('SdmLteRrcOtaPacket', 'channel direction length', '<BBH')
+lte_rrc_multiple_message = util.Layout('SdmLteRrcMultipleMessage', 'total_chunks num_chunk msgid channel direction length', '<BBBBBH')
+lte_rrc_rach_message = util.Layout('SdmLteRrcRachMessage', 'direction val1 val2 val3 val4 tc_rnti_prob', '<BBBLLL')
+lte_nas_msg = util.Layout('SdmLteNasMsg', 'direction length spare', '<BHB')
 
 class SdmLteParser:
     def __init__(self, parent, model=None):
@@ -19,29 +32,32 @@ class SdmLteParser:
         self.multi_message_chunk = {}
 
         self.process = {
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_PHY_STATUS: lambda x: self.sdm_lte_phy_status(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_PHY_NCELL_INFO: lambda x: self.sdm_lte_phy_cell_info(x),
-
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_L2_RACH_INFO: lambda x: self.sdm_lte_l2_rach_info(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_L2_RNTI_INFO: lambda x: self.sdm_lte_l2_rnti_info(x),
-
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_SERVING_CELL: lambda x: self.sdm_lte_rrc_serving_cell(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_STATUS: lambda x: self.sdm_lte_rrc_state(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_OTA_PACKET: lambda x: self.sdm_lte_rrc_ota_packet(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_TIMER: lambda x: self.sdm_lte_rrc_timer(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_ASN_VERSION: lambda x: self.sdm_lte_rrc_asn_version(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | 0x55: lambda x: self.sdm_lte_0x55(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | 0x57: lambda x: self.sdm_lte_0x57(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_SIM_DATA: lambda x: self.sdm_lte_nas_sim_data(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_STATUS_VARIABLE: lambda x: self.sdm_lte_nas_status_variable(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_EMM_MESSAGE: lambda x: self.sdm_lte_nas_msg(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_PLMN_SELECTION: lambda x: self.sdm_lte_nas_plmn_selection(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_SECURITY: lambda x: self.sdm_lte_nas_security(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_PDP: lambda x: self.sdm_lte_nas_pdp(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_IP: lambda x: self.sdm_lte_nas_ip(x),
-            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_ESM_MESSAGE: lambda x: self.sdm_lte_nas_msg(x),
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_PHY_STATUS: self.sdm_lte_phy_status,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_PHY_NCELL_INFO: self.sdm_lte_phy_cell_info,
+
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_L2_RACH_INFO: self.sdm_lte_l2_rach_info,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_L2_RNTI_INFO: self.sdm_lte_l2_rnti_info,
+
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_SERVING_CELL: self.sdm_lte_rrc_serving_cell,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_STATUS: self.sdm_lte_rrc_state,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_OTA_PACKET: self.sdm_lte_rrc_ota_packet,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_TIMER: self.sdm_lte_rrc_timer,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_RRC_ASN_VERSION: self.sdm_lte_rrc_asn_version,
+            (sdm_command_group.CMD_LTE_DATA << 8) | 0x55: self.sdm_lte_0x55,
+            (sdm_command_group.CMD_LTE_DATA << 8) | 0x57: self.sdm_lte_0x57,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_SIM_DATA: self.sdm_lte_nas_sim_data,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_STATUS_VARIABLE: self.sdm_lte_nas_status_variable,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_EMM_MESSAGE: self.sdm_lte_nas_msg,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_PLMN_SELECTION: self.sdm_lte_nas_plmn_selection,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_SECURITY: self.sdm_lte_nas_security,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_PDP: self.sdm_lte_nas_pdp,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_IP: self.sdm_lte_nas_ip,
+            (sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_NAS_ESM_MESSAGE: self.sdm_lte_nas_msg,
         }
 
+        # Packets updating the serving cell state kept in the parent
+        self.state_log_ids = {(sdm_command_group.CMD_LTE_DATA << 8) | sdm_lte_data.LTE_PHY_NCELL_INFO}
+
     def set_model(self, model):
         self.model = model
 
@@ -53,27 +69,26 @@ class SdmLteParser:
             self.parent.logger.log(logging.WARNING, 'Packet length ({}) shorter than expected (2)'.format(len(pkt), 2))
             return None
 
-        header = namedtuple('SdmLtePhyStatus', 'sfn')
-        phy_status = header._make(struct.unpack('<H', pkt[0:2]))
+        phy_status = lte_phy_status.unpack(pkt)
         stdout = 'LTE PHY Status: Current SFN {}'.format(phy_status.sfn)
         return {'stdout': stdout}
 
     def sdm_lte_phy_cell_info(self, pkt):
         sdm_pkt_hdr = parse_sdm_header(pkt[1:15])
         pkt = pkt[15:-1]
-        header = namedtuple('SdmLtePhyCellInfo', 'plmn zero1 arfcn pci zero2 reserved1 reserved2 rsrp rsrq num_ncell')
-        ncell_header = namedtuple('SdmLtePhyCellInfoNCellMeas', 'type earfcn pci zero1 reserved1 rsrp rsrq reserved2')
 
         if self.model == 'e5123' or self.model == 'e5300':
-            struct_format = '<IIIHHHHLLB'
+            header = lte_phy_cell_info_e5123
+            ncell_header = lte_phy_cell_info_ncell_meas_e5123
         else:
-            struct_format = '<IIHHHHHLLB'
-        expected_len = struct.calcsize(struct_format)
+            header = lte_phy_cell_info
+            ncell_header = lte_phy_cell_info_ncell_meas
+        expected_len = header.size
         if len(pkt) < expected_len:
             self.parent.logger.log(logging.WARNING, 'Packet length ({}) shorter than expected ({})'.format(len(pkt), expected_len))
             return None
 
-        cell_info = header._make(struct.unpack(struct_format, pkt[0:expected_len]))
+        cell_info = header.unpack(pkt)
         extra = pkt[expected_len:]
 
         if self.parent:
@@ -82,14 +97,10 @@ class SdmLteParser:
         stdout = 'LTE PHY Cell Info: EARFCN {}, PCI {}, PLMN {}, RSRP: {:.2f}, RSRQ: {:.2f}\n'.format(cell_info.arfcn, cell_info.pci, cell_info.plmn, cell_info.rsrp / -100.0, cell_info.rsrq / -100.0)
 
         if cell_info.num_ncell > 0:
-            if self.model == 'e5123' or self.model == 'e5300':
-                ncell_header_format = '<BLHHHLLH'
-            else:
-                ncell_header_format = '<BHHHHLLH'
-            ncell_len = struct.calcsize(ncell_header_format)
+            ncell_len = ncell_header.size
             if len(extra) == ncell_len * cell_info.num_ncell:
                 for i in range(cell_info.num_ncell):
-                    ncell = ncell_header._make(struct.unpack(ncell_header_format, extra[i*ncell_len:(i+1)*ncell_len]))
+                    ncell = ncell_header.unpack(extra, i*ncell_len)
                     if ncell.type == 0:
                         stdout += 'LTE PHY Cell Info: NCell {}: EARFCN {}, PCI {}, RSRP: {:.2f}, RSRQ: {:.2f}\n'.format(i, ncell.earfcn,
                             ncell.pci, ncell.rsrp / -100.0, ncell.rsrq / -100.0)
@@ -119,15 +130,13 @@ class SdmLteParser:
         # ffff | feff | faff | dc19 | faff | faff
         # ffff | feff | faff | cdc4 | faff | faff (o2)
         pkt = pkt[15:-1]
-        struct_format = '<HHHHHH'
-        expected_len = struct.calcsize(struct_format)
+        expected_len = lte_l2_rnti_info.size
         if len(pkt) < expected_len:
             if self.parent:
                 self.parent.logger.log(logging.WARNING, 'Packet length ({}) shorter than expected ({}))'.format(len(pkt), expected_len))
             return None
 
-        header = namedtuple('SdmLteL2RntiInfo', 'si_rnti p_rnti tc_rnti c_rnti val5 val6')
-        rnti_info = header._make(struct.unpack(struct_format, pkt[0:expected_len]))
+        rnti_info = lte_l2_rnti_info.unpack(pkt)
 
         stdout = 'LTE L2 RNTI Info: {:#x} {:#x} {:#x} {:#x} {:#x} {:#x}'.format(rnti_info.si_rnti, rnti_info.p_rnti, rnti_info.tc_rnti,
             rnti_info.c_rnti, rnti_info.val5, rnti_info.val6)
@@ -142,23 +151,20 @@ class SdmLteParser:
         '''
         pkt = pkt[15:-1]
         if self.model == 'e5123' or self.model == 'e5300':
-            struct_format = '<IIIIHH'
+            expected_len = lte_rrc_serving_cell_e5123.size
         else:
-            struct_format = '<IIIIH'
-        expected_len = struct.calcsize(struct_format)
+            expected_len = lte_rrc_serving_cell.size
         if len(pkt) < expected_len:
             self.parent.logger.log(logging.WARNING, 'Packet length ({}) shorter than expected ({})'.format(len(pkt), expected_len))
             return None
 
-        header = namedtuple('SdmLteRrcServingCell', 'cid zero1 zero2 plmn tac')
-        header_e5123 = namedtuple('SdmLteRrcServingCellE5123', 'cid zero1 zero2 plmn tac band_indicator')
         if self.model == 'e5123' or self.model == 'e5300':
-            cell_info = header_e5123._make(struct.unpack(struct_format, pkt[0:expected_len]))
+            cell_info = lte_rrc_serving_cell_e5123.unpack(pkt)
             tac_real = struct.unpack('<H', struct.pack('>H', cell_info.tac))[0]
             stdout = 'LTE RRC Serving Cell: xTAC/xCID {:x}/{:x}, PLMN {}, Band {}'.format(tac_real, cell_info.cid, cell_info.plmn, cell_info.band_indicator)
         else:
             # 41 dd fa 05 | 09 23 00 01 | 01 00 00 00 | 00 00 00 00 | d0 af 00 00 | 06 db
-            cell_info = header._make(struct.unpack(struct_format, pkt[0:expected_len]))
+            cell_info = lte_rrc_serving_cell.unpack(pkt)
             tac_real = struct.unpack('<H', struct.pack('>H', cell_info.tac))[0]
             stdout = 'LTE RRC Serving Cell: xTAC/xCID {:x}/{:x}, PLMN {}'.format(tac_real, cell_info.cid, cell_info.plmn)
 
@@ -176,8 +182,7 @@ class SdmLteParser:
                 self.parent.logger.log(logging.WARNING, 'Packet length ({}) shorter than expected (1)'.format(len(pkt)))
             return None
 
-        header = namedtuple('SdmLteRrcState', 'state')
-        rrc_state = header._make(struct.unpack('<B', pkt[0:1]))
+        rrc_state = lte_rrc_state.unpack(pkt)
         rrc_state_map = {0: 'IDLE', 1: 'CONNECTING', 2: 'CONNECTED'}
         stdout = 'LTE RRC State: {}'.format(rrc_state_map[rrc_state.state] if rrc_state.state in rrc_state_map else 'UNKNOWN')
         return {'stdout': stdout}
@@ -234,8 +239,7 @@ class SdmLteParser:
             return None
 
         # direction - 0: DL, 1: UL
-        header = namedtuple('SdmLteRrcOtaPacket', 'channel direction length')
-        rrc_header = header._make(struct.unpack('<BBH', pkt[0:4]))
+        rrc_header = lte_rrc_ota_packet.unpack(pkt)
         rrc_msg = pkt[4:]
 
         return self._parse_sdm_lte_rrc_message(sdm_pkt_hdr, rrc_header.channel, rrc_header.direction, rrc_header.length, rrc_msg)
@@ -254,8 +258,7 @@ class SdmLteParser:
             return {'stdout': 'LTE RRC ASN Version: {}'.format(binascii.hexlify(pkt).decode('utf-8'))}
 
         # num_chunk is base 1, should be <= total_chunks
-        header = namedtuple('SdmLteRrcMultipleMessage', 'total_chunks num_chunk msgid channel direction length')
-        rrc_header = header._make(struct.unpack('<BBBBBH', pkt[0:7]))
+        rrc_header = lte_rrc_multiple_message.unpack(pkt)
         rrc_msg = pkt[7:]
 
         if rrc_header.msgid not in self.multi_message_chunk:
@@ -307,21 +310,19 @@ class SdmLteParser:
         #         self.parent.logger.log(logging.DEBUG, util.xxd(pkt))
         # # return None
 
-        struct_format = '<BBBLLL'
-        expected_len = struct.calcsize(struct_format)
+        expected_len = lte_rrc_rach_message.size
         if len(pkt) < expected_len:
             if self.parent:
                 self.parent.logger.log(logging.WARNING, 'Packet length ({}) shorter than expected ({}))'.format(len(pkt), expected_len))
             return None
 
-        header = namedtuple('SdmLteRrcRachMessage', 'direction val1 val2 val3 val4 tc_rnti_prob')
         # direction: 0, 1
         # val1: 1, 5, 6, 7
         # val2: 0
         # val3: 0, 00-1b, 3e, 3f
         # val4: 1-7
         # val5: varies
-        rach_message = header._make(struct.unpack(struct_format, pkt[0:expected_len]))
+        rach_message = lte_rrc_rach_message.unpack(pkt)
 
         stdout = 'LTE 0x55: {}'.format(rach_message)
         return {'stdout': stdout}
@@ -366,8 +367,7 @@ class SdmLteParser:
             return
 
         # direction: 0 - DL, 1 - UL
-        header = namedtuple('SdmLteNasMsg', 'direction length spare')
-        nas_header = header._make(struct.unpack('<BHB', pkt[0:4]))
+        nas_header = lte_nas_msg.unpack(pkt)
         nas_msg = pkt[4:]
         if nas_header.length != len(nas_msg):
             if self.parent:
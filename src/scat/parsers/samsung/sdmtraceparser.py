@@ -15,7 +15,7 @@ class SdmTraceParser:
             self.model = self.parent.model
 
         self.process = {
-            # 0x0103: lambda x, y: self.process_common_signaling(x, y)
+            # 0x0103: self.process_common_signaling
         }
 
     def set_model(self, model):
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import collections
+import threading
+import logging
+
+import scat.util as util
+
+class BoundedQueue:
+    """Thread-safe bounded FIFO with a configurable overflow policy.
+
+    Policies:
+    block: the producer waits until there is space
+    drop-oldest: the oldest queued item is discarded
+    drop-class: items of drop_classes are discarded first, either the
+        incoming one or the oldest queued one; blocks if there is none
+    """
+
+    policies = ('block', 'drop-oldest', 'drop-class')
+
+    def __init__(self, name, maxsize=1024, policy='block', drop_classes=()):
+        if policy not in self.policies:
+            raise ValueError('Unknown overflow policy {}, expected one of {}'.format(policy, ', '.join(self.policies)))
+        if maxsize < 1:
+            raise ValueError('Queue size should be at least 1')
+
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.drop_classes = set(drop_classes)
+
+        self.items = collections.deque()
+        self.cond = threading.Condition()
+        self.closed = False
+
+        self.high_water = 0
+        self.num_put = 0
+        self.num_dropped = 0
+
+    def _drop_queued(self):
+        # Removes the oldest queued item of a droppable class
+        for i, (item_class, item) in enumerate(self.items):
+            if item_class in self.drop_classes:
+                del self.items[i]
+                return True
+        return False
+
+    def put(self, item, item_class=None):
+        # Returns False if the item was dropped
+        with self.cond:
+            while len(self.items) >= self.maxsize and not self.closed:
+                if self.policy == 'drop-oldest':
+                    self.items.popleft()
+                    self.num_dropped += 1
+                elif self.policy == 'drop-class' and item_class in self.drop_classes:
+                    self.num_dropped += 1
+                    return False
+                elif self.policy == 'drop-class' and self._drop_queued():
+                    self.num_dropped += 1
+                else:
+                    self.cond.wait()
+
+            if self.closed:
+                return False
+
+            self.items.append((item_class, item))
+            self.num_put += 1
+            if len(self.items) > self.high_water:
+                self.high_water = len(self.items)
+            self.cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        # Returns None on timeout or once the queue is closed and drained
+        with self.cond:
+            if not self.cond.wait_for(lambda: len(self.items) > 0 or self.closed, timeout):
+                return None
+            if len(self.items) == 0:
+                return None
+
+            item_class, item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def depth(self):
+        return len(self.items)
+
+    def stats(self):
+        return {'depth': len(self.items), 'high_water': self.high_water,
+            'put': self.num_put, 'dropped': self.num_dropped}
+
+    def stats_str(self):
+        return '{}: depth {}, high water {}/{}, {} queued, {} dropped'.format(
+            self.name, len(self.items), self.high_water, self.maxsize,
+            self.num_put, self.num_dropped)
+
+class QueuedReader:
+    """Reader stage: drains an I/O device from a dedicated thread, splits
+    the reads into whole frames with framer and queues the frames. Exposes
+    the I/O device interface to the parser.
+
+    Only whole frames are queued, so the overflow policy may drop any of
+    them before it is decoded. For the drop-class policy, frame_id gives
+    the class of a frame, such as its log ID."""
+
+    def __init__(self, io_device, framer, frame_id=None, maxsize=1024,
+            policy='block', drop_classes=(), read_size=0x1000):
+        self.io_device = io_device
+        self.framer = framer
+        self.frame_id = frame_id if policy == 'drop-class' else None
+        self.read_size = read_size
+        self.queue = BoundedQueue('reader', maxsize, policy, drop_classes)
+        self.block_until_data = io_device.block_until_data
+        self.mapped_buf = None
+        self.eof = False
+        self.error = None
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='scat-reader', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while self.running:
+                buf = self.io_device.read(self.read_size)
+                if len(buf) == 0:
+                    if self.io_device.block_until_data:
+                        continue
+                    break
+                self.framer.feed(buf)
+                for frame in self.framer.frames():
+                    frame = bytes(frame)
+                    self.queue.put(frame, self.frame_id(frame) if self.frame_id is not None else None)
+        except IOError as e:
+            # Handed to the decoder once the queue is drained
+            self.error = e
+        self.eof = True
+        self.queue.close()
+
+    def read(self, read_size, decode_hdlc = False):
+        # Returns queued frames up to read_size bytes, at least one
+        buf = self.queue.get(timeout=0.5 if self.block_until_data else None)
+        if buf is None:
+            if self.error is not None and self.queue.closed:
+                raise self.error
+            return b''
+
+        bufs = [buf]
+        num_bytes = len(buf)
+        while num_bytes < read_size:
+            buf = self.queue.get(0)
+            if buf is None:
+                break
+            bufs.append(buf)
+            num_bytes += len(buf)
+        buf = b''.join(bufs)
+
+        if decode_hdlc:
+            buf = util.unwrap(buf)
+        return buf
+
+    def write(self, write_buf, encode_hdlc = False):
+        self.io_device.write(write_buf, encode_hdlc)
+
+    def write_then_read_discard(self, write_buf, read_size = 0x1000, encode_hdlc = False):
+        self.write(write_buf, encode_hdlc)
+        self.read(read_size)
+
+    def stop(self):
+        # Device reads return within their timeout, waiting for the thread
+        # to exit makes sure it no longer reads once the caller sends
+        # commands to the device
+        self.running = False
+        self.queue.close()
+        self.thread.join()
+
+class QueuedWriter:
+    """Writer stage: hands parsed packets to the real writer from a
+    dedicated thread. Packets are classified as 'cp' or 'up' and text
+    comments as 'text' for the drop-class overflow policy."""
+
+    def __init__(self, writer, maxsize=4096, policy='block', drop_classes=('up', )):
+        self.writer = writer
+        self.has_comments = hasattr(writer, 'write_comment')
+        self.queue = BoundedQueue('writer', maxsize, policy, drop_classes)
+        self.logger = logging.getLogger('scat.pipeline')
+
+        self.thread = threading.Thread(target=self._run, name='scat-writer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            plane, sock_content, radio_id, ts = item
+            try:
+                if plane == 'cp':
+                    self.writer.write_cp(sock_content, radio_id, ts)
+                elif plane == 'up':
+                    self.writer.write_up(sock_content, radio_id, ts)
+                else:
+                    self.writer.write_comment(sock_content, radio_id, ts)
+            except Exception as e:
+                self.logger.log(logging.WARNING, 'Writer error: {}'.format(e))
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.queue.put(('cp', sock_content, radio_id, ts), 'cp')
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.queue.put(('up', sock_content, radio_id, ts), 'up')
+
+    def write_comment(self, text, radio_id=0, ts=None):
+        if self.has_comments:
+            self.queue.put(('text', text, radio_id, ts), 'text')
+
+    def stop(self):
+        # Writes out everything still queued
+        self.queue.close()
+        self.thread.join()
+
+class CapturePipeline:
+    """Splits live capture into reader, decoder and writer stages.
+
+    The parser keeps running its own run_diag loop as the decoder stage,
+    reading from a QueuedReader and writing to a QueuedWriter that replace
+    its I/O device and writer. The overflow policy applies to the reader
+    queue, which holds whole frames not yet decoded, drop-class drops
+    frames with the IDs in drop_ids first. The writer queue blocks, so a
+    slow writer backs up into the reader queue.
+    """
+
+    def __init__(self, parser, read_queue_size=1024, write_queue_size=4096,
+            policy='block', drop_ids=()):
+        self.parser = parser
+        self.io_device = parser.io_device
+        self.writer = parser.writer
+        self.read_queue_size = read_queue_size
+        self.write_queue_size = write_queue_size
+        self.policy = policy
+        self.drop_ids = drop_ids
+
+        self.reader_stage = None
+        self.writer_stage = None
+        self.logger = logging.getLogger('scat.pipeline')
+
+    def start(self):
+        self.reader_stage = QueuedReader(self.io_device, self.parser.get_framer(),
+            self.parser.get_frame_id, self.read_queue_size, self.policy, self.drop_ids)
+        self.writer_stage = QueuedWriter(self.writer, self.write_queue_size)
+        self.parser.set_io_device(self.reader_stage)
+        self.parser.set_writer(self.writer_stage)
+
+    def stop(self):
+        if self.reader_stage is None:
+            return
+        self.reader_stage.stop()
+        self.writer_stage.stop()
+        self.parser.set_io_device(self.io_device)
+        self.parser.set_writer(self.writer)
+        self.logger.log(logging.INFO, 'Pipeline: {}'.format(self.stats_str()))
+
+    def stats(self):
+        return {'reader': self.reader_stage.queue.stats(),
+            'writer': self.writer_stage.queue.stats()}
+
+    def stats_str(self):
+        return '{}; {}'.format(self.reader_stage.queue.stats_str(),
+            self.writer_stage.queue.stats_str())
@@ -2,6 +2,8 @@
 # coding: utf8
 
 from scat.writers.pcapwriter import PcapWriter
+from scat.writers.pcapngwriter import PcapngWriter
 from scat.writers.socketwriter import SocketWriter
 from scat.writers.rawwriter import RawWriter
 from scat.writers.nullwriter import NullWriter
+from scat.writers.rotatingwriter import RotatingWriter
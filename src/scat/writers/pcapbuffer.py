@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import threading
+import time
+
+class BufferedPcapFile:
+    """Output buffering shared by PcapWriter and PcapngWriter.
+
+    Records are appended to self.buf while holding self.lock. The buffer
+    is written out by the writer once it holds flush_size bytes, and by a
+    background thread once flush_interval seconds passed since the last
+    write out, so buffered records reach the file also while no more
+    packets arrive. With flush_interval 0 every record is written out.
+    """
+
+    def __init__(self, filename, header, flush_size = 1048576, flush_interval = 1.0):
+        self.flush_size = flush_size if flush_interval != 0 else 0
+        self.flush_interval = flush_interval
+        self.pcap_file = open(filename, 'wb')
+        self.buf = bytearray(header)
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+        self.stopped = threading.Event()
+        self.flush_thread = None
+        if flush_interval is not None and flush_interval > 0:
+            self.flush_thread = threading.Thread(target=self._run_flush, name='scat-pcap-flush', daemon=True)
+            self.flush_thread.start()
+
+    def _run_flush(self):
+        while not self.stopped.wait(self.flush_interval / 2):
+            with self.lock:
+                if self.pcap_file.closed:
+                    break
+                now = time.monotonic()
+                if len(self.buf) > 0 and now - self.last_flush >= self.flush_interval:
+                    self._flush(now)
+
+    def _flush(self, now=None):
+        if len(self.buf) > 0:
+            self.pcap_file.write(self.buf)
+            self.buf = bytearray()
+        self.pcap_file.flush()
+        self.last_flush = now if now is not None else time.monotonic()
+
+    def tell(self):
+        # File size including buffered records
+        with self.lock:
+            return self.pcap_file.tell() + len(self.buf)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        self.stopped.set()
+        if self.flush_thread is not None:
+            self.flush_thread.join()
+            self.flush_thread = None
+        with self.lock:
+            if not self.pcap_file.closed:
+                self._flush()
+                self.pcap_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import struct
+import time
+
+from scat.writers.pcapbuffer import BufferedPcapFile
+
+LINKTYPE_IPV4 = 228
+LINKTYPE_WIRESHARK_UPPER_PDU = 252
+
+def pcapng_option(code, value):
+    return struct.pack('<HH', code, len(value)) + value + bytes(-len(value) & 3)
+
+def pcapng_block(block_type, body):
+    block_len = 12 + len(body)
+    return struct.pack('<LL', block_type, block_len) + body + struct.pack('<L', block_len)
+
+class PcapngWriter(BufferedPcapFile):
+    """Writes packets into a pcapng file with one interface per radio and
+    plane, timestamped in nanoseconds.
+
+    Control plane GSMTAP packets are framed as exported PDUs for the
+    Wireshark GSMTAP dissector, or as IPv4/UDP datagrams with udp_framing.
+    User plane packets are always IPv4/UDP datagrams, as their framing is
+    found by the UDP heuristic dissectors. With comments, text output is
+    stored as packet comments on a per-radio text interface.
+
+    Packets are handled as in PcapWriter, buffering is done by
+    BufferedPcapFile.
+    """
+
+    epb_header = struct.Struct('<LLLLLLL')
+    epb_trailer = struct.Struct('<L')
+    ip_len_id = struct.Struct('!HH')
+    ip_dest_udp_hdr = struct.Struct('!LHHH')
+    padding = (b'', b'\x00', b'\x00\x00', b'\x00\x00\x00')
+
+    # Exported PDU tags: dissector name "gsmtap", end of tags
+    gsmtap_pdu_hdr = struct.pack('!HH', 12, 8) + b'gsmtap\x00\x00' + struct.pack('!HH', 0, 0)
+    text_pdu_hdr = struct.pack('!HH', 0, 0)
+
+    plane_desc = {'cp': 'control plane', 'up': 'user plane', 'text': 'text output'}
+
+    def __init__(self, filename, port_cp = 4729, port_up = 47290, udp_framing = False,
+            comments = False, flush_size = 1048576, flush_interval = 1.0):
+        self.port = {'cp': port_cp, 'up': port_up}
+        self.udp_framing = {'cp': udp_framing, 'up': True}
+        self.comments = comments
+        self.ip_id = 0
+        self.base_address = 0x7f000001
+        self.interfaces = {}
+
+        self.ip_udp_template = struct.pack('!BBHHBBBBHLLHHHH',
+                0x45,                        # version, IHL, dsf
+                0x00,
+                0,                           # length
+                0,                           # id
+                0x40,                        # flags/fragment offset
+                0x00,
+                0x40,                        # TTL
+                0x11,                        # proto = udp
+                0xffff,                      # header checksum
+                0x7f000001,                  # src address
+                0,                           # dest address
+                13337,                       # source port
+                0,                           # destination port
+                0,                           # length
+                0xffff,                      # checksum
+                )
+
+        shb_body = struct.pack('<LHHq', 0x1a2b3c4d, 1, 0, -1)
+        shb_body += pcapng_option(4, b'SCAT') + pcapng_option(0, b'')
+        BufferedPcapFile.__init__(self, filename, pcapng_block(0x0a0d0d0a, shb_body),
+            flush_size, flush_interval)
+
+    def add_interface(self, radio_id, plane):
+        # Called while holding the lock
+        if plane == 'text' or not self.udp_framing[plane]:
+            linktype = LINKTYPE_WIRESHARK_UPPER_PDU
+        else:
+            linktype = LINKTYPE_IPV4
+
+        if_id = len(self.interfaces)
+        idb_body = struct.pack('<HHL', linktype, 0, 0)
+        idb_body += pcapng_option(2, 'radio{}-{}'.format(radio_id, plane).encode('utf-8'))
+        idb_body += pcapng_option(3, 'Radio {} {}'.format(radio_id, self.plane_desc[plane]).encode('utf-8'))
+        idb_body += pcapng_option(9, b'\x09') # if_tsresol: nanoseconds
+        idb_body += pcapng_option(0, b'')
+        self.buf += pcapng_block(0x00000001, idb_body)
+        self.interfaces[(radio_id, plane)] = if_id
+        return if_id
+
+    def write_pkt(self, sock_content, plane, radio_id=0, ts=None):
+        if ts is None:
+            ts = time.time_ns()
+        if radio_id < 0:
+            radio_id = 0
+        if type(sock_content) is tuple or type(sock_content) is list:
+            content_len = sum(map(len, sock_content))
+        else:
+            content_len = len(sock_content)
+
+        with self.lock:
+            if_id = self.interfaces.get((radio_id, plane))
+            if if_id is None:
+                if_id = self.add_interface(radio_id, plane)
+
+            buf = self.buf
+            pos = len(buf)
+            if self.udp_framing[plane]:
+                udp_len = content_len + 8
+                pkt_len = udp_len + 20
+                block_len = 32 + pkt_len + (-pkt_len & 3)
+                buf += self.epb_header.pack(6, block_len, if_id, ts >> 32, ts & 0xffffffff, pkt_len, pkt_len)
+                buf += self.ip_udp_template
+                self.ip_len_id.pack_into(buf, pos + 28 + 2, pkt_len, self.ip_id)
+                self.ip_dest_udp_hdr.pack_into(buf, pos + 28 + 16, self.base_address + radio_id, 13337, self.port[plane], udp_len)
+                self.ip_id += 1
+                if self.ip_id > 65535:
+                    self.ip_id = 0
+            else:
+                pkt_len = len(self.gsmtap_pdu_hdr) + content_len
+                block_len = 32 + pkt_len + (-pkt_len & 3)
+                buf += self.epb_header.pack(6, block_len, if_id, ts >> 32, ts & 0xffffffff, pkt_len, pkt_len)
+                buf += self.gsmtap_pdu_hdr
+            if type(sock_content) is tuple or type(sock_content) is list:
+                for part in sock_content:
+                    buf += part
+            else:
+                buf += sock_content
+            buf += self.padding[-pkt_len & 3]
+            buf += self.epb_trailer.pack(block_len)
+            if len(buf) >= self.flush_size:
+                self._flush()
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.write_pkt(sock_content, 'cp', radio_id, ts)
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.write_pkt(sock_content, 'up', radio_id, ts)
+
+    def write_comment(self, text, radio_id=0, ts=None):
+        if not self.comments:
+            return
+        if ts is None:
+            ts = time.time_ns()
+        if radio_id < 0:
+            radio_id = 0
+        with self.lock:
+            if_id = self.interfaces.get((radio_id, 'text'))
+            if if_id is None:
+                if_id = self.add_interface(radio_id, 'text')
+
+            pkt_len = len(self.text_pdu_hdr)
+            epb_body = struct.pack('<LLLLL', if_id, ts >> 32, ts & 0xffffffff, pkt_len, pkt_len)
+            epb_body += self.text_pdu_hdr
+            # Option values are limited to 64 KiB
+            epb_body += pcapng_option(1, text.encode('utf-8')[:0xffff]) + pcapng_option(0, b'')
+            self.buf += pcapng_block(0x00000006, epb_body)
+            if len(self.buf) >= self.flush_size:
+                self._flush()
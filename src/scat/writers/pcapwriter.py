@@ -1,18 +1,57 @@
 #!/usr/bin/env python3
 # coding: utf8
 
-import datetime
 import struct
+import time
 
-class PcapWriter:
-    def __init__(self, filename, port_cp = 4729, port_up = 47290):
+from scat.writers.pcapbuffer import BufferedPcapFile
+
+class PcapWriter(BufferedPcapFile):
+    """Writes packets as UDP datagrams from 127.0.0.1 to 127.0.0.1 + radio ID
+    into a pcap file.
+
+    Packets are one buffer or a tuple or list of buffers, written one after
+    the other. Records are assembled in a buffer from a fixed header
+    template, patching only timestamp, lengths, IP ID, destination and
+    port. Buffering is done by BufferedPcapFile.
+    """
+
+    pcap_global_hdr = struct.Struct('<LHHLLLL')
+    pcap_rec_hdr = struct.Struct('<LLLL')
+    ip_len_id = struct.Struct('!HH')
+    ip_dest_udp_hdr = struct.Struct('!LHHH')
+
+    # Offset of the IP header in the record header template
+    ip_offset = 16 + 14
+
+    def __init__(self, filename, port_cp = 4729, port_up = 47290, flush_size = 1048576, flush_interval = 1.0):
         self.port_cp = port_cp
         self.port_up = port_up
         self.ip_id = 0
         self.base_address = 0x7f000001
-        self.pcap_file = open(filename, 'wb')
         self.eth_hdr = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x08\x00'
-        pcap_global_hdr = struct.pack('<LHHLLLL',
+        ip_hdr = struct.pack('!BBHHBBBBHLL',
+                0x45,                        # version, IHL, dsf
+                0x00,
+                0,                           # length
+                0,                           # id
+                0x40,                        # flags/fragment offset
+                0x00,
+                0x40,                        # TTL
+                0x11,                        # proto = udp
+                0xffff,                      # header checksum
+                0x7f000001,                  # src address
+                0,                           # dest address
+                )
+        udp_hdr = struct.pack('!HHHH',
+                13337,                       # source port
+                0,                           # destination port
+                0,                           # length
+                0xffff,                      # checksum
+                )
+        self.hdr_template = bytes(16) + self.eth_hdr + ip_hdr + udp_hdr
+
+        BufferedPcapFile.__init__(self, filename, self.pcap_global_hdr.pack(
                 0xa1b2c3d4,
                 2,
                 4,
@@ -20,54 +59,43 @@ class PcapWriter:
                 0,
                 0xffff,
                 1,
-                )
-        self.pcap_file.write(pcap_global_hdr)
-
-    def __enter__(self):
-        return self
+                ), flush_size, flush_interval)
 
-    def write_pkt(self, sock_content, port, radio_id=0, ts=datetime.datetime.now()):
-        pcap_hdr = struct.pack('<LLLL',
-                int(ts.timestamp()),
-                ts.microsecond,
-                len(sock_content) + 8 + 20 + 14,
-                len(sock_content) + 8 + 20 + 14,
-                )
+    def write_pkt(self, sock_content, port, radio_id=0, ts=None):
+        if ts is None:
+            ts = time.time_ns()
+        ts_sec, ts_nsec = divmod(ts, 1000000000)
 
         if radio_id <= 0:
             dest_address = self.base_address
         else:
             dest_address = self.base_address + radio_id
-        ip_hdr = struct.pack('!BBHHBBBBHLL',
-                0x45,                        # version, IHL, dsf
-                0x00,
-                len(sock_content) + 8 + 20,  # length
-                self.ip_id,                  # id
-                0x40,                        # flags/fragment offset
-                0x00,
-                0x40,                        # TTL
-                0x11,                        # proto = udp
-                0xffff,                      # header checksum
-                0x7f000001,                  # src address
-                dest_address,                # dest address
-                )
-        udp_hdr = struct.pack('!HHHH',
-                13337,                 # source port
-                port,                  # destination port
-                len(sock_content) + 8, # length
-                0xffff,                # checksum
-                )
+        if type(sock_content) is tuple or type(sock_content) is list:
+            udp_len = sum(map(len, sock_content)) + 8
+        else:
+            udp_len = len(sock_content) + 8
 
-        self.pcap_file.write(pcap_hdr + self.eth_hdr + ip_hdr + udp_hdr + sock_content)
-        self.ip_id += 1
-        if self.ip_id > 65535:
-            self.ip_id = 0
+        with self.lock:
+            buf = self.buf
+            pos = len(buf)
+            buf += self.hdr_template
+            self.pcap_rec_hdr.pack_into(buf, pos, ts_sec, ts_nsec // 1000, udp_len + 20 + 14, udp_len + 20 + 14)
+            self.ip_len_id.pack_into(buf, pos + self.ip_offset + 2, udp_len + 20, self.ip_id)
+            self.ip_dest_udp_hdr.pack_into(buf, pos + self.ip_offset + 16, dest_address, 13337, port, udp_len)
+            if type(sock_content) is tuple or type(sock_content) is list:
+                for part in sock_content:
+                    buf += part
+            else:
+                buf += sock_content
 
-    def write_cp(self, sock_content, radio_id=0, ts=datetime.datetime.now()):
+            self.ip_id += 1
+            if self.ip_id > 65535:
+                self.ip_id = 0
+            if len(buf) >= self.flush_size:
+                self._flush()
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
         self.write_pkt(sock_content, self.port_cp, radio_id, ts)
 
-    def write_up(self, sock_content, radio_id=0, ts=datetime.datetime.now()):
+    def write_up(self, sock_content, radio_id=0, ts=None):
         self.write_pkt(sock_content, self.port_up, radio_id, ts)
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.pcap_file.close()
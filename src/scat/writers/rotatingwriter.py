@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+import os
+import time
+import json
+import gzip
+import lzma
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+
+class RotatingWriter:
+    """Splits the output of a file writer into segments.
+
+    factory(filename) creates the writer of each segment, e.g. PcapWriter
+    or RawWriter. A segment is finished once it reaches max_bytes,
+    max_seconds or max_packets. The time limit is checked by a timer
+    thread, so that a segment is also finished while no packets arrive.
+    Segments without packets are kept open. Finished segments are
+    compressed and recorded in the manifest by a background thread, so
+    that writing packets never waits for compression.
+
+    Segments are named <name>_<index><ext> after filename. The manifest
+    <filename>.manifest.json lists finished segments with file name,
+    packet count and first and last timestamp in nanoseconds.
+    """
+
+    compressors = {'gzip': (gzip.open, '.gz'), 'xz': (lzma.open, '.xz')}
+
+    def __init__(self, factory, filename, max_bytes = None, max_seconds = None,
+            max_packets = None, compression = None):
+        if compression is not None and compression not in self.compressors:
+            raise ValueError('Unknown compression {}'.format(compression))
+
+        self.factory = factory
+        self.root, self.ext = os.path.splitext(filename)
+        self.manifest_filename = filename + '.manifest.json'
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.max_packets = max_packets
+        self.compression = compression
+        self.logger = logging.getLogger('scat.writers')
+
+        self.segments = []
+        self.index = 0
+        self.writer = None
+        # Held while writing to and swapping self.writer
+        self.lock = threading.Lock()
+        self.open_segment()
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='scat-rotate', daemon=True)
+        self.thread.start()
+
+        self.stopped = threading.Event()
+        self.timer_thread = None
+        if max_seconds is not None:
+            self.timer_thread = threading.Thread(target=self._run_timer, name='scat-rotate-timer', daemon=True)
+            self.timer_thread.start()
+
+    def __enter__(self):
+        return self
+
+    def open_segment(self):
+        self.segment_filename = '{}_{:04d}{}'.format(self.root, self.index, self.ext)
+        self.writer = self.factory(self.segment_filename)
+        self.index += 1
+        self.num_packets = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.opened = time.monotonic()
+
+    def finish_segment(self):
+        self.writer.__exit__(None, None, None)
+        self.queue.put({'file': self.segment_filename, 'packets': self.num_packets,
+            'first_ts': self.first_ts, 'last_ts': self.last_ts})
+
+    def account(self, ts):
+        # Called after each packet, rotates once a limit is reached
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+        self.num_packets += 1
+
+        if ((self.max_packets is not None and self.num_packets >= self.max_packets) or
+                (self.max_bytes is not None and self.writer.tell() >= self.max_bytes)):
+            self.finish_segment()
+            self.open_segment()
+
+    def _run_timer(self):
+        timeout = self.max_seconds
+        while not self.stopped.wait(timeout):
+            with self.lock:
+                if self.writer is None:
+                    break
+                elapsed = time.monotonic() - self.opened
+                if elapsed >= self.max_seconds:
+                    if self.num_packets > 0:
+                        self.finish_segment()
+                        self.open_segment()
+                    else:
+                        self.opened = time.monotonic()
+                    elapsed = 0
+                timeout = self.max_seconds - elapsed
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        if ts is None:
+            ts = time.time_ns()
+        with self.lock:
+            self.writer.write_cp(sock_content, radio_id, ts)
+            self.account(ts)
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        if ts is None:
+            ts = time.time_ns()
+        with self.lock:
+            self.writer.write_up(sock_content, radio_id, ts)
+            self.account(ts)
+
+    def write_comment(self, text, radio_id=0, ts=None):
+        with self.lock:
+            write_comment = getattr(self.writer, 'write_comment', None)
+            if write_comment is not None:
+                write_comment(text, radio_id, ts)
+
+    def _run(self):
+        while True:
+            segment = self.queue.get()
+            if segment is None:
+                break
+
+            if self.compression is not None:
+                try:
+                    segment['file'] = self.compress(segment['file'])
+                except OSError as e:
+                    self.logger.log(logging.WARNING, 'Could not compress {}: {}'.format(segment['file'], e))
+            segment['file'] = os.path.basename(segment['file'])
+            self.segments.append(segment)
+            self.save_manifest()
+
+    def compress(self, filename):
+        open_compressed, suffix = self.compressors[self.compression]
+        with open(filename, 'rb') as f_in, open_compressed(filename + suffix, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out, 1048576)
+        os.remove(filename)
+        return filename + suffix
+
+    def save_manifest(self):
+        # Written to a temporary file and renamed, readers never see a
+        # partial manifest
+        manifest_dir = os.path.dirname(self.manifest_filename)
+        try:
+            fd, tmp_filename = tempfile.mkstemp(dir=manifest_dir if manifest_dir else '.', prefix='.manifest')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'segments': self.segments}, f, indent=1)
+            os.replace(tmp_filename, self.manifest_filename)
+        except OSError as e:
+            self.logger.log(logging.WARNING, 'Could not write manifest {}: {}'.format(self.manifest_filename, e))
+
+    def close(self):
+        # Waits until the last segment is compressed and recorded
+        self.stopped.set()
+        if self.timer_thread is not None:
+            self.timer_thread.join()
+            self.timer_thread = None
+        with self.lock:
+            if self.writer is None:
+                return
+            if self.num_packets == 0 and self.index > 1:
+                # Opened by the last rotation, nothing written since
+                self.writer.__exit__(None, None, None)
+                os.remove(self.segment_filename)
+            else:
+                self.finish_segment()
+            self.writer = None
+        self.queue.put(None)
+        self.thread.join()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
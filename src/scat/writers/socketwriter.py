@@ -3,37 +3,91 @@
 
 import socket
 import struct
+import errno
+import logging
 
 class SocketWriter:
-    def __init__(self, base_address, port_cp = 4729, port_up = 47290):
+    """Sends packets as UDP datagrams to base_address + radio ID.
+
+    Datagrams dropped for lack of buffer space (ENOBUFS) and other send
+    errors are counted instead of stopping the capture.
+
+    A packet given as a tuple or list of buffers is sent as one datagram
+    with sendmsg, without joining the buffers first.
+    """
+
+    has_sendmsg = hasattr(socket.socket, 'sendmsg')
+
+    def __init__(self, base_address, port_cp = 4729, port_up = 47290, sndbuf = 4194304):
         self.base_address = struct.unpack('!I', socket.inet_pton(socket.AF_INET, base_address))[0]
         self.port_cp = port_cp
-        self.sock_cp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock_cp_recv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-
         self.port_up = port_up
+        self.sock_cp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock_up = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock_up_recv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for sock in (self.sock_cp, self.sock_up):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            except OSError:
+                pass
+
+        # (address, port) per radio ID, filled on first use
+        self.dest_cp = {}
+        self.dest_up = {}
+
+        self.num_sent = 0
+        self.num_dropped = 0
+        self.num_errors = 0
+        self.logger = logging.getLogger('scat.writers')
 
     def __enter__(self):
         return self
 
-    def write_cp(self, sock_content, radio_id=0, ts=None):
+    def destination(self, radio_id, port):
         if radio_id <= 0:
             dest_address = self.base_address
         else:
             dest_address = self.base_address + radio_id
-        dest_address_str = socket.inet_ntoa(struct.pack('!I', dest_address))
-        self.sock_cp.sendto(sock_content, (dest_address_str, self.port_cp))
+        return (socket.inet_ntoa(struct.pack('!I', dest_address)), port)
+
+    def send(self, sock, sock_content, dest):
+        try:
+            if type(sock_content) is tuple or type(sock_content) is list:
+                if self.has_sendmsg:
+                    sock.sendmsg(sock_content, (), 0, dest)
+                else:
+                    sock.sendto(b''.join(sock_content), dest)
+            else:
+                sock.sendto(sock_content, dest)
+            self.num_sent += 1
+        except OSError as e:
+            if e.errno == errno.ENOBUFS:
+                self.num_dropped += 1
+            else:
+                self.num_errors += 1
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        dest = self.dest_cp.get(radio_id)
+        if dest is None:
+            dest = self.dest_cp[radio_id] = self.destination(radio_id, self.port_cp)
+        self.send(self.sock_cp, sock_content, dest)
 
     def write_up(self, sock_content, radio_id=0, ts=None):
-        if radio_id <= 0:
-            dest_address = self.base_address
-        else:
-            dest_address = self.base_address + radio_id
-        dest_address_str = socket.inet_ntoa(struct.pack('!I', dest_address))
-        self.sock_up.sendto(sock_content, (dest_address_str, self.port_up))
+        dest = self.dest_up.get(radio_id)
+        if dest is None:
+            dest = self.dest_up[radio_id] = self.destination(radio_id, self.port_up)
+        self.send(self.sock_up, sock_content, dest)
+
+    def stats(self):
+        return {'sent': self.num_sent, 'dropped': self.num_dropped, 'errors': self.num_errors}
+
+    def stats_str(self):
+        return '{} sent, {} dropped (ENOBUFS), {} send errors'.format(self.num_sent, self.num_dropped, self.num_errors)
+
+    def close(self):
+        if self.sock_cp.fileno() >= 0:
+            self.logger.log(logging.INFO, 'Socket writer: {}'.format(self.stats_str()))
+            self.sock_cp.close()
+            self.sock_up.close()
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.sock_cp_recv.close()
-        self.sock_up_recv.close()
+        self.close()
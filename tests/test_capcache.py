@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import unittest
+import binascii
+import struct
+import tempfile
+import os
+import io
+import contextlib
+
+from scat.parsers.qualcomm.qualcommparser import QualcommParser
+from scat.parsers.qualcomm.capcache import CapabilityCache
+from scat.hdlc import HdlcFramer
+import scat.util as util
+
+class FakeQualcommDevice:
+    build_id_resp = binascii.unhexlify('7c010000f20c00004e010000524d35303051474c41425231314130364d34470000')
+
+    def __init__(self):
+        self.framer = HdlcFramer()
+        self.commands = []
+        self.pending = []
+
+    def respond(self, cmd):
+        if cmd[0] == 0x7c:
+            return self.build_id_resp
+        elif cmd[0] == 0x7d and cmd[1] == 0x01:
+            return struct.pack('<BBHHHHHHH', 0x7d, 0x01, 0, 2, 0, 0x0000, 0x0001, 0x01f4, 0x01f4)
+        elif cmd[0] == 0x7d and cmd[1] == 0x02:
+            start, end = struct.unpack('<HH', cmd[2:6])
+            return struct.pack('<BBHHH', 0x7d, 0x02, start, end, 0) + b''.join(struct.pack('<L', 0x1f) for i in range(end - start + 1))
+        return cmd[:2]
+
+    def write(self, write_buf, encode_hdlc=False):
+        self.framer.feed(write_buf)
+        for frame in self.framer.frames():
+            cmd = util.unwrap(frame)[:-2]
+            self.commands.append(cmd)
+            self.pending.append(util.generate_packet(self.respond(cmd)))
+
+    def read(self, read_size, decode_hdlc=False):
+        if len(self.pending) == 0:
+            return b''
+        return self.pending.pop(0)
+
+class TestCapabilityCache(unittest.TestCase):
+    retrieve_ranges = struct.pack('<LL', 0x73, 0x01)
+
+    def capture(self, filename):
+        parser = QualcommParser()
+        parser.set_parameter({'msgs': True, 'capability-cache': filename})
+        io_device = FakeQualcommDevice()
+        parser.set_io_device(io_device)
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser.init_diag()
+            parser.prepare_diag()
+        return [x[:2] if x[0] != 0x73 else x[:8] for x in io_device.commands]
+
+    def test_replay(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'cache', 'capabilities.json')
+            commands = self.capture(filename)
+            self.assertIn(b'\x7d\x01', commands)
+            self.assertIn(self.retrieve_ranges, commands)
+            self.assertEqual(commands.count(b'\x7d\x02'), 2)
+
+            cache = CapabilityCache(filename)
+            expected = {'id_range': [(0, 1), (500, 500)],
+                'levels': [(0, 1, [(0, 0x1f), (1, 0x1f)]), (500, 500, [(500, 0x1f)])]}
+            self.assertEqual(cache.get('RM500QGLABR11A06M4G'), expected)
+            self.assertIsNone(cache.get('other'))
+
+            # Reconnect: masks are set without querying ranges and levels
+            cached_commands = self.capture(filename)
+            self.assertNotIn(b'\x7d\x01', cached_commands)
+            self.assertNotIn(b'\x7d\x02', cached_commands)
+            self.assertNotIn(self.retrieve_ranges, cached_commands)
+            self.assertEqual(cached_commands.count(b'\x7d\x04'), 4)
+            self.assertEqual([x for x in commands if x not in (b'\x7d\x01', b'\x7d\x02', self.retrieve_ranges)], cached_commands)
+
+    def test_invalid_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'capabilities.json')
+            with open(filename, 'w') as f:
+                f.write('{')
+            with self.assertLogs('scat.qualcommparser', 'WARNING'):
+                cache = CapabilityCache(filename)
+            self.assertIsNone(cache.get('RM500QGLABR11A06M4G'))
+
+if __name__ == '__main__':
+    unittest.main()
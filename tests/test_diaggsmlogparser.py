@@ -2,10 +2,10 @@
 
 import unittest
 import binascii
-import datetime
 from collections import namedtuple
 
 from scat.parsers.qualcomm.diaggsmlogparser import DiagGsmLogParser
+import scat.util as util
 
 class TestDiagGsmLogParser(unittest.TestCase):
     parser = DiagGsmLogParser(parent=None)
@@ -63,7 +63,7 @@ class TestDiagGsmLogParser(unittest.TestCase):
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0x512f, timestamp=0)
         result = self.parser.parse_gsm_rr(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('030701000000000000000000010000000000000012d53d800000000049061b761762f2200141c8010a156544b800004e072b2b')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0),
+            'ts': util.qxdm_epoch_ns,
             'radio_id': 0}
         self.assertDictEqual(result, expected)
 
@@ -71,7 +71,7 @@ class TestDiagGsmLogParser(unittest.TestCase):
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0x512f, timestamp=0)
         result = self.parser.parse_gsm_rr(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('030701000000000000000000020000000000000012d53d800000000031063f100f707c7f502601010f4f3112050480e02b2b2b')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0),
+            'ts': util.qxdm_epoch_ns,
             'radio_id': 0}
         self.assertDictEqual(result, expected)
 
@@ -79,7 +79,7 @@ class TestDiagGsmLogParser(unittest.TestCase):
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0x512f, timestamp=0)
         result = self.parser.parse_gsm_rr(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('030701000000000000000000020000000000000012d53d80000000001506210001f02b2b2b2b2b2b2b2b2b2b2b2b2b2b2b2b2b')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0),
+            'ts': util.qxdm_epoch_ns,
             'radio_id': 0}
         self.assertDictEqual(result, expected)
 
@@ -87,7 +87,7 @@ class TestDiagGsmLogParser(unittest.TestCase):
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0x512f, timestamp=0)
         result = self.parser.parse_gsm_rr(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('030701000000000000000000010000000000000012d53d800000000005060764a0312aa5d047fbfe01ff04332b2b2b2b2b2b2b')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0),
+            'ts': util.qxdm_epoch_ns,
             'radio_id': 0}
         self.assertDictEqual(result, expected)
 
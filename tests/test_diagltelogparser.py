@@ -2,15 +2,22 @@
 
 import unittest
 import binascii
-import datetime
 from collections import namedtuple
 
 from scat.parsers.qualcomm.diagltelogparser import DiagLteLogParser
+import scat.util as util
 
 class TestDiagLteLogParser(unittest.TestCase):
     parser = DiagLteLogParser(parent=None)
     log_header = namedtuple('QcDiagLogHeader', 'cmd_code reserved length1 length2 log_id timestamp')
 
+    def join_packets(self, result):
+        # Packets are returned as tuples of header and payload buffers
+        for plane in ('cp', 'up'):
+            if plane in result:
+                result[plane] = [util.join_buffers(x) for x in result[plane]]
+        return result
+
     # LTE ML1
     def test_parse_lte_ml1_scell_meas(self):
         result = self.parser.parse_lte_ml1_scell_meas(None, binascii.unhexlify('040100009C18D60AECC44E00E2244E00FFFCE30FFED80A0047AD56021D310100A2624100'), None)
@@ -40,17 +47,17 @@ class TestDiagLteLogParser(unittest.TestCase):
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb197, timestamp=0)
         result = self.parser.parse_lte_ml1_cell_info(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d000514000000000000040000000000000012d53d8000000000a9a400')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0),
+            'ts': util.qxdm_epoch_ns,
             'stdout': 'LTE ML1 Cell Info: EARFCN 1300, PCI 36, Bandwidth 20 MHz, Num antennas 1'}
-        self.assertDictEqual(result, expected)
+        self.assertDictEqual(self.join_packets(result), expected)
 
         payload = binascii.unhexlify('024BF8002107000003230000000000000F0500002ABD0B17000000000000F88400000100')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb197, timestamp=0)
         result = self.parser.parse_lte_ml1_cell_info(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d000721000000000000040000000000000012d53d800000000084f800')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0),
+            'ts': util.qxdm_epoch_ns,
             'stdout': 'LTE ML1 Cell Info: EARFCN 1825, PCI 259, Bandwidth 15 MHz, Num antennas 1'}
-        self.assertDictEqual(result, expected)
+        self.assertDictEqual(self.join_packets(result), expected)
 
     def test_parse_lte_ml1_intra_freq_cell_resel(self):
         # 01 02 F8 14 0A 02 0C 00 16 0D 00 00 61 03 00 00 0B 20 84 00 00 00 00 00 02 00 00 00 40 06 00 00 79 25 12 12 A0 4B F8 02 7F F9 CB 38 E3 DE CB 0F 30 48 F8 02 62 11 CB 31 C7 9E CB 0F 5A 45 08 03 4E 71 CA 2E BB 1E CB 0F 15 43 EF 02 39 C9 C9 29 A7 DE CA 0F 16 0D 00 00 79 0F 00 0A 61 4D 5B 03 85 31 8B 4C 34 DF CE 0F 38 18 00 00 79 1C 12 0E 67 62 8E 03 36 B2 11 41 04 DF 0E 00 66 56 8D 03 D2 91 0E 33 CC 5E CD 0F EB 4F 88 03 9E F1 0C 20 80 5E CC 0F
@@ -70,8 +77,8 @@ class TestDiagLteLogParser(unittest.TestCase):
         result = self.parser.parse_lte_mac_rach_response(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010102091b01015b004c01001a23'),
             binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010003021a23091b010100465c80bd0648000000')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
 
         # V3
         payload = binascii.unhexlify('0101a0690603280001000100010718ffa4ff000001c6610b00b4a2000012000120061f423f8d95075800')
@@ -79,8 +86,8 @@ class TestDiagLteLogParser(unittest.TestCase):
         result = self.parser.parse_lte_mac_rach_response(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010102091801015800b2000061c6'),
             binascii.unhexlify('03070e000000000000000000000000000000000012d53d80000000000100030261c60918010120061f423f8d95075800')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
 
     def test_parse_lte_mac_dl_block(self):
         payload = binascii.unhexlify('01011c36070458000402001527030100000900000000095800611418120e7f00020028270407000029000102000a3c201d1f408c61ca51e602004527000700000700000400033d1f1f020049270006000007000102000321021f0000')
@@ -90,8 +97,8 @@ class TestDiagLteLogParser(unittest.TestCase):
             binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010103042728013c201d1f408c61ca51e6'),
             binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010103042745013d1f1f'),
             binascii.unhexlify('03070e000000000000000000000000000000000012d53d80000000000101030427490121021f')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
 
         payload = binascii.unhexlify('01011c3607046800060100d91c0003000007000102000324021f0100001d00060000c70301000001040100011d00070000970501000001040100021d00000000a9000106000424809f1f0100061d000400005d000102000324581f0100081d00050000540601000001040000')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb063, timestamp=0)
@@ -102,8 +109,8 @@ class TestDiagLteLogParser(unittest.TestCase):
             binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010103041d020124809f1f'),
             binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010103041d060124581f'),
             binascii.unhexlify('03070e000000000000000000000000000000000012d53d8000000000010103041d080104')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
 
     def test_parse_lte_mac_ul_block(self):
         binascii.unhexlify('01010000080244000302000100372771000147000304093e3a21211f0000001702000200462757000052000204053e1f00000002000700512779000074000004053e1f0000005700')
@@ -123,8 +130,8 @@ class TestDiagLteLogParser(unittest.TestCase):
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d000713000000000000030000000000000012d53d80000000001015')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
         # V25
         # payload = binascii.unhexlify('190f3000000009019c180000455102000000003300') #...
         # pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
@@ -136,65 +143,65 @@ class TestDiagLteLogParser(unittest.TestCase):
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d000ce4000000000dc0060009000000000012d53d800000000040858ec4e5bfe050dc29151600')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
         # V20
         payload = binascii.unhexlify('140e300109019c1800000000090000000018000810a7145359a6054368c03bda3004a688028da2009a6840')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d00189c000000000000030000000000000012d53d80000000000810a7145359a6054368c03bda3004a688028da2009a6840')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
         # V19
         payload = binascii.unhexlify('130e22000b00fa090000000032000000000900281840160808800000')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d0009fa000000000000100000000000000012d53d8000000000281840160808800000')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
         # V15
         payload = binascii.unhexlify('0f0d21009e0014050000498c05000000000700400c8ec94289e0') #...
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d0005140000000008c4060009000000000012d53d8000000000400c8ec94289e0')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
         # V15
         payload = binascii.unhexlify('0f0d21019e0014050000000009000000001c000810a5346141a31c316804401a0049167c23159f001067c106d9e000')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d000514000000000000030000000000000012d53d80000000000810a5346141a31c316804401a0049167c23159f001067c106d9e000')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
         # V13
         payload = binascii.unhexlify('0d0c74013200381800000000080000000002002c00')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d001838000000000000030000000000000012d53d80000000002c00')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
         # V9
         payload = binascii.unhexlify('090b700000011405000009910b000000000700400b8ec1dd13b0') #...
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d000514000000000910060009000000000012d53d8000000000400b8ec1dd13b0')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
         # V8
         payload = binascii.unhexlify('080a72010e009c180000a933060000000002002e02')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d00189c00000000033a010009000000000012d53d80000000002e02')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
 
         # V6
         payload = binascii.unhexlify('0609B10007012C0725340202000000120040498805C09702D3B0981C20A0818C4326D0')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0xb0c0, timestamp=0)
         result = self.parser.parse_lte_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070d00072c000000000342050005000000000012d53d800000000040498805c09702d3b0981c20a0818c4326d0')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
 
     def test_parse_lte_mib(self):
         result = self.parser.parse_lte_mib(None, binascii.unhexlify('010001140554000264'), None)
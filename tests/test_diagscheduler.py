@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import unittest
+import struct
+
+from scat.parsers.qualcomm.diagscheduler import DiagCommandScheduler
+from scat.parsers.qualcomm import diagcmd
+from scat.hdlc import HdlcFramer
+import scat.util as util
+
+class FakeDiagDevice:
+    """Answers each command with its first byte followed by 0x01, except
+    for the codes in reject. Responses are returned in reverse order of
+    each write, interleaved with a log packet."""
+
+    def __init__(self, reject=(), silent=()):
+        self.reject = reject
+        self.silent = silent
+        self.framer = HdlcFramer()
+        self.pending = []
+        self.writes = 0
+
+    def write(self, write_buf, encode_hdlc=False):
+        self.writes += 1
+        self.framer.feed(write_buf)
+        responses = []
+        for frame in self.framer.frames():
+            cmd = util.unwrap(frame)[:-2]
+            if cmd[0] in self.silent:
+                continue
+            if cmd[0] in self.reject:
+                responses.append(util.generate_packet(struct.pack('<B', diagcmd.DIAG_BAD_CMD_F) + cmd))
+            else:
+                responses.append(util.generate_packet(cmd[:1] + b'\x01'))
+        responses.append(util.generate_packet(b'\x10\x00\x00\x00'))
+        self.pending.append(b''.join(reversed(responses)))
+
+    def read(self, read_size, decode_hdlc=False):
+        if len(self.pending) == 0:
+            return b''
+        return self.pending.pop(0)
+
+class TestDiagCommandScheduler(unittest.TestCase):
+    def test_flush(self):
+        io_device = FakeDiagDevice(reject=(0x7d, ))
+        scheduler = DiagCommandScheduler(io_device, window=4)
+        indexes = [scheduler.queue(struct.pack('<B', x)) for x in (0x00, 0x7c, 0x60, 0x73, 0x73, 0x7d)]
+        responses = scheduler.flush()
+
+        self.assertEqual(indexes, list(range(6)))
+        self.assertEqual(io_device.writes, 2)
+        self.assertEqual(responses[:5], [b'\x00\x01', b'\x7c\x01', b'\x60\x01', b'\x73\x01', b'\x73\x01'])
+        self.assertEqual(responses[5], b'\x13\x7d')
+        self.assertEqual(scheduler.num_commands, 6)
+        self.assertEqual(scheduler.num_errors, 1)
+        self.assertEqual(scheduler.num_dropped, 2)
+        self.assertEqual(scheduler.flush(), [])
+
+    def test_timeout(self):
+        io_device = FakeDiagDevice(silent=(0x7c, ))
+        scheduler = DiagCommandScheduler(io_device, timeout=0.01)
+        scheduler.queue(struct.pack('<B', 0x00))
+        scheduler.queue(struct.pack('<B', 0x7c))
+        responses = scheduler.flush()
+
+        self.assertEqual(responses, [b'\x00\x01', None])
+        self.assertEqual(scheduler.num_timeouts, 1)
+
+    def test_subcommands(self):
+        io_device = FakeDiagDevice()
+        scheduler = DiagCommandScheduler(io_device)
+        # Late response to an earlier DIAG_EXT_MSG_CONFIG_F 0x01, a frame with
+        # a bad CRC, then the responses to the queued commands
+        io_device.pending.append(util.generate_packet(b'\x7d\x01\x00') +
+            util.generate_packet(b'\x7d\x02\x00')[:-3] + b'\x00\x00\x7e')
+        io_device.silent = (0x7d, 0x73)
+        scheduler.queue(b'\x7d\x02\x00')
+        scheduler.queue(struct.pack('<LL', diagcmd.DIAG_LOG_CONFIG_F, 3))
+        io_device.pending.append(util.generate_packet(struct.pack('<LLL', diagcmd.DIAG_LOG_CONFIG_F, 3, 0)) +
+            util.generate_packet(b'\x7d\x02\x01'))
+        responses = scheduler.flush()
+
+        self.assertEqual(responses, [b'\x7d\x02\x01', struct.pack('<LLL', diagcmd.DIAG_LOG_CONFIG_F, 3, 0)])
+        self.assertEqual(scheduler.num_crc_errors, 1)
+
+    def test_stale_response(self):
+        io_device = FakeDiagDevice(silent=(0x7c, ))
+        scheduler = DiagCommandScheduler(io_device, timeout=0.01)
+        scheduler.queue(struct.pack('<B', 0x7c))
+        self.assertEqual(scheduler.flush(), [None])
+
+        # The response to the timed out command arrives before the new one
+        io_device.silent = ()
+        io_device.pending.append(util.generate_packet(b'\x7c\x00'))
+        scheduler.queue(struct.pack('<B', 0x7c))
+        self.assertEqual(scheduler.flush(), [b'\x7c\x01'])
+
+if __name__ == '__main__':
+    unittest.main()
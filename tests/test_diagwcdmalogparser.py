@@ -2,15 +2,22 @@
 
 import unittest
 import binascii
-import datetime
 from collections import namedtuple
 
 from scat.parsers.qualcomm.diagwcdmalogparser import DiagWcdmaLogParser
+import scat.util as util
 
 class TestDiagWcdmaLogParser(unittest.TestCase):
     parser = DiagWcdmaLogParser(parent=None)
     log_header = namedtuple('QcDiagLogHeader', 'cmd_code reserved length1 length2 log_id timestamp')
 
+    def join_packets(self, result):
+        # Packets are returned as tuples of header and payload buffers
+        for plane in ('cp', 'up'):
+            if plane in result:
+                result[plane] = [util.join_buffers(x) for x in result[plane]]
+        return result
+
     def test_parse_wcdma_cell_search(self):
         payload = binascii.unhexlify('82000000000000f1293200b6a5fff1f5ff000000000000f1293100b39effdedeff040000008000')
         result = self.parser.parse_wcdma_search_cell_reselection(None, payload, None)
@@ -51,15 +58,15 @@ class TestDiagWcdmaLogParser(unittest.TestCase):
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0x412f, timestamp=0)
         result = self.parser.parse_wcdma_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070c0029a7000000000000080000000000000012d53d8000000000a143f686e52a22282f36928cc1852026d2519830afacda4a330614909b4944')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
 
         payload = binascii.unhexlify('89282a00a7298d014365010240c80ea200618385110030071ba8801819c954400c1a2d7220049e22178885e22178885e2210')
         pkt_header = self.log_header(cmd_code=0x10, reserved=0, length1=len(payload) + 12, length2=len(payload) + 12, log_id=0x412f, timestamp=0)
         result = self.parser.parse_wcdma_rrc(pkt_header, payload, None)
         expected = {'cp': [binascii.unhexlify('03070c0029a7000000000000360000000000000012d53d800000000065010240c80ea200618385110030071ba8801819c954400c1a2d7220049e22178885e22178885e2210')],
-            'ts': datetime.datetime(1980, 1, 6, 0, 0)}
-        self.assertDictEqual(result, expected)
+            'ts': util.qxdm_epoch_ns}
+        self.assertDictEqual(self.join_packets(result), expected)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import unittest
+import tempfile
+import gzip
+import os
+
+from scat.iodevices.fileio import FileIO
+
+class TestFileIO(unittest.TestCase):
+    content = bytes(range(256)) * 16
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmpdir.name, 'test.qmdl')
+        with open(self.fname, 'wb') as f:
+            f.write(self.content)
+        self.gz_fname = os.path.join(self.tmpdir.name, 'test.qmdl.gz')
+        with gzip.open(self.gz_fname, 'wb') as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_mmap_read(self):
+        io_device = FileIO([self.fname])
+        self.assertIsNotNone(io_device.mapped_buf)
+        self.assertEqual(io_device.read(0x10), self.content[0:0x10])
+
+        view = io_device.read_view(0x20)
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(bytes(view), self.content[0x10:0x30])
+        self.assertEqual(io_device.tell(), 0x30)
+
+        io_device.seek(0x08)
+        self.assertEqual(io_device.read(0x08), self.content[0x08:0x10])
+
+        io_device.seek(len(self.content) - 4)
+        self.assertEqual(io_device.read(0x10), self.content[-4:])
+        self.assertEqual(io_device.read(0x10), b'')
+        del view
+        io_device.__exit__(None, None, None)
+
+    def test_compressed_read(self):
+        io_device = FileIO([self.gz_fname])
+        self.assertIsNone(io_device.mapped_buf)
+        self.assertEqual(bytes(io_device.read_view(0x10)), self.content[0:0x10])
+        io_device.seek(0)
+        self.assertEqual(io_device.read(len(self.content) + 1), self.content)
+        io_device.__exit__(None, None, None)
+
+    def test_next_file(self):
+        io_device = FileIO([self.fname, self.gz_fname])
+        self.assertEqual(io_device.fname, self.fname)
+        io_device.open_next_file()
+        self.assertEqual(io_device.fname, self.gz_fname)
+        self.assertIsNone(io_device.mapped_buf)
+        io_device.open_next_file()
+        self.assertFalse(io_device.file_available)
+        io_device.__exit__(None, None, None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import unittest
+import struct
+
+from scat.hdlc import HdlcFramer, CrcChecker
+import scat.util as util
+
+class TestHdlcFramer(unittest.TestCase):
+    def test_frames(self):
+        framer = HdlcFramer()
+        framer.feed(b'\x01\x02\x7e\x7e\x03\x7e\x04')
+        self.assertEqual([bytes(x) for x in framer.frames()], [b'\x01\x02', b'\x03'])
+        self.assertEqual(framer.pending(), 1)
+
+        framer.feed(b'\x05\x7e')
+        self.assertEqual([bytes(x) for x in framer.frames()], [b'\x04\x05'])
+        self.assertEqual(framer.pending(), 0)
+
+    def test_frame_spanning_reads(self):
+        framer = HdlcFramer()
+        payload = bytes(range(0x10, 0x70)) * 100
+        for i in range(0, len(payload), 0x100):
+            framer.feed(payload[i:i+0x100])
+            self.assertEqual(list(framer.frames()), [])
+        framer.feed(b'\x7e')
+        self.assertEqual([bytes(x) for x in framer.frames()], [payload])
+
+    def test_frames_kept_across_feed(self):
+        framer = HdlcFramer()
+        framer.feed(b'\x01\x7e\x02')
+        frames = list(framer.frames())
+        framer.feed(b'\x7e')
+        frames += list(framer.frames())
+        self.assertEqual([bytes(x) for x in frames], [b'\x01', b'\x02'])
+
+    def test_flush(self):
+        framer = HdlcFramer()
+        framer.feed(b'\x01\x7e\x02\x03')
+        self.assertEqual([bytes(x) for x in framer.frames()], [b'\x01'])
+        self.assertEqual(bytes(framer.flush()), b'\x02\x03')
+        self.assertIsNone(framer.flush())
+
+    def test_stats(self):
+        framer = HdlcFramer()
+        framer.feed(b'\x01\x7e\x02\x7e')
+        list(framer.frames())
+        stats = framer.stats()
+        self.assertEqual(stats['bytes'], 4)
+        self.assertEqual(stats['frames'], 2)
+
+class TestHdlcEscaping(unittest.TestCase):
+    def test_unwrap(self):
+        pkt = b'\x10\x00\x01\x02'
+        self.assertIs(util.unwrap(pkt), pkt)
+        self.assertEqual(util.unwrap(memoryview(pkt)), pkt)
+        self.assertEqual(util.unwrap(b'\x01\x7d\x5e\x02\x7d\x5d\x7d\x5d\x5e'), b'\x01\x7e\x02\x7d\x7d\x5e')
+
+    def test_wrap(self):
+        pkt = b'\x10\x00\x01\x02'
+        self.assertIs(util.wrap(pkt), pkt)
+        self.assertEqual(util.wrap(b'\x01\x7e\x02\x7d'), b'\x01\x7d\x5e\x02\x7d\x5d')
+
+    def test_generate_packet(self):
+        self.assertEqual(util.generate_packet(b'\x00'), b'\x00\x78\xf0\x7e')
+        pkt = util.generate_packet(b'\x7e\x7d')
+        self.assertEqual(pkt[-1], 0x7e)
+        self.assertEqual(util.unwrap(pkt[:-1])[:2], b'\x7e\x7d')
+
+class TestCrcChecker(unittest.TestCase):
+    good_pkt = b'\x00\x01\x02\x03' + struct.pack('<H', util.dm_crc16(b'\x00\x01\x02\x03'))
+    bad_pkt = b'\x00\x01\x02\x03\x00\x00'
+
+    def test_dm_crc16(self):
+        self.assertEqual(util.dm_crc16(b'123456789'), 0x906e)
+        self.assertEqual(util.dm_crc16(memoryview(b'123456789')), 0x906e)
+
+    def test_always(self):
+        checker = CrcChecker()
+        self.assertTrue(checker.check(self.good_pkt))
+        self.assertFalse(checker.check(self.bad_pkt))
+        self.assertEqual(checker.stats(), {'checked': 2, 'skipped': 0, 'errors': 1})
+
+    def test_sampled(self):
+        checker = CrcChecker('sampled', 3)
+        results = [checker.check(self.bad_pkt) for i in range(6)]
+        self.assertEqual(results, [False, True, True, False, True, True])
+        self.assertEqual(checker.stats(), {'checked': 2, 'skipped': 4, 'errors': 2})
+
+    def test_off(self):
+        checker = CrcChecker('off')
+        self.assertTrue(checker.check(self.bad_pkt))
+        self.assertEqual(checker.stats(), {'checked': 0, 'skipped': 1, 'errors': 0})
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            CrcChecker('sometimes')
+
+if __name__ == '__main__':
+    unittest.main()
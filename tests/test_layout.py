@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import unittest
+import importlib
+import binascii
+import pkgutil
+import struct
+import ast
+import os
+
+import scat.parsers
+import scat.util as util
+from scat.parsers.qualcomm.qualcommparser import QualcommParser
+from scat.parsers.samsung.samsungparser import SamsungParser
+
+class TestLayout(unittest.TestCase):
+    def test_unpack(self):
+        layout = util.Layout('TestLayoutItem', 'a b', '<BH')
+        self.assertEqual(layout.size, 3)
+        item = layout.unpack(b'\xff\x01\x02\x00\xff', 1)
+        self.assertEqual((item.a, item.b), (1, 2))
+        self.assertIs(util.Layout.registry['TestLayoutItem'], layout)
+
+        util.Layout('TestLayoutItem', 'a b', '<BH')
+        with self.assertRaises(ValueError):
+            util.Layout('TestLayoutItem', 'a b', '<BL')
+
+    def test_no_types_in_functions(self):
+        # Record types and struct formats are created once at import time
+        # and never inside parser methods
+        root = os.path.dirname(scat.parsers.__file__)
+        for dirpath, dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                if not filename.endswith('.py'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                with open(path) as f:
+                    tree = ast.parse(f.read())
+                for func in ast.walk(tree):
+                    if not isinstance(func, ast.FunctionDef):
+                        continue
+                    for node in ast.walk(func):
+                        if isinstance(node, ast.Call):
+                            name = node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, 'id', '')
+                            self.assertNotIn(name, ('namedtuple', 'Layout', 'Struct'),
+                                '{}:{} creates {} in {}'.format(path, node.lineno, name, func.name))
+
+    def test_registry_after_import(self):
+        # All layouts are defined by importing the parser modules, parsing
+        # packets neither adds nor replaces any
+        for module in pkgutil.walk_packages(scat.parsers.__path__, 'scat.parsers.'):
+            importlib.import_module(module.name)
+        layouts = dict(util.Layout.registry)
+        self.assertIn('SdmHeader', layouts)
+        self.assertIn('HisiLogHeader', layouts)
+
+        body = binascii.unhexlify('0164A4011405244241050000D32D000080533D00000000000000A4A91DFF0100')
+        pkt = struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, 0xb197, 0) + body
+        self.assertIsNotNone(QualcommParser().parse_diag(util.generate_packet(pkt)[:-1]))
+        sdm_pkt = binascii.unhexlify('7f1900001600bbffa00252701ebd2f0100070040031e080597e07e')
+        self.assertIsNotNone(SamsungParser().parse_diag(sdm_pkt))
+
+        self.assertEqual(util.Layout.registry, layouts)
+
+if __name__ == '__main__':
+    unittest.main()
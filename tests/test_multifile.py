@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import unittest
+import binascii
+import struct
+import tempfile
+import gzip
+import os
+
+from scat.multifile import MergeKeys, read_dumps_parallel, _scan_file_state
+from scat.parsers.qualcomm.qualcommparser import QualcommParser
+from scat.parsers.samsung.samsungparser import SamsungParser
+import scat.util as util
+
+class TsWriter:
+    def __init__(self):
+        self.cp = []
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.cp.append((ts, sock_content))
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        pass
+
+class TestMultiFile(unittest.TestCase):
+    def merge_keys(self, results):
+        keyed = []
+        keys = MergeKeys(keyed.append)
+        for x in results:
+            keys.append(x)
+        keys.finish()
+        self.assertEqual([x[1] for x in keyed], results)
+        return [x[0] for x in keyed]
+
+    def test_merge_keys(self):
+        results = [{'stdout': 'a'}, {'ts': 5}, {'stdout': 'b'}, {'device_ts': 7}]
+        self.assertEqual(self.merge_keys(results), [(1, 5), (1, 5), (1, 5), (1, 7)])
+        self.assertEqual(self.merge_keys([{'stdout': 'a'}]), [(0, 0)])
+
+    def test_read_dumps_parallel(self):
+        rrc = binascii.unhexlify('03000800a143f686e52a2228')
+        def log_pkt(ts):
+            return util.generate_packet(struct.pack('<BBHHHQ', 0x10, 0, len(rrc) + 12, len(rrc) + 12, 0x412f, ts << 16) + rrc)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fnames = [os.path.join(tmpdir, 'a.qmdl'), os.path.join(tmpdir, 'b.qmdl.gz')]
+            with open(fnames[0], 'wb') as f:
+                f.write(b''.join(log_pkt(x) for x in (0, 2, 4, 6)))
+            with gzip.open(fnames[1], 'wb') as f:
+                f.write(b''.join(log_pkt(x) for x in (1, 3, 5)))
+
+            for order in ('timestamp', 'file'):
+                parser = QualcommParser()
+                writer = TsWriter()
+                parser.set_writer(writer)
+                read_dumps_parallel(parser, fnames, 2, order)
+
+                ts_list = [x[0] for x in writer.cp]
+                self.assertEqual(len(ts_list), 7)
+                if order == 'timestamp':
+                    self.assertEqual(ts_list, sorted(ts_list))
+                else:
+                    self.assertEqual(ts_list, sorted(ts_list[:4]) + sorted(ts_list[4:]))
+                    self.assertNotEqual(ts_list, sorted(ts_list))
+
+    def test_state_between_files(self):
+        cell_id = binascii.unhexlify('f1250000a729000041852d0800000700d01802060200030f9d9c000001000000')
+        rrc = binascii.unhexlify('03000800a143f686e52a2228')
+        def log_pkt(log_id, body, ts):
+            return util.generate_packet(struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, log_id, ts << 16) + body)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fnames = [os.path.join(tmpdir, 'a.qmdl'), os.path.join(tmpdir, 'b.qmdl'), os.path.join(tmpdir, 'c.qmdl')]
+            with open(fnames[0], 'wb') as f:
+                f.write(log_pkt(0x4127, cell_id, 0) + log_pkt(0x412f, rrc, 1))
+            with open(fnames[1], 'wb') as f:
+                f.write(log_pkt(0x412f, rrc, 2))
+            with open(fnames[2], 'wb') as f:
+                f.write(log_pkt(0x412f, rrc, 3))
+
+            parser = QualcommParser()
+            writer = TsWriter()
+            parser.set_writer(writer)
+            read_dumps_parallel(parser, fnames, 2)
+
+            arfcns = [struct.unpack('!H', util.join_buffers(x[1])[4:6])[0] for x in writer.cp]
+            self.assertEqual(len(arfcns), 3)
+            self.assertNotEqual(arfcns[0], 0)
+            self.assertEqual(arfcns, [arfcns[0]] * 3)
+            self.assertEqual(parser.umts_last_uarfcn_dl[0], 10663)
+
+    def test_samsung_state_between_files(self):
+        cell_info = binascii.unhexlify('7f290000260020ffa00202f7f42335d0af0000000000000e067b0100007ce370fea028000078050000007e')
+        rrc = binascii.unhexlify('7f1900001600bbffa00252701ebd2f0100070040031e080597e07e')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fnames = [os.path.join(tmpdir, 'a.sdmraw'), os.path.join(tmpdir, 'b.sdmraw'), os.path.join(tmpdir, 'c.sdmraw.gz')]
+            with open(fnames[0], 'wb') as f:
+                f.write(cell_info + rrc)
+            with open(fnames[1], 'wb') as f:
+                f.write(rrc)
+            with gzip.open(fnames[2], 'wb') as f:
+                f.write(rrc)
+
+            params = SamsungParser().get_worker_parameters()
+            delta = _scan_file_state((SamsungParser, params, fnames[0]))
+            self.assertEqual(delta['lte_last_earfcn_dl'], [1550, None])
+            self.assertEqual(_scan_file_state((SamsungParser, params, fnames[1]))['lte_last_earfcn_dl'], [None, None])
+
+            for order in ('timestamp', 'file'):
+                parser = SamsungParser()
+                writer = TsWriter()
+                parser.set_writer(writer)
+                read_dumps_parallel(parser, fnames, 2, order)
+
+                arfcns = [struct.unpack('!H', util.join_buffers(x[1])[4:6])[0] for x in writer.cp]
+                self.assertEqual(arfcns, [1550] * 3)
+                self.assertEqual(parser.lte_last_earfcn_dl[0], 1550)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import unittest
+import struct
+import tempfile
+import os
+
+from scat.writers import PcapngWriter
+
+class TestPcapngWriter(unittest.TestCase):
+    def read_blocks(self, filename):
+        blocks = []
+        with open(filename, 'rb') as f:
+            content = f.read()
+        pos = 0
+        while pos < len(content):
+            block_type, block_len = struct.unpack_from('<LL', content, pos)
+            self.assertEqual(block_len % 4, 0)
+            self.assertEqual(struct.unpack_from('<L', content, pos + block_len - 4)[0], block_len)
+            blocks.append((block_type, content[pos + 8:pos + block_len - 4]))
+            pos += block_len
+        self.assertEqual(pos, len(content))
+        return blocks
+
+    def read_options(self, buf):
+        options = {}
+        pos = 0
+        while pos < len(buf):
+            code, length = struct.unpack_from('<HH', buf, pos)
+            if code == 0:
+                break
+            options[code] = buf[pos + 4:pos + 4 + length]
+            pos += 4 + length + (-length & 3)
+        return options
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'test.pcapng')
+            with PcapngWriter(filename, comments=True) as writer:
+                writer.write_cp(b'\x02\x04\x0d', 0, 1540493162275000999)
+                writer.write_up(b'\x45\x00', 1, 1540493163000001000)
+                writer.write_cp(b'\x02\x04\x0d\x00\x01', 0, 1540493164000000000)
+                writer.write_comment('Radio state', 1, 1540493165000000000)
+
+            blocks = self.read_blocks(filename)
+            self.assertEqual([x[0] for x in blocks], [0x0a0d0d0a, 1, 6, 1, 6, 6, 1, 6])
+            self.assertEqual(struct.unpack_from('<LHHq', blocks[0][1]), (0x1a2b3c4d, 1, 0, -1))
+
+            interfaces = []
+            for block_type, body in blocks:
+                if block_type == 1:
+                    linktype, = struct.unpack_from('<H', body)
+                    options = self.read_options(body[8:])
+                    self.assertEqual(options[9], b'\x09')
+                    interfaces.append((linktype, options[2]))
+            self.assertEqual(interfaces, [(252, b'radio0-cp'), (228, b'radio1-up'), (252, b'radio1-text')])
+
+            if_id, ts_high, ts_low, cap_len, pkt_len = struct.unpack_from('<LLLLL', blocks[2][1])
+            self.assertEqual((if_id, (ts_high << 32) | ts_low, cap_len, pkt_len), (0, 1540493162275000999, 19, 19))
+            self.assertEqual(blocks[2][1][20:20 + cap_len], b'\x00\x0c\x00\x08gsmtap\x00\x00\x00\x00\x00\x00\x02\x04\x0d')
+
+            if_id, ts_high, ts_low, cap_len, pkt_len = struct.unpack_from('<LLLLL', blocks[4][1])
+            self.assertEqual((if_id, cap_len), (1, 30))
+            ip_hdr = struct.unpack_from('!BBHHBBBBHLLHHHH', blocks[4][1], 20)
+            self.assertEqual(ip_hdr, (0x45, 0, 30, 0, 0x40, 0, 0x40, 0x11, 0xffff, 0x7f000001, 0x7f000002, 13337, 47290, 10, 0xffff))
+            self.assertEqual(blocks[4][1][48:50], b'\x45\x00')
+
+            if_id, ts_high, ts_low, cap_len, pkt_len = struct.unpack_from('<LLLLL', blocks[7][1])
+            self.assertEqual((if_id, cap_len), (2, 4))
+            self.assertEqual(self.read_options(blocks[7][1][24:]), {1: b'Radio state'})
+
+    def test_udp_framing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'test.pcapng')
+            with PcapngWriter(filename, udp_framing=True) as writer:
+                writer.write_cp(b'\x02\x04\x0d', 0, 0)
+                writer.write_comment('Radio state')
+
+            blocks = self.read_blocks(filename)
+            self.assertEqual([x[0] for x in blocks], [0x0a0d0d0a, 1, 6])
+            self.assertEqual(struct.unpack_from('<H', blocks[1][1])[0], 228)
+            self.assertEqual(struct.unpack_from('!HH', blocks[2][1], 20 + 20), (13337, 4729))
+
+if __name__ == '__main__':
+    unittest.main()
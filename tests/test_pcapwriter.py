@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import unittest
+import struct
+import tempfile
+import os
+import time
+
+from scat.writers import PcapWriter
+
+class TestPcapWriter(unittest.TestCase):
+    def expected_record(self, sock_content, port, dest_address, ip_id, ts_sec, ts_usec):
+        return (struct.pack('<LLLL', ts_sec, ts_usec, len(sock_content) + 42, len(sock_content) + 42) +
+            b'\x00' * 12 + b'\x08\x00' +
+            struct.pack('!BBHHBBBBHLL', 0x45, 0, len(sock_content) + 28, ip_id, 0x40, 0, 0x40, 0x11, 0xffff, 0x7f000001, dest_address) +
+            struct.pack('!HHHH', 13337, port, len(sock_content) + 8, 0xffff) + sock_content)
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'test.pcap')
+            with PcapWriter(filename, 4729, 47290) as writer:
+                writer.write_cp(b'\x02\x04\x0d', 0, 1540493162275000999)
+                writer.write_up(b'\x45\x00', 2, 1540493163000001000)
+                self.assertEqual(os.path.getsize(filename), 0)
+
+            with open(filename, 'rb') as f:
+                content = f.read()
+            self.assertEqual(content,
+                struct.pack('<LHHLLLL', 0xa1b2c3d4, 2, 4, 0, 0, 0xffff, 1) +
+                self.expected_record(b'\x02\x04\x0d', 4729, 0x7f000001, 0, 1540493162, 275000) +
+                self.expected_record(b'\x45\x00', 47290, 0x7f000003, 1, 1540493163, 1))
+
+    def test_write_buffers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'test.pcap')
+            with PcapWriter(filename, 4729, 47290) as writer:
+                writer.write_cp((b'\x02\x04', b'\x0d'), 0, 1540493162275000999)
+                writer.write_up([b'\x45', b'', b'\x00'], 2, 1540493163000001000)
+
+            with open(filename, 'rb') as f:
+                content = f.read()
+            self.assertEqual(content,
+                struct.pack('<LHHLLLL', 0xa1b2c3d4, 2, 4, 0, 0, 0xffff, 1) +
+                self.expected_record(b'\x02\x04\x0d', 4729, 0x7f000001, 0, 1540493162, 275000) +
+                self.expected_record(b'\x45\x00', 47290, 0x7f000003, 1, 1540493163, 1))
+
+    def test_flush(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'test.pcap')
+            writer = PcapWriter(filename, flush_size=100, flush_interval=None)
+            writer.write_cp(b'\x00' * 10)
+            self.assertEqual(os.path.getsize(filename), 0)
+            writer.write_cp(b'\x00' * 30)
+            self.assertEqual(os.path.getsize(filename), 24 + 68 + 88)
+            writer.close()
+
+            writer = PcapWriter(filename, flush_interval=0)
+            writer.write_cp(b'\x00' * 10)
+            self.assertEqual(os.path.getsize(filename), 24 + 68)
+            writer.close()
+            writer.close()
+
+    def test_idle_flush(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'test.pcap')
+            with PcapWriter(filename, flush_interval=0.1) as writer:
+                writer.write_cp(b'\x00' * 10)
+                time.sleep(0.3)
+                self.assertEqual(os.path.getsize(filename), 24 + 68)
+
+if __name__ == '__main__':
+    unittest.main()
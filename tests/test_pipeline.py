@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import unittest
+import binascii
+import struct
+import tempfile
+import threading
+import time
+import os
+
+from scat.pipeline import BoundedQueue, QueuedReader, QueuedWriter, CapturePipeline
+from scat.parsers.qualcomm.qualcommparser import QualcommParser
+from scat.iodevices import FileIO
+from scat.hdlc import HdlcFramer
+import scat.util as util
+
+class ListWriter:
+    def __init__(self):
+        self.cp = []
+        self.up = []
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.cp.append(sock_content)
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.up.append(sock_content)
+
+class ListIO:
+    block_until_data = False
+
+    def __init__(self, bufs):
+        self.bufs = list(bufs)
+
+    def read(self, read_size, decode_hdlc = False):
+        return self.bufs.pop(0) if len(self.bufs) > 0 else b''
+
+class TestBoundedQueue(unittest.TestCase):
+    def test_fifo(self):
+        q = BoundedQueue('test', 4)
+        for i in range(3):
+            self.assertTrue(q.put(i))
+        self.assertEqual([q.get(0), q.get(0), q.get(0)], [0, 1, 2])
+        self.assertIsNone(q.get(0))
+        self.assertEqual(q.stats(), {'depth': 0, 'high_water': 3, 'put': 3, 'dropped': 0})
+
+    def test_drop_oldest(self):
+        q = BoundedQueue('test', 2, 'drop-oldest')
+        for i in range(5):
+            q.put(i)
+        self.assertEqual([q.get(0), q.get(0)], [3, 4])
+        self.assertEqual(q.stats()['dropped'], 3)
+        self.assertEqual(q.stats()['high_water'], 2)
+
+    def test_drop_class(self):
+        q = BoundedQueue('test', 2, 'drop-class', ('up', ))
+        q.put('up1', 'up')
+        q.put('cp1', 'cp')
+        # Incoming user plane packet is dropped
+        self.assertFalse(q.put('up2', 'up'))
+        # Queued user plane packet makes room for control plane
+        self.assertTrue(q.put('cp2', 'cp'))
+        self.assertEqual([q.get(0), q.get(0)], ['cp1', 'cp2'])
+        self.assertEqual(q.stats()['dropped'], 2)
+
+    def test_block(self):
+        q = BoundedQueue('test', 1)
+        q.put(0)
+        t = threading.Thread(target=q.put, args=(1, ))
+        t.start()
+        t.join(0.1)
+        self.assertTrue(t.is_alive())
+        self.assertEqual(q.get(), 0)
+        t.join(1.0)
+        self.assertFalse(t.is_alive())
+        self.assertEqual(q.get(), 1)
+
+    def test_close(self):
+        q = BoundedQueue('test', 4)
+        q.put(0)
+        q.close()
+        self.assertFalse(q.put(1))
+        self.assertEqual(q.get(), 0)
+        self.assertIsNone(q.get())
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            BoundedQueue('test', 4, 'drop-newest')
+
+class TestPipeline(unittest.TestCase):
+    def test_queued_writer(self):
+        writer = ListWriter()
+        stage = QueuedWriter(writer, 16)
+        for i in range(100):
+            stage.write_cp(bytes([i]))
+            stage.write_up(bytes([i]), 1)
+        stage.stop()
+        self.assertEqual(writer.cp, [bytes([i]) for i in range(100)])
+        self.assertEqual(writer.up, [bytes([i]) for i in range(100)])
+
+    def test_run_diag(self):
+        body = binascii.unhexlify('0164A4011405244241050000D32D000080533D00000000000000A4A91DFF0100')
+        pkt = struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, 0xb197, 0) + body
+        content = util.generate_packet(pkt) * 500
+        expected = binascii.unhexlify('03070d000514000000000000040000000000000012d53d8000000000a9a400')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.qmdl')
+            with open(fname, 'wb') as f:
+                f.write(content)
+
+            parser = QualcommParser()
+            io_device = FileIO([fname], use_mmap=False)
+            parser.set_io_device(io_device)
+            writer = ListWriter()
+            parser.set_writer(writer)
+
+            pipeline = CapturePipeline(parser, 4, 8)
+            pipeline.start()
+            self.assertIsInstance(parser.io_device, QueuedReader)
+            parser.run_diag()
+            stats = pipeline.stats()
+            pipeline.stop()
+            io_device.__exit__(None, None, None)
+
+            self.assertIs(parser.io_device, io_device)
+            self.assertIs(parser.writer, writer)
+            self.assertEqual(writer.cp, [expected] * 500)
+            self.assertLessEqual(stats['reader']['high_water'], 4)
+            self.assertLessEqual(stats['writer']['high_water'], 8)
+            self.assertEqual(stats['writer']['put'], 500)
+            self.assertEqual(stats['writer']['dropped'], 0)
+
+    def log_frame(self, log_id, seq):
+        body = bytes([seq]) + b'\x7e\x7d' * 4
+        pkt = struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, log_id, 0) + body
+        return util.generate_packet(pkt)
+
+    def test_reader_drop_oldest(self):
+        frames = [self.log_frame(0xb197, i) for i in range(10)]
+        content = b''.join(frames)
+        # Device reads not aligned to frames
+        io_device = ListIO([content[i:i + 7] for i in range(0, len(content), 7)])
+        stage = QueuedReader(io_device, QualcommParser().get_framer(), None, 3, 'drop-oldest')
+        stage.thread.join(1.0)
+
+        self.assertEqual(stage.read(0x1000), b''.join(frames[7:]))
+        self.assertEqual(stage.read(0x1000), b'')
+        self.assertEqual(stage.queue.stats()['dropped'], 7)
+
+    def test_reader_drop_class(self):
+        parser = QualcommParser()
+        ids = [0xb0c0, 0xb197, 0xb0c0, 0xb0c0, 0xb197, 0xb0c0, 0xb0c0, 0xb197, 0xb0c0, 0xb0c0]
+        frames = [self.log_frame(x, i) for i, x in enumerate(ids)]
+        io_device = ListIO([b''.join(frames)])
+        stage = QueuedReader(io_device, parser.get_framer(), parser.get_frame_id, 4, 'drop-class', (0xb0c0, ))
+        stage.thread.join(1.0)
+
+        framer = HdlcFramer()
+        framer.feed(stage.read(0x1000))
+        queued = [parser.get_frame_id(x) for x in framer.frames()]
+        self.assertEqual(queued.count(0xb197), 3)
+        self.assertEqual(len(queued), 4)
+        self.assertEqual(stage.queue.stats()['dropped'], 6)
+
+    def test_reader_stop(self):
+        class SlowIO:
+            block_until_data = True
+
+            def __init__(self):
+                self.reading = False
+
+            def read(self, read_size, decode_hdlc = False):
+                self.reading = True
+                time.sleep(0.2)
+                self.reading = False
+                return b''
+
+        io_device = SlowIO()
+        stage = QueuedReader(io_device, HdlcFramer(keep_delimiter=True))
+        time.sleep(0.05)
+        stage.stop()
+        # No device read may be pending once stop returns
+        self.assertFalse(stage.thread.is_alive())
+        self.assertFalse(io_device.reading)
+
+if __name__ == '__main__':
+    unittest.main()
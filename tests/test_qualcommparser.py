@@ -3,9 +3,27 @@
 import unittest
 import binascii
 import datetime
+import struct
+import tempfile
+import os
 from collections import namedtuple
 
 from scat.parsers.qualcomm.qualcommparser import QualcommParser
+from scat.parsers.qualcomm import parallel
+from scat.parsers.qualcomm import diagcmd
+from scat.iodevices import FileIO
+import scat.util as util
+
+class ListWriter:
+    def __init__(self):
+        self.cp = []
+        self.up = []
+
+    def write_cp(self, sock_content, radio_id=0, ts=None):
+        self.cp.append(sock_content)
+
+    def write_up(self, sock_content, radio_id=0, ts=None):
+        self.up.append(sock_content)
 
 class TestQualcommParser(unittest.TestCase):
     parser = QualcommParser()
@@ -20,7 +38,7 @@ class TestQualcommParser(unittest.TestCase):
     def test_parse_ext_build_id(self):
         payload = binascii.unhexlify('7c010000f20c00004e010000524d35303051474c41425231314130364d34470000')
         result = self.parser.parse_diag_ext_build_id(payload)
-        expected = {'stdout': 'Build ID: RM500QGLABR11A06M4G'}
+        expected = {'stdout': 'Build ID: RM500QGLABR11A06M4G', 'build_id': 'RM500QGLABR11A06M4G'}
         self.assertDictEqual(result, expected)
 
     def test_parse_log_config(self):
@@ -35,5 +53,169 @@ class TestQualcommParser(unittest.TestCase):
         expected = {'stdout': 'Extended message range: 0-134, 500-506, 1000-1200, 2000-2008, 3000-3014, 4000-4010, 4500-4584, 4600-4616, 5000-5036, 5500-5517, 6000-6081, 6500-6521, 7000-7003, 7100-7111, 7200-7201, 8000-8000, 8500-8532, 9000-9008, 9500-9521, 10200-10210, 10251-10255, 10300-10300, 10350-10377, 10400-10416, 10500-10505, 49152-49251, '}
         self.assertEqual(result['stdout'], expected['stdout'])
 
+    def test_parse_ext_msg(self):
+        payload = binascii.unhexlify('7900000000001cfc0f16e400e604941302000000') + b'Hello\x00file.c\x00'
+        result = self.parser.parse_diag_ext_msg(payload)
+        self.assertEqual(result['ts'], 1540493162275000000)
+        pkt = util.join_buffers(result['cp'][0])
+        self.assertEqual(struct.unpack('!LL', pkt[16:24]), (1540493162, 275000))
+        self.assertTrue(pkt.endswith(b'Hello'))
+
+    def test_diag_handlers(self):
+        parser = QualcommParser()
+        self.assertNotIn(diagcmd.DIAG_EXT_MSG_F, parser.diag_handlers)
+        self.assertIsNone(parser.parse_diag(b'\x79\x00\x00', hdlc_encoded=False, check_crc=False))
+
+        parser.set_parameter({'msgs': True})
+        self.assertEqual(parser.diag_handlers[diagcmd.DIAG_EXT_MSG_F], parser.parse_diag_ext_msg)
+        self.assertNotIn(diagcmd.DIAG_EVENT_REPORT_F, parser.diag_handlers)
+        parser.set_parameter({'events': True})
+        self.assertEqual(parser.diag_handlers[diagcmd.DIAG_EVENT_REPORT_F], parser.parse_diag_event)
+
+    def test_parse_hdf(self):
+        body = binascii.unhexlify('0164A4011405244241050000D32D000080533D00000000000000A4A91DFF0100')
+        record = struct.pack('<HHHQ', len(body) + 12, len(body) + 12, 0xb197, 0) + body
+        # Junk before, between (including a lone 0x10) and after the records
+        content = b'\x00\x10\x01' + b'\x10\x00' + record + b'\x10' + b'\x10\x00' + record + b'\x10\x00\x05'
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.hdf')
+            with open(fname, 'wb') as f:
+                f.write(content)
+
+            for use_mmap in (True, False):
+                parser = QualcommParser()
+                parser.set_io_device(FileIO([fname], use_mmap=use_mmap))
+                writer = ListWriter()
+                parser.set_writer(writer)
+                parser.parse_hdf()
+                parser.io_device.__exit__(None, None, None)
+
+                self.assertEqual(writer.cp, [binascii.unhexlify('03070d000514000000000000040000000000000012d53d8000000000a9a400')] * 2)
+
+    def test_parse_dlf(self):
+        body = binascii.unhexlify('0164A4011405244241050000D32D000080533D00000000000000A4A91DFF0100')
+        record = struct.pack('<HHQ', len(body) + 12, 0xb197, 0) + body
+        unknown_record = struct.pack('<HHQ', 16, 0xb0ff, 1) + b'\x00' * 4
+        content = record + unknown_record + record + record[:10]
+        expected = binascii.unhexlify('03070d000514000000000000040000000000000012d53d8000000000a9a400')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.dlf')
+            with open(fname, 'wb') as f:
+                f.write(content)
+
+            for use_mmap in (True, False):
+                parser = QualcommParser()
+                parser.set_io_device(FileIO([fname], use_mmap=use_mmap))
+                writer = ListWriter()
+                parser.set_writer(writer)
+                parser.parse_dlf()
+                self.assertEqual(writer.cp, [expected] * 2)
+
+                parser.io_device.seek(0)
+                index = parser.build_dlf_index()
+                self.assertEqual(index, [(0, len(record), 0xb197, 0),
+                    (len(record), 16, 0xb0ff, 1),
+                    (len(record) + 16, len(record), 0xb197, 0)])
+
+                result = parser.parse_dlf_at(index[2][0])
+                self.assertEqual(result['cp'], [expected])
+                self.assertIsNone(parser.parse_dlf_at(index[1][0]))
+                parser.io_device.__exit__(None, None, None)
+
+    def test_log_masks(self):
+        parser = QualcommParser()
+        scat_masks = [diagcmd.log_mask_scat_1x(), diagcmd.log_mask_scat_wcdma(), diagcmd.log_mask_scat_gsm(),
+            diagcmd.log_mask_scat_umts(), diagcmd.log_mask_scat_lte()]
+        self.assertEqual(parser.get_log_masks(), scat_masks)
+
+        parser.set_parameter({'log-profile': 'rrc+nas', 'log-ids': [0xb063]})
+        masks = parser.get_log_masks()
+        self.assertEqual([struct.unpack('<L', x[8:12])[0] for x in masks], [0x4, 0x5, 0x7, 0xb])
+        lte_ids = diagcmd.log_mask_items(masks[-1])
+        self.assertIn(0xb0c0, lte_ids)
+        self.assertIn(0xb063, lte_ids)
+        self.assertNotIn(0xb17f, lte_ids)
+
+        parser.set_parameter({'log-profile': None, 'log-ids': [0xb0c0]})
+        self.assertEqual(parser.get_log_masks(), [diagcmd.create_log_config_set_mask(0xb, 0x09ff, 0xc0)])
+
+    def test_log_filter(self):
+        parser = QualcommParser()
+        parser.set_parameter({'exclude-ids': [0xb0c0, 0x79]})
+        log_pkt = lambda log_id, body: util.generate_packet(struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, log_id, 0) + body)[:-1]
+
+        # Length 0x7d is escaped in the header
+        frames = [log_pkt(0xb0c0, b'\x00' * (0x7d - 12)), log_pkt(0x1098, b''),
+            util.generate_packet(struct.pack('<BBHL', 0x98, 0x01, 0, 1) + struct.pack('<BBHHHQ', 0x10, 0, 12, 12, 0xb0c0, 0))[:-1],
+            util.generate_packet(b'\x79\x00\x00\x00')[:-1], util.generate_packet(b'\x60\x00')[:-1]]
+        self.assertEqual(frames[0][2:4], b'\x7d\x5d')
+        self.assertEqual([parser.get_frame_id(x) for x in frames], [0xb0c0, 0x1098, 0xb0c0, 0x79, 0x60])
+
+        for frame in frames:
+            parser.parse_diag(frame)
+        self.assertEqual(parser.log_filter.stats(), {'passed': 2, 'skipped': {0xb0c0: 2, 0x79: 1}})
+
+        parser.set_parameter({'include-ids': [0x1098], 'exclude-ids': []})
+        self.assertFalse(parser.log_filter.accept(0x60))
+        self.assertTrue(parser.log_filter.accept(0x1098))
+        parser.set_parameter({'include-ids': []})
+        self.assertIsNone(parser.log_filter)
+
+    def test_split_chunks(self):
+        buf = b'\x01\x02\x7e' * 10
+        chunks = parallel.split_chunks(buf, 4, 1)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], len(buf))
+        for (start, end), (next_start, next_end) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, next_start)
+        for start, end in chunks:
+            self.assertEqual(buf[end - 1], 0x7e)
+
+        # Many more chunks than jobs for large dumps
+        chunks = parallel.split_chunks(buf, 2, 1, 6)
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(max(end - start for start, end in chunks), 6)
+
+    def test_run_parallel(self):
+        def log_pkt(log_id, body):
+            return util.generate_packet(struct.pack('<BBHHHQ', 0x10, 0, len(body) + 12, len(body) + 12, log_id, 0) + body)
+
+        cell_id = binascii.unhexlify('f1250000a729000041852d0800000700d01802060200030f9d9c000001000000')
+        cell_id_2 = struct.pack('<LL', 9000, 10000) + cell_id[8:]
+        # Cell ID frame with a bad CRC, both passes have to treat it alike
+        bad_cell_id = log_pkt(0x4127, struct.pack('<LL', 8000, 8500) + cell_id[8:])
+        bad_cell_id = bad_cell_id[:-3] + bytes([bad_cell_id[-3] ^ 0x01]) + bad_cell_id[-2:]
+        # DL-DCCH message without UARFCN, taken from the serving cell
+        rrc = binascii.unhexlify('03000800a143f686e52a2228')
+        # The serving cell changes in the middle of the dump, state has
+        # to be carried over to chunks without any cell ID packet
+        content = (log_pkt(0x4127, cell_id) + log_pkt(0x412f, rrc) * 25 + bad_cell_id + log_pkt(0x412f, rrc) * 25 +
+            log_pkt(0x4127, cell_id_2) + log_pkt(0x412f, rrc) * 50)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.qmdl')
+            with open(fname, 'wb') as f:
+                f.write(content)
+
+            writers = []
+            for jobs in (1, 2):
+                parser = QualcommParser()
+                parser.set_io_device(FileIO([fname]))
+                writer = ListWriter()
+                parser.set_writer(writer)
+                if jobs == 1:
+                    parser.run_diag()
+                else:
+                    parallel.run_parallel(parser, fname, jobs, min_chunk_size=len(content) // 7)
+                writers.append(writer)
+                self.assertEqual(parser.umts_last_uarfcn_dl[0], 10000)
+                parser.io_device.__exit__(None, None, None)
+
+            self.assertEqual(len(writers[0].cp), 100)
+            self.assertEqual(writers[1].cp, writers[0].cp)
+            self.assertNotEqual(writers[0].cp[0], writers[0].cp[-1])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import unittest
+import tempfile
+import json
+import time
+import gzip
+import lzma
+import os
+
+from scat.writers import RotatingWriter, RawWriter, PcapWriter
+
+class TestRotatingWriter(unittest.TestCase):
+    def read_manifest(self, filename):
+        with open(filename + '.manifest.json') as f:
+            return json.load(f)['segments']
+
+    def test_packets(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'capture.qmdl')
+            with RotatingWriter(RawWriter, filename, max_packets=2, compression='gzip') as writer:
+                for i in range(5):
+                    writer.write_cp(bytes([i]) * 4, 0, 1000 + i)
+
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['capture.qmdl.manifest.json',
+                'capture_0000.qmdl.gz', 'capture_0001.qmdl.gz', 'capture_0002.qmdl.gz'])
+            self.assertEqual(self.read_manifest(filename), [
+                {'file': 'capture_0000.qmdl.gz', 'packets': 2, 'first_ts': 1000, 'last_ts': 1001},
+                {'file': 'capture_0001.qmdl.gz', 'packets': 2, 'first_ts': 1002, 'last_ts': 1003},
+                {'file': 'capture_0002.qmdl.gz', 'packets': 1, 'first_ts': 1004, 'last_ts': 1004}])
+
+            content = b''
+            for segment in self.read_manifest(filename):
+                with gzip.open(os.path.join(tmpdir, segment['file']), 'rb') as f:
+                    content += f.read()
+            self.assertEqual(content, b''.join(bytes([i]) * 4 for i in range(5)))
+
+    def test_bytes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'capture.pcap')
+            writer = RotatingWriter(PcapWriter, filename, max_bytes=200, compression='xz')
+            for i in range(4):
+                writer.write_cp(b'\x00' * 50)
+            writer.close()
+
+            segments = self.read_manifest(filename)
+            self.assertEqual([x['packets'] for x in segments], [2, 2])
+            for segment in segments:
+                with lzma.open(os.path.join(tmpdir, segment['file']), 'rb') as f:
+                    self.assertEqual(len(f.read()), 24 + 2 * (58 + 50))
+
+    def test_seconds_idle(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'capture.qmdl')
+            writer = RotatingWriter(RawWriter, filename, max_seconds=0.1, compression='gzip')
+            writer.write_cp(b'\x01' * 4, 0, 1000)
+            writer.write_cp(b'\x02' * 4, 0, 1001)
+
+            # No more packets arrive, the segment is still finished
+            for i in range(50):
+                if os.path.exists(filename + '.manifest.json'):
+                    break
+                time.sleep(0.05)
+            self.assertEqual(self.read_manifest(filename), [
+                {'file': 'capture_0000.qmdl.gz', 'packets': 2, 'first_ts': 1000, 'last_ts': 1001}])
+
+            # Idle segments are kept open and not recorded
+            time.sleep(0.3)
+            writer.close()
+            self.assertEqual(len(self.read_manifest(filename)), 1)
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['capture.qmdl.manifest.json', 'capture_0000.qmdl.gz'])
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            RotatingWriter(RawWriter, 'capture.qmdl', compression='zip')
+
+if __name__ == '__main__':
+    unittest.main()
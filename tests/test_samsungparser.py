@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import unittest
+import binascii
+import tempfile
+import os
+
+from scat.parsers.samsung.samsungparser import SamsungParser, SdmFramer
+from scat.parsers.samsung import sdmcmd
+from scat.iodevices import FileIO
+
+class TestSamsungParser(unittest.TestCase):
+    def test_item_selections(self):
+        full = sdmcmd.sdm_item_profile('full')
+        self.assertEqual(len(full), 37)
+        self.assertIn(0x0252, full)
+
+        selections = sdmcmd.create_sdm_item_selections(sdmcmd.sdm_item_profile('rrc+nas') + [0x0252, 0x0400])
+        self.assertEqual([x[0] for x in selections], [sdmcmd.sdm_control_message.COMMON_ITEM_SELECT_REQUEST,
+            sdmcmd.sdm_control_message.LTE_ITEM_SELECT_REQUEST, sdmcmd.sdm_control_message.EDGE_ITEM_SELECT_REQUEST,
+            sdmcmd.sdm_control_message.HSPA_ITEM_SELECT_REQUEST])
+        self.assertEqual(selections[1][1], sdmcmd.create_sdm_item_selection(4,
+            (0x50, True), (0x52, True), (0x5a, True), (0x5f, True)))
+        self.assertEqual(selections[3][1], b'\x02\x00\x01\x22\x01')
+
+        with self.assertRaises(ValueError):
+            sdmcmd.create_sdm_item_selections([0x0700])
+
+    def test_sdm_framer(self):
+        pkts = [sdmcmd.generate_sdm_packet(0xa0, 0x02, i, b'\x7e\x7f' * i) for i in range(5)]
+        bad_pkt = sdmcmd.generate_sdm_packet(0xa0, 0x02, 0x10, b'')[:-1] + b'\x00'
+        content = b'\x00\x01' + pkts[0] + pkts[1] + bad_pkt + pkts[2] + pkts[3] + pkts[4]
+        framer = SdmFramer()
+        frames = []
+        for i in range(0, len(content), 5):
+            framer.feed(content[i:i + 5])
+            frames += list(framer.frames())
+        self.assertEqual(frames, pkts)
+        self.assertEqual(framer.num_skipped, 2 + len(bad_pkt))
+        self.assertEqual([SamsungParser().get_frame_id(x) for x in frames], [0x0200 | i for i in range(5)])
+
+    def test_run_dump(self):
+        pkt = binascii.unhexlify('7f290000260020ffa00202f7f42335d0af0000000000000e067b0100007ce370fea028000078050000007e')
+        # Payload byte 0x7f must not be taken as the start of another packet
+        pkt_7f = pkt[:-2] + b'\x7f' + pkt[-1:]
+        content = b'\x00\x7f\x01' + pkt + pkt_7f + b'\x7f\x7e' + pkt + pkt[:20]
+        expected = 'LTE PHY Cell Info: EARFCN 1550, PCI 379, PLMN 45008, RSRP: -104.00, RSRQ: -14.00'
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.sdmraw')
+            with open(fname, 'wb') as f:
+                f.write(content)
+
+            for use_mmap in (True, False):
+                parser = SamsungParser()
+                parser.set_io_device(FileIO([fname], use_mmap=use_mmap))
+                results = []
+                parser.postprocess_parse_result = results.append
+                parser.run_dump()
+                parser.io_device.__exit__(None, None, None)
+
+                self.assertEqual([x['stdout'] for x in results], [expected] * 3)
+
+            for include, exclude, num_results in (([0x0202], [], 3), ([0x0252], [], 0), ([], [0x0202], 0)):
+                parser = SamsungParser()
+                parser.set_parameter({'include-ids': include, 'exclude-ids': exclude})
+                parser.set_io_device(FileIO([fname]))
+                results = []
+                parser.postprocess_parse_result = results.append
+                parser.run_dump()
+                parser.io_device.__exit__(None, None, None)
+
+                self.assertEqual(len(results), num_results)
+                self.assertEqual(parser.log_filter.stats(), {'passed': num_results, 'skipped': {0x0202: 3 - num_results} if num_results < 3 else {}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import unittest
+import unittest.mock
+import socket
+import errno
+
+from scat.writers import SocketWriter
+
+class TestSocketWriter(unittest.TestCase):
+    def setUp(self):
+        self.sock_cp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock_cp.bind(('127.0.0.1', 0))
+        self.sock_up = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock_up.bind(('127.0.0.1', 0))
+        for sock in (self.sock_cp, self.sock_up):
+            sock.settimeout(1.0)
+
+    def tearDown(self):
+        self.sock_cp.close()
+        self.sock_up.close()
+
+    def test_write(self):
+        with SocketWriter('127.0.0.1', self.sock_cp.getsockname()[1], self.sock_up.getsockname()[1]) as writer:
+            writer.write_cp(b'\x02\x04\x0d')
+            writer.write_up(b'\x45\x00')
+            writer.write_cp(b'\x02\x04\x0e', 1)
+            self.assertEqual(self.sock_cp.recv(16), b'\x02\x04\x0d')
+            self.assertEqual(self.sock_up.recv(16), b'\x45\x00')
+            self.assertEqual(writer.dest_cp, {0: ('127.0.0.1', self.sock_cp.getsockname()[1]),
+                1: ('127.0.0.2', self.sock_cp.getsockname()[1])})
+            self.assertEqual(writer.stats(), {'sent': 3, 'dropped': 0, 'errors': 0})
+
+    def test_write_buffers(self):
+        with SocketWriter('127.0.0.1', self.sock_cp.getsockname()[1], self.sock_up.getsockname()[1]) as writer:
+            writer.write_cp((b'\x02\x04', b'\x0d'))
+            writer.has_sendmsg = False
+            writer.write_up([b'\x45', b'\x00'])
+            self.assertEqual(self.sock_cp.recv(16), b'\x02\x04\x0d')
+            self.assertEqual(self.sock_up.recv(16), b'\x45\x00')
+
+    def test_send_errors(self):
+        writer = SocketWriter('127.0.0.1', self.sock_cp.getsockname()[1], self.sock_up.getsockname()[1])
+        errors = [OSError(errno.ENOBUFS, 'No buffer space available'), OSError(errno.EPERM, 'Operation not permitted')]
+        with unittest.mock.patch.object(writer, 'sock_cp', unittest.mock.Mock(**{'sendto.side_effect': errors})):
+            writer.write_cp(b'\x01')
+            writer.write_cp(b'\x02')
+        self.assertEqual(writer.stats(), {'sent': 0, 'dropped': 1, 'errors': 1})
+        writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
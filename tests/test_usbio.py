@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import unittest
+import unittest.mock
+import collections
+import ctypes
+import errno
+import time
+import types
+
+import usb
+import usb.backend.libusb1 as libusb1
+import serial
+from scat.iodevices import USBIO, SerialIO
+from scat.iodevices.usbasync import AsyncBulkReader, ThreadedBulkReader
+from scat.iodevices.backoff import ReadBackoff
+
+class FakeEndpoint:
+    def __init__(self, reads):
+        self.reads = list(reads)
+
+    def read(self, size_or_buffer, timeout=None):
+        if len(self.reads) == 0:
+            raise usb.core.USBTimeoutError('timeout', 0, 0)
+        buf = self.reads.pop(0)
+        if isinstance(buf, Exception):
+            raise buf
+        return bytes(buf[:size_or_buffer])
+
+class FakeLibusb:
+    """Completes submitted transfers with the given reads from
+    libusb_handle_events(), using the transfer structure and callback
+    type of the installed pyusb."""
+
+    def __init__(self, reads):
+        self.reads = list(reads)
+        self.submitted = collections.deque()
+        self.cancelled = False
+        self.num_freed = 0
+
+    def libusb_alloc_transfer(self, num_iso_packets):
+        return ctypes.pointer(libusb1._libusb_transfer())
+
+    def libusb_submit_transfer(self, transfer):
+        self.submitted.append(transfer)
+        return 0
+
+    def libusb_cancel_transfer(self, transfer):
+        self.cancelled = True
+
+    def libusb_free_transfer(self, transfer):
+        self.num_freed += 1
+
+    def libusb_handle_events(self, ctx):
+        if len(self.submitted) == 0:
+            time.sleep(0.001)
+            return 0
+        transfer = self.submitted.popleft()
+        t = transfer.contents
+        t.actual_length = 0
+        if self.cancelled:
+            t.status = libusb1.LIBUSB_TRANSFER_CANCELLED
+        elif len(self.reads) > 0:
+            buf = self.reads.pop(0)
+            ctypes.memmove(t.buffer, buf, len(buf))
+            t.actual_length = len(buf)
+            t.status = libusb1.LIBUSB_TRANSFER_COMPLETED
+        else:
+            t.status = libusb1.LIBUSB_TRANSFER_TIMED_OUT
+            time.sleep(0.001)
+        t.callback(transfer)
+        return 0
+
+def fake_libusb_device(lib):
+    backend = libusb1._LibUSB.__new__(libusb1._LibUSB)
+    backend.lib = lib
+    backend.ctx = None
+    ctx = types.SimpleNamespace(backend=backend, managed_open=lambda: types.SimpleNamespace(handle=None))
+    return types.SimpleNamespace(_ctx=ctx)
+
+class TestAsyncBulkReader(unittest.TestCase):
+    def test_read_in_order(self):
+        lib = FakeLibusb([b'\x01' * 10, b'\x02' * 16, b'\x03'])
+        reader = AsyncBulkReader(fake_libusb_device(lib), 0x81, 0x10, 2, timeout=10)
+        bufs = [reader.read(1.0) for i in range(3)]
+        reader.stop()
+
+        self.assertEqual(bufs, [b'\x01' * 10, b'\x02' * 16, b'\x03'])
+        self.assertEqual(reader.stats()['bytes'], 27)
+        self.assertEqual(reader.stats()['transfers'], 3)
+        self.assertEqual(lib.num_freed, 2)
+
+    def test_unsupported(self):
+        with self.assertRaises(NotImplementedError):
+            AsyncBulkReader(types.SimpleNamespace(), 0x81)
+        with unittest.mock.patch.object(usb, '__version__', '2.0.0'):
+            with self.assertRaises(NotImplementedError):
+                AsyncBulkReader(fake_libusb_device(FakeLibusb([])), 0x81)
+
+    def test_usbio_fallback(self):
+        io_device = USBIO()
+        io_device.dev = types.SimpleNamespace()
+        io_device.r_handle = FakeEndpoint([b'\x7e'])
+        io_device.r_handle.bEndpointAddress = 0x81
+        with self.assertLogs('scat.usbio', 'WARNING'):
+            io_device.start_async(0x100, 4)
+        self.assertIsInstance(io_device.bulk_reader, ThreadedBulkReader)
+        io_device.stop_async()
+
+class TestThreadedBulkReader(unittest.TestCase):
+    def test_read_in_order(self):
+        reads = [b'\x01' * 10, b'', usb.core.USBTimeoutError('timeout', 0, 0), b'\x02' * 20, b'\x03']
+        reader = ThreadedBulkReader(FakeEndpoint(reads), 0x10, 2, timeout=10)
+        bufs = [reader.read(1.0) for i in range(3)]
+        reader.stop()
+
+        self.assertEqual(bufs, [b'\x01' * 10, b'\x02' * 16, b'\x03'])
+        stats = reader.stats()
+        self.assertEqual(stats['bytes'], 27)
+        self.assertEqual(stats['transfers'], 3)
+        self.assertEqual(stats['empty'], 1)
+        self.assertGreaterEqual(stats['timeouts'], 1)
+        self.assertEqual(reader.read(0), b'')
+
+    def test_usbio_read(self):
+        io_device = USBIO()
+        io_device.bulk_reader = ThreadedBulkReader(FakeEndpoint([b'\x7d\x5e\x7e']), 0x100, 4, timeout=10)
+        self.assertEqual(io_device.read(0x1000, decode_hdlc=True), b'\x7e\x7e')
+        io_device.stop_async()
+        self.assertIsNone(io_device.bulk_reader)
+
+class TestReadErrors(unittest.TestCase):
+    def test_usbio_timeouts_and_errors(self):
+        io_device = USBIO()
+        io_device.backoff = ReadBackoff(max_errors=3, min_delay=0.001)
+        io_error = usb.core.USBError('I/O error', errno=errno.EIO)
+        io_device.r_handle = FakeEndpoint([usb.core.USBTimeoutError('timeout', 0, 0), io_error, b'\x01', io_error, io_error, io_error])
+
+        self.assertEqual(io_device.read(0x1000), b'')
+        self.assertEqual(io_device.read(0x1000), b'')
+        self.assertEqual(io_device.read(0x1000), b'\x01')
+        self.assertEqual(io_device.read(0x1000), b'')
+        self.assertEqual(io_device.read(0x1000), b'')
+        # Third consecutive error: device considered gone
+        with self.assertRaises(usb.core.USBError):
+            io_device.read(0x1000)
+        self.assertEqual(io_device.backoff.stats(), {'reads': 1, 'timeouts': 1, 'errors': 4})
+
+    def test_usbio_disconnect(self):
+        io_device = USBIO()
+        io_device.r_handle = FakeEndpoint([usb.core.USBError('No such device', errno=errno.ENODEV)])
+        with self.assertRaises(usb.core.USBError):
+            io_device.read(0x1000)
+
+    def test_serialio(self):
+        io_device = SerialIO.__new__(SerialIO)
+        io_device.port = serial.serial_for_url('loop://', timeout=0.05, inter_byte_timeout=0.01)
+        io_device.backoff = ReadBackoff()
+
+        self.assertEqual(io_device.read(0x1000), b'')
+        io_device.write(b'\x01\x02\x7e')
+        self.assertEqual(io_device.read(0x1000), b'\x01\x02\x7e')
+        self.assertEqual(io_device.backoff.stats(), {'reads': 1, 'timeouts': 1, 'errors': 0})
+        io_device.port.close()
+
+if __name__ == '__main__':
+    unittest.main()
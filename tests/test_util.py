@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import unittest
+import struct
+
+import scat.util as util
+
+class TestUtil(unittest.TestCase):
+    def test_parse_qxdm_ts(self):
+        self.assertEqual(util.parse_qxdm_ts(0), util.qxdm_epoch_ns)
+        self.assertEqual(util.parse_qxdm_ts(0x00e4160ffc1c0000), 1540493162275000000)
+        self.assertEqual(util.parse_qxdm_ts(0xffffffffffff0000), util.qxdm_epoch_ns)
+        self.assertEqual(util.ts_sec_usec(1540493162275000999), (1540493162, 275000))
+
+    def test_create_gsmtap_header(self):
+        hdr = util.create_gsmtap_header(version = 2, payload_type = util.gsmtap_type.UM,
+            arfcn = 0x4001, frame_number = 1234, sub_type = 3)
+        self.assertEqual(hdr, struct.pack('!BBBBHBBLBBBB', 2, 4, 1, 0, 0x4001, 0, 0, 1234, 3, 0, 0, 0))
+
+        for device_sec in (1, 2):
+            hdr = util.create_gsmtap_header(version = 3, payload_type = util.gsmtap_type.LTE_RRC,
+                arfcn = 0x4001, frame_number = 17, sub_type = 5, device_sec = device_sec, device_usec = 7)
+            self.assertEqual(hdr, struct.pack('!BBBBHBBLBBBBQL', 3, 7, 13, 0, 0, 0, 0, 17, 5, 0, 0, 0, device_sec, 7))
+
+    def test_create_osmocore_logging_header(self):
+        for line_number in (10, 20):
+            hdr = util.create_osmocore_logging_header(timestamp = 1540493162275000000,
+                process_name = 'Event', pid = 1605, subsys_name = b'5000',
+                filename = 'nas_emm.c', line_number = line_number)
+            self.assertEqual(hdr, struct.pack('!LL16sLB3x16s32sL', 1540493162, 275000,
+                b'Event', 1605, 0, b'5000', b'nas_emm.c', line_number))
+
+        hdr = util.create_osmocore_logging_header(timestamp = 1540493162275000000,
+            process_name = bytearray(b'Event'), subsys_name = memoryview(b'5000'),
+            filename = bytearray(b'nas_emm.c'))
+        self.assertEqual(hdr, struct.pack('!LL16sLB3x16s32sL', 1540493162, 275000,
+            b'Event', 0, 0, b'5000', b'nas_emm.c', 0))
+
+if __name__ == '__main__':
+    unittest.main()